@@ -0,0 +1,160 @@
+// SPDX-License-Identifier: MIT
+
+pragma solidity 0.8.4;
+
+
+interface IBridgedToken {
+    function decimals() external view returns (uint8);
+    function transfer(address to, uint256 amount) external returns (bool);
+}
+
+
+/**
+ * @dev This is a test helper only, don't use it in production!
+ *
+ * A stand-in for the Wormhole token bridge: verifies guardian signatures of v1 VAAs
+ * and releases the locked Ethereum-native tokens of the transfer payloads.
+ */
+contract MockWormholeTokenBridge {
+    uint16 constant CHAIN_ID_ETHEREUM = 2;
+    uint8 constant VAA_VERSION = 1;
+    uint8 constant TRANSFER_PAYLOAD_ID = 1;
+    uint8 constant NORMALIZED_DECIMALS = 8;
+
+    uint256 constant SIGNATURE_SIZE = 66;
+    uint256 constant BODY_HEADER_SIZE = 51;
+    uint256 constant TRANSFER_PAYLOAD_SIZE = 133;
+
+    struct TransferVM {
+        bytes32 hash;
+        uint16 emitterChainId;
+        bytes32 emitterAddress;
+        uint64 sequence;
+        uint256 amount;
+        address token;
+        uint16 tokenChain;
+        address to;
+        uint16 toChain;
+        uint256 fee;
+    }
+
+    address[] public guardians;
+    uint32 public guardianSetIndex;
+    uint16 public emitterChainId;
+    bytes32 public emitterAddress;
+
+    mapping(bytes32 => bool) public completedTransfers;
+
+    event TransferRedeemed(uint16 indexed emitterChain, bytes32 indexed emitter, uint64 indexed sequence);
+
+    constructor(
+        address[] memory _guardians,
+        uint32 _guardianSetIndex,
+        uint16 _emitterChainId,
+        bytes32 _emitterAddress
+    ) {
+        guardians = _guardians;
+        guardianSetIndex = _guardianSetIndex;
+        emitterChainId = _emitterChainId;
+        emitterAddress = _emitterAddress;
+    }
+
+    function quorum() public view returns (uint256) {
+        return guardians.length * 2 / 3 + 1;
+    }
+
+    function completeTransfer(bytes memory encodedVm) public {
+        TransferVM memory vm = parseAndVerifyTransferVM(encodedVm);
+
+        require(vm.emitterChainId == emitterChainId && vm.emitterAddress == emitterAddress, "invalid emitter");
+        require(!completedTransfers[vm.hash], "transfer already completed");
+        require(vm.toChain == CHAIN_ID_ETHEREUM, "invalid target chain");
+        require(vm.tokenChain == CHAIN_ID_ETHEREUM, "only native tokens are supported");
+        completedTransfers[vm.hash] = true;
+
+        uint8 decimals = IBridgedToken(vm.token).decimals();
+        uint256 amount = _denormalize(vm.amount, decimals);
+        uint256 fee = _denormalize(vm.fee, decimals);
+        require(fee <= amount, "fee exceeds amount");
+
+        require(IBridgedToken(vm.token).transfer(vm.to, amount - fee), "transfer failed");
+        if (fee > 0) {
+            require(IBridgedToken(vm.token).transfer(msg.sender, fee), "fee transfer failed");
+        }
+
+        emit TransferRedeemed(vm.emitterChainId, vm.emitterAddress, vm.sequence);
+    }
+
+    function completeTransfers(bytes[] memory encodedVms) external {
+        for (uint256 i = 0; i < encodedVms.length; i++) {
+            completeTransfer(encodedVms[i]);
+        }
+    }
+
+    function parseAndVerifyTransferVM(bytes memory encodedVm) public view returns (TransferVM memory vm) {
+        require(_read(encodedVm, 0, 1) == VAA_VERSION, "invalid VAA version");
+        require(_read(encodedVm, 1, 4) == guardianSetIndex, "invalid guardian set");
+
+        uint256 signaturesCount = _read(encodedVm, 5, 1);
+        uint256 bodyOffset = 6 + signaturesCount * SIGNATURE_SIZE;
+        require(encodedVm.length == bodyOffset + BODY_HEADER_SIZE + TRANSFER_PAYLOAD_SIZE, "invalid VAA size");
+
+        bytes32 bodyHash;
+        assembly {
+            bodyHash := keccak256(add(add(encodedVm, 32), bodyOffset), sub(mload(encodedVm), bodyOffset))
+        }
+        vm.hash = keccak256(abi.encodePacked(bodyHash));
+
+        _verifySignatures(encodedVm, signaturesCount, vm.hash);
+
+        vm.emitterChainId = uint16(_read(encodedVm, bodyOffset + 8, 2));
+        vm.emitterAddress = bytes32(_read(encodedVm, bodyOffset + 10, 32));
+        vm.sequence = uint64(_read(encodedVm, bodyOffset + 42, 8));
+
+        uint256 payloadOffset = bodyOffset + BODY_HEADER_SIZE;
+        require(_read(encodedVm, payloadOffset, 1) == TRANSFER_PAYLOAD_ID, "not a transfer payload");
+        vm.amount = _read(encodedVm, payloadOffset + 1, 32);
+        vm.token = address(uint160(_read(encodedVm, payloadOffset + 33, 32)));
+        vm.tokenChain = uint16(_read(encodedVm, payloadOffset + 65, 2));
+        vm.to = address(uint160(_read(encodedVm, payloadOffset + 67, 32)));
+        vm.toChain = uint16(_read(encodedVm, payloadOffset + 99, 2));
+        vm.fee = _read(encodedVm, payloadOffset + 101, 32);
+    }
+
+    function _verifySignatures(bytes memory encodedVm, uint256 signaturesCount, bytes32 hash) internal view {
+        require(signaturesCount >= quorum(), "no quorum");
+
+        uint256 offset = 6;
+        uint256 nextGuardianIndex = 0;
+        for (uint256 i = 0; i < signaturesCount; i++) {
+            uint256 guardianIndex = _read(encodedVm, offset, 1);
+            require(guardianIndex >= nextGuardianIndex, "signature indices must be ascending");
+            require(guardianIndex < guardians.length, "guardian index out of bounds");
+
+            bytes32 r = bytes32(_read(encodedVm, offset + 1, 32));
+            bytes32 s = bytes32(_read(encodedVm, offset + 33, 32));
+            uint8 v = uint8(_read(encodedVm, offset + 65, 1)) + 27;
+            require(ecrecover(hash, v, r, s) == guardians[guardianIndex], "VM signature invalid");
+
+            nextGuardianIndex = guardianIndex + 1;
+            offset += SIGNATURE_SIZE;
+        }
+    }
+
+    function _denormalize(uint256 amount, uint8 decimals) internal pure returns (uint256) {
+        if (decimals > NORMALIZED_DECIMALS) {
+            return amount * 10 ** (decimals - NORMALIZED_DECIMALS);
+        }
+        return amount;
+    }
+
+    /**
+     * @dev Reads a big-endian unsigned integer of `size` bytes at `offset`.
+     */
+    function _read(bytes memory data, uint256 offset, uint256 size) internal pure returns (uint256 value) {
+        require(offset + size <= data.length, "read out of bounds");
+        assembly {
+            value := shr(sub(256, mul(size, 8)), mload(add(add(data, 32), offset)))
+        }
+    }
+}
@@ -0,0 +1,42 @@
+from brownie import web3
+from utils import config, log
+from utils.beth import write_beth_holders_csv
+from utils.beth_indexer import TransferIndexer
+from utils.beth_snapshot import write_snapshot
+
+
+def main():
+    """
+    Builds the bETH holders snapshot from the token `Transfer` events.
+
+    Env variables:
+        DB          SQLite database to keep the index in, defaults to `beth-holders.sqlite3`
+        FROM_BLOCK  block to start indexing from if the database is empty, defaults to 0
+        TO_BLOCK    block to index up to, defaults to the latest one
+        OUTPUT      output files prefix, defaults to `beth-holders-<block>`
+    """
+
+    db_path = config.get_env("DB", is_required=False, default="beth-holders.sqlite3")
+    from_block = int(config.get_env("FROM_BLOCK", is_required=False, default=0))
+    to_block = int(config.get_env("TO_BLOCK", is_required=False, default=web3.eth.block_number))
+    output = config.get_env("OUTPUT", is_required=False, default=f"beth-holders-{to_block}")
+
+    with TransferIndexer(db_path, config.beth_token_addr, start_block=from_block) as indexer:
+        log.nb("Resuming from block", indexer.last_block + 1)
+
+        def on_chunk(chunk_from_block, chunk_to_block, logs_count):
+            config.progress(chunk_to_block - from_block, max(to_block - from_block, 1))
+
+        logs_count = indexer.sync(to_block, on_chunk)
+        print()
+
+        log.ok("Processed logs", logs_count)
+        log.ok("Indexed up to block", indexer.last_block)
+
+        holders = list(indexer.holders())
+
+    write_beth_holders_csv(f"{output}.csv", holders)
+    write_snapshot(f"{output}.bin", holders, to_block)
+
+    log.ok("Holders", len(holders))
+    log.ok("Snapshot written", f"{output}.csv")
@@ -0,0 +1,48 @@
+import json
+
+from brownie import web3
+from utils import config, log
+from utils.beth import import_beth_holders_from_csv, write_beth_holders_csv
+from utils.beth_snapshot import write_snapshot
+from utils.beth_reconcile import fetch_token_balances, reconcile_holders
+
+
+def read_extra_holders(path):
+    with open(path) as f:
+        return [bytes.fromhex(line.strip()[2:]) for line in f if line.strip().startswith("0x")]
+
+
+def main():
+    """
+    Refreshes `beth-holders.csv` with the actual bETH balances.
+
+    Env variables:
+        BLOCK          block to pin all the reads to, defaults to the latest one
+        OUTPUT         output files prefix, defaults to `beth-holders-<block>`
+        EXTRA_HOLDERS  optional file with candidate holder addresses, one per line
+    """
+
+    block = int(config.get_env("BLOCK", is_required=False, default=web3.eth.block_number))
+    output = config.get_env("OUTPUT", is_required=False, default=f"beth-holders-{block}")
+    extra_holders_path = config.get_env("EXTRA_HOLDERS", is_required=False)
+
+    holders = import_beth_holders_from_csv()
+    addresses = [holder.address for holder in holders]
+    if extra_holders_path is not None:
+        known = set(addresses)
+        addresses += [address for address in read_extra_holders(extra_holders_path) if address not in known]
+
+    log.nb("Reading bETH balances", f"{len(addresses)} addresses at block {block}")
+    balances = dict(zip(addresses, fetch_token_balances(config.beth_token_addr, addresses, block)))
+
+    (refreshed, diff) = reconcile_holders(holders, balances, block)
+
+    write_beth_holders_csv(f"{output}.csv", refreshed)
+    write_snapshot(f"{output}.bin", refreshed, block)
+    with open(f"{output}.diff.json", "w") as f:
+        json.dump(diff, f, indent=2)
+
+    log.ok("Changed holders", len(diff["changed"]))
+    log.ok("Emptied holders", len(diff["emptied"]))
+    log.ok("New holders", len(diff["new"]))
+    log.ok("Snapshot written", f"{output}.csv")
@@ -1,9 +1,12 @@
 import pytest
-from brownie import ZERO_ADDRESS, chain, interface
+from brownie import ZERO_ADDRESS, chain
 
 from scripts.deploy import deploy
 
+from utils.abi import get_contract
+
 from utils.config import (
+    get_env,
     ldo_vote_executors_for_tests,
     lido_dao_voting_addr,
     lido_accounting_oracle,
@@ -15,8 +18,34 @@ from utils.dao import (
     create_vote,
     encode_proxy_upgrade,
     encode_finalize_upgrade_v4,
-    encode_call_script
+    encode_call_script,
+    force_pass_vote,
+)
+from utils.evm_backend import get_backend
+from utils.fixture_profiler import FixtureProfiler, profile_report_path
+from utils.mainnet_fork import UpgradedState
+from utils.parallel import (
+    NETWORK_INPUT,
+    SCOPES_INPUT,
+    RunDurations,
+    is_parallel,
+    is_worker,
+    load_durations,
+    make_scheduler,
+    order_by_duration,
+    remove_scopes,
+    save_durations,
+    scope_of,
+    scopes_path,
+    selected_network,
+    upgraded_module_of,
+    upgraded_state_last,
+    use_free_port,
+    uses_upgraded_state,
+    write_scopes,
 )
+from utils.rebase import OracleReporter, force_rebase
+from utils.rpc_trace import RpcTracer, trace_report_path
 
 UST_TOKEN = "0xa693B19d2931d498c5B318dF961919BB4aee87a5"
 STETH_TOKEN = "0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84"
@@ -24,6 +53,22 @@ USDC_TOKEN = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
 CHAINLINK_STETH_ETH_FEED = "0x86392dC19c0b719886221c78AB11eb8Cf5c52812"
 CHAINLINK_UST_ETH_FEED = "0xa20623070413d42a5C01Db2c8111640DD7A5A03a"
 CHAINLINK_USDC_ETH_FEED = "0x986b5E1e1755e3C2440e960477f25201B0a8bbD4"
+LDO_HOLDER = "0xAD4f7415407B83a081A0Bee22D05A8FDC18B42da"
+
+# pass DAO votes by writing the Voting storage instead of voting and waiting for the vote end
+FAST_DAO_VOTES = get_env('FAST_DAO_VOTES', is_required=False, default='0').lower() in ('1', 'true', 'yes')
+# change the stETH share rate by writing the Lido storage instead of sending oracle reports
+FAST_REBASES = get_env('FAST_REBASES', is_required=False, default='0').lower() in ('1', 'true', 'yes')
+# record time, RPC calls and node memory of every fixture and test, see `utils/fixture_profiler.py`
+PROFILE_TESTS = get_env('PROFILE_TESTS', is_required=False, default='0').lower() in ('1', 'true', 'yes')
+PROFILE_BUDGETS = get_env('PROFILE_BUDGETS', is_required=False)
+# log the JSON-RPC requests and report the redundant reads, optionally answering them from a cache
+RPC_TRACE = get_env('RPC_TRACE', is_required=False, default='0').lower() in ('1', 'true', 'yes')
+RPC_READ_CACHE = get_env('RPC_READ_CACHE', is_required=False, default='0').lower() in ('1', 'true', 'yes')
+
+rpc_tracer = RpcTracer(read_cache=RPC_READ_CACHE) if RPC_TRACE or RPC_READ_CACHE else None
+# the state after the upgrade of `vault_v4`
+upgraded_state = UpgradedState()
 
 @pytest.fixture(scope='function', autouse=True)
 def shared_setup(fn_isolation):
@@ -81,12 +126,12 @@ def another_stranger(accounts, deployer):
 
 
 @pytest.fixture(scope='module')
-def steth_token(interface):
-    return interface.ERC20(STETH_TOKEN)
+def steth_token():
+    return get_contract(STETH_TOKEN)
 
 @pytest.fixture(scope='module')
-def lido(interface, steth_token):
-    return interface.Lido(steth_token.address)
+def lido(steth_token):
+    return get_contract(steth_token.address)
 
 
 @pytest.fixture(scope='module')
@@ -98,18 +143,18 @@ def beth_token(deployer, admin, bEth):
     return bEth.deploy("bETH", ZERO_ADDRESS, admin, {'from': deployer})
 
 @pytest.fixture(scope='module')
-def hash_consensus_for_accounting_oracle(interface):
-    return interface.HashConsensus(lido_accounting_oracle_hash_consensus)
+def hash_consensus_for_accounting_oracle():
+    return get_contract(lido_accounting_oracle_hash_consensus)
 
 @pytest.fixture(scope='module')
 def mock_bridge(accounts):
     return accounts.add()
 
 @pytest.fixture(scope='module')
-def mock_bridge_connector(beth_token, deployer, mock_bridge, MockBridgeConnector, interface, accounts):
+def mock_bridge_connector(beth_token, deployer, mock_bridge, MockBridgeConnector, accounts):
     mock_bridge_connector =  MockBridgeConnector.deploy(beth_token, mock_bridge, {'from': deployer})
 
-    ust_token = interface.UST(UST_TOKEN)
+    ust_token = get_contract(UST_TOKEN)
     ust_owner = accounts.at(ust_token.owner(), force=True)
     ust_amount = 10_000_000 * 10**18
 
@@ -136,8 +181,8 @@ We use a simple version of `simulate_report` from here:
 https://github.com/lidofinance/scripts/blob/master/utils/test/oracle_report_helpers.py#L239
 """
 @pytest.fixture(scope='module')
-def lido_oracle_report(interface, accounts, steth_token, hash_consensus_for_accounting_oracle):
-    lido = interface.Lido(steth_token.address)
+def lido_oracle_report(accounts, steth_token, hash_consensus_for_accounting_oracle):
+    lido = get_contract(steth_token.address)
     accounting_oracle = accounts.at(lido_accounting_oracle, force=True)
 
     (refSlot, _) = hash_consensus_for_accounting_oracle.getCurrentFrame()
@@ -169,13 +214,37 @@ def lido_oracle_report(interface, accounts, steth_token, hash_consensus_for_acco
         )
     return report_beacon_state
 
+@pytest.fixture(scope='module')
+def make_oracle_reporter(accounts, lido, hash_consensus_for_accounting_oracle):
+    """Factory of reporters sending sequences of oracle reports, see `utils/rebase.py`"""
+    accounting_oracle = accounts.at(lido_accounting_oracle, force=True)
+
+    def make():
+        return OracleReporter(lido, hash_consensus_for_accounting_oracle, accounting_oracle, fast=FAST_REBASES)
+
+    return make
+
+@pytest.fixture(scope='module')
+def rebase_steth(lido, lido_oracle_report):
+    """
+    Changes the CL balance by `cl_diff`, for the tests that only need the share rate to change.
+    Sends no report if `FAST_REBASES` is set, so the fee shares aren't minted then.
+    """
+    def rebase(cl_diff):
+        if FAST_REBASES:
+            force_rebase(lido, cl_diff)
+        else:
+            lido_oracle_report(cl_diff)
+
+    return rebase
+
 @pytest.fixture(scope='module')
 def ldo_holder(accounts):
-    return accounts.at('0xAD4f7415407B83a081A0Bee22D05A8FDC18B42da', force=True)
+    return accounts.at(LDO_HOLDER, force=True)
 
 @pytest.fixture(scope='module')
-def dao_voting(interface):
-    return interface.Voting(lido_dao_voting_addr)
+def dao_voting():
+    return get_contract(lido_dao_voting_addr)
 
 class Helpers:
     accounts = None
@@ -222,11 +291,17 @@ class Helpers:
     def pass_and_exec_dao_vote(vote_id):
         print(f'executing vote {vote_id}')
 
+        helper_acct = Helpers.accounts[0]
+
+        if FAST_DAO_VOTES:
+            force_pass_vote(Helpers.dao_voting, vote_id)
+            tx = Helpers.dao_voting.executeVote(vote_id, {'from': helper_acct})
+            print(f'vote {vote_id} executed')
+            return tx
+
         # together these accounts hold 15% of LDO total supply
         # ldo_vote_executors_for_tests
 
-        helper_acct = Helpers.accounts[0]
-
         for holder_addr in ldo_vote_executors_for_tests:
             print(f'voting from {holder_addr}')
             helper_acct.transfer(holder_addr, '0.1 ether')
@@ -238,9 +313,10 @@ class Helpers:
         chain.mine()
 
         assert Helpers.dao_voting.canExecute(vote_id)
-        Helpers.dao_voting.executeVote(vote_id, {'from': helper_acct})
+        tx = Helpers.dao_voting.executeVote(vote_id, {'from': helper_acct})
 
         print(f'vote {vote_id} executed')
+        return tx
 
 @pytest.fixture(scope='module')
 def helpers(accounts, dao_voting):
@@ -249,8 +325,8 @@ def helpers(accounts, dao_voting):
     return Helpers
 
 def deploy_and_start_dao_vote(tx_params):
-    voting = interface.Voting(lido_dao_voting_addr)
-    token_manager = interface.TokenManager(lido_dao_token_manager_address)
+    voting = get_contract(lido_dao_voting_addr)
+    token_manager = get_contract(lido_dao_token_manager_address)
 
     anchor_new_vault = deploy(tx_params)
 
@@ -279,4 +355,86 @@ def deploy_vault_and_pass_dao_vote(ldo_holder, helpers):
         helpers.pass_and_exec_dao_vote(vote_id)
         return vault
 
-    return deploy
\ No newline at end of file
+    return deploy
+
+@pytest.fixture(scope='module')
+def deploy_vault_and_start_dao_vote(ldo_holder):
+    def start():
+        return deploy_and_start_dao_vote({'from': ldo_holder})
+
+    return start
+
+@pytest.fixture(scope='session')
+def evm_backend():
+    """Read-only backend of the fork state selected by the `EVM_BACKEND` env variable"""
+    return get_backend()
+
+@pytest.fixture(scope='session')
+def vault_v4(accounts):
+    """
+    Upgrades the vault to v4 once per session and returns the new implementation.
+
+    The tests requesting this fixture are run after all the other ones, see
+    `pytest_collection_modifyitems`, and every module of them starts from the state
+    right after the upgrade, see `pytest_runtest_setup`. `fn_isolation` reverts to
+    the module state after every test.
+    """
+    Helpers.accounts = accounts
+    Helpers.dao_voting = get_contract(lido_dao_voting_addr)
+    (vault, vote_id) = deploy_and_start_dao_vote({'from': accounts.at(LDO_HOLDER, force=True)})
+    Helpers.pass_and_exec_dao_vote(vote_id)
+    upgraded_state.save()
+    return vault
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    # runs after brownie has set the worker node port to `port + worker index`
+    if is_worker(config):
+        use_free_port(config)
+    elif is_parallel(config):
+        config.scopes_path = scopes_path()
+
+    # the xdist controller runs no tests, the workers write reports of their own
+    if (PROFILE_TESTS or PROFILE_BUDGETS) and (is_worker(config) or not is_parallel(config)):
+        config.pluginmanager.register(
+            FixtureProfiler(profile_report_path(config), PROFILE_BUDGETS), 'fixture-profiler'
+        )
+    if rpc_tracer is not None and (is_worker(config) or not is_parallel(config)):
+        rpc_tracer.install()
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    node.workerinput[SCOPES_INPUT] = node.config.scopes_path
+    node.workerinput[NETWORK_INPUT] = selected_network(node.config)
+
+@pytest.hookimpl(optionalhook=True, tryfirst=True)
+def pytest_xdist_make_scheduler(config, log):
+    return make_scheduler(config, log, config.scopes_path)
+
+def pytest_collection_modifyitems(config, items):
+    items[:] = upgraded_state_last(items)
+    if is_parallel(config):
+        items[:] = order_by_duration(items, load_durations())
+    if is_worker(config):
+        write_scopes(config.workerinput[SCOPES_INPUT], {item.nodeid: scope_of(item) for item in items})
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    # before any fixture of the item is set up
+    if uses_upgraded_state(item):
+        upgraded_state.enter_module(upgraded_module_of(item))
+
+run_durations = RunDurations()
+
+def pytest_runtest_logreport(report):
+    # the controller gets the reports of all the workers
+    run_durations.record(report)
+
+def pytest_sessionfinish(session):
+    if not is_worker(session.config):
+        save_durations(run_durations.complete())
+    if hasattr(session.config, 'scopes_path'):
+        remove_scopes(session.config.scopes_path)
+    if rpc_tracer is not None and rpc_tracer.calls:
+        rpc_tracer.uninstall()
+        rpc_tracer.write_report(trace_report_path(session.config))
@@ -0,0 +1,53 @@
+from eth_abi import encode_single
+
+from utils.abi import AbiRegistry, abi_files, abi_files_hash, get_contract, get_registry
+from utils.config import beth_token_addr, vault_proxy_addr
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+HOLDER = "0x3e40D73EB977Dc6a537aF587D48316feE66E9C8c"
+
+
+def test_registry_is_saved_and_invalidated(tmp_path):
+    files = abi_files()
+    path = str(tmp_path / "abi_registry.json")
+
+    registry = AbiRegistry(abi_files_hash(files), {"Voting": get_registry().abis["Voting"]})
+    registry.save(path)
+
+    loaded = AbiRegistry.load(path, registry.files_hash)
+    assert loaded.abis == registry.abis
+    assert loaded.functions == registry.functions
+    assert loaded.events == registry.events
+    assert AbiRegistry.load(path, "outdated") is None
+    assert AbiRegistry.load(str(tmp_path / "missing.json")) is None
+
+
+def test_selectors_and_topics():
+    registry = get_registry()
+
+    assert registry.function(bytes.fromhex("a9059cbb")).signature == "transfer(address,uint256)"
+    assert registry.event(bytes.fromhex(TRANSFER_TOPIC[2:])).signature == "Transfer(address,address,uint256)"
+
+
+def test_decode_transfer_log():
+    log = {
+        "topics": [
+            TRANSFER_TOPIC,
+            "0x" + encode_single("address", HOLDER).hex(),
+            "0x" + encode_single("address", beth_token_addr).hex(),
+        ],
+        "data": "0x" + encode_single("uint256", 10**18).hex(),
+    }
+
+    (name, args) = get_registry().decode_log(log)
+
+    assert name == "Transfer"
+    assert list(args.values()) == [HOLDER.lower(), beth_token_addr.lower(), 10**18]
+
+
+def test_contract_handles_are_cached():
+    vault = get_contract(vault_proxy_addr)
+
+    assert get_contract(vault_proxy_addr) is vault
+    assert vault.version() >= 3
+    assert get_contract(beth_token_addr).symbol() == "bETH"
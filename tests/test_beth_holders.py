@@ -0,0 +1,109 @@
+import pytest
+
+from utils.beth import (
+    BethHolder,
+    iter_beth_holders,
+    import_beth_holders_from_csv,
+    parse_balance,
+    format_balance,
+)
+from utils.beth_snapshot import HolderSnapshot, csv_to_snapshot, snapshot_to_csv
+from utils.beth_reconcile import reconcile_holders
+
+
+@pytest.mark.parametrize(
+    "balance,expected",
+    [
+        ("1", 10**18),
+        ("2,745.26921048", 2745_269210480000000000),
+        ("155.30249327054199755", 155_302493270541997550),
+        ("0.000000000000000001", 1),
+        ("1,000,000.5", 1_000_000_500000000000000000),
+    ],
+)
+def test_parse_balance_is_exact(balance, expected):
+    assert parse_balance(balance) == expected
+
+
+@pytest.mark.parametrize("balance", ["1", "2,745.26921048", "0.000000000000000001", "1,000,000.5", "0"])
+def test_format_balance_round_trip(balance):
+    assert format_balance(parse_balance(balance)) == balance
+
+
+def test_parse_balance_rejects_extra_decimals():
+    with pytest.raises(AssertionError):
+        parse_balance("0.0000000000000000001")
+
+
+def test_holders_loader(tmp_path):
+    path = tmp_path / "holders.csv"
+    path.write_text(
+        '"HolderAddress","Balance","PendingBalanceUpdate"\n'
+        '"0x3ee18b2214aff97000d974cf647e7c347e8fa585","2,745.26921048","No"\n'
+        '"0xbec5e1ad5422e52821735b59b39dc03810aae682","1","Yes"\n'
+    )
+
+    holders = iter_beth_holders(str(path))
+
+    assert next(holders) == BethHolder(
+        bytes.fromhex("3ee18b2214aff97000d974cf647e7c347e8fa585"), 2745_269210480000000000, False
+    )
+    holder = next(holders)
+    assert holder.address_hex == "0xbec5e1ad5422e52821735b59b39dc03810aae682"
+    assert holder.pending
+    assert next(holders, None) is None
+
+
+def test_actual_holders_snapshot_is_cached():
+    holders = import_beth_holders_from_csv()
+
+    assert len(holders) > 0
+    assert import_beth_holders_from_csv() is holders
+    assert all(len(holder.address) == 20 for holder in holders)
+
+
+def test_binary_snapshot_round_trip(tmp_path):
+    holders = import_beth_holders_from_csv()
+    snapshot_path = str(tmp_path / "holders.bin")
+    csv_path = str(tmp_path / "holders.csv")
+
+    csv_to_snapshot(snapshot_path=snapshot_path, block=17965130)
+
+    with HolderSnapshot(snapshot_path) as snapshot:
+        assert snapshot.block == 17965130
+        assert len(snapshot) == len(holders)
+        assert list(snapshot) == list(holders)
+
+        for row, holder in enumerate(holders):
+            assert snapshot.find(holder.address) == row
+            assert snapshot.balance_of(holder.address_hex) == holder.balance
+
+        assert snapshot.find("0x" + "00" * 20) is None
+        assert snapshot.balance_of(b"\xff" * 20) == 0
+
+    assert snapshot_to_csv(snapshot_path, csv_path) == 17965130
+    assert list(iter_beth_holders(csv_path)) == list(holders)
+
+
+def test_reconcile_holders():
+    [a, b, c, d, e] = [bytes([i]) * 20 for i in range(1, 6)]
+    holders = [
+        BethHolder(a, 3 * 10**18, False),
+        BethHolder(b, 2 * 10**18, True),
+        BethHolder(c, 10**18, False),
+        BethHolder(e, 10, True),
+    ]
+    balances = {a: 3 * 10**18, b: 0, c: 5 * 10**18, e: 10, d: 7}
+
+    (refreshed, diff) = reconcile_holders(holders, balances, block=18000000)
+
+    assert refreshed == [
+        BethHolder(c, 5 * 10**18, False),
+        BethHolder(a, 3 * 10**18, False),
+        BethHolder(e, 10, True),
+        BethHolder(d, 7, False),
+    ]
+    assert diff["block"] == 18000000
+    assert diff["changed"] == [{"address": "0x" + c.hex(), "old_balance": 10**18, "new_balance": 5 * 10**18}]
+    assert diff["emptied"] == [{"address": "0x" + b.hex(), "old_balance": 2 * 10**18, "new_balance": 0}]
+    assert diff["new"] == [{"address": "0x" + d.hex(), "old_balance": 0, "new_balance": 7}]
@@ -0,0 +1,85 @@
+import pytest
+from brownie import chain
+
+from utils.beth_indexer import TRANSFER_TOPIC, TransferIndexer
+
+TOKEN = "0x707F9118e33A9B8998beA41dd0d46f38bb963FC8"
+ZERO = bytes(20)
+
+
+def transfer_log(block, sender, receiver, value):
+    return {
+        "blockNumber": hex(block),
+        "topics": [TRANSFER_TOPIC, "0x" + sender.hex().zfill(64), "0x" + receiver.hex().zfill(64)],
+        "data": hex(value),
+    }
+
+
+class LocalNode:
+    """Node stand-in serving `eth_getLogs` from a list of logs, with a response size limit"""
+
+    def __init__(self, logs, max_logs):
+        self.logs = logs
+        self.max_logs = max_logs
+        self.requests = 0
+
+    def __call__(self, method, params):
+        assert method == "eth_getLogs"
+        self.requests += 1
+        [query] = params
+        (from_block, to_block) = (int(query["fromBlock"], 16), int(query["toBlock"], 16))
+        logs = [log for log in self.logs if from_block <= int(log["blockNumber"], 16) <= to_block]
+        if len(logs) > self.max_logs:
+            raise ValueError("query returned more than the allowed number of results")
+        return logs
+
+
+@pytest.fixture
+def synthetic_logs():
+    [a, b, c] = [bytes([i]) * 20 for i in range(1, 4)]
+    logs = []
+    for block in range(100, 1100):
+        logs.append(transfer_log(block, ZERO, a, 10))
+        logs.append(transfer_log(block, a, b, 3))
+        if block % 10 == 9:
+            logs.append(transfer_log(block, b, c, 30))
+            logs.append(transfer_log(block, c, ZERO, 10))
+    return (logs, a, b, c)
+
+
+def test_indexer_adapts_chunks_and_resumes(tmp_path, synthetic_logs):
+    (logs, a, b, c) = synthetic_logs
+    node = LocalNode(logs, max_logs=500)
+    db_path = str(tmp_path / "index.sqlite3")
+
+    with TransferIndexer(db_path, TOKEN, start_block=100, request=node, chunk_size=10_000) as indexer:
+        indexer.sync(599)
+        assert indexer.last_block == 599
+
+    with TransferIndexer(db_path, TOKEN, start_block=100, request=node) as indexer:
+        assert indexer.last_block == 599
+        indexer.sync(1099)
+
+        assert indexer.last_block == 1099
+        assert indexer.balance_of(a) == 7 * 1000
+        assert indexer.balance_of(b) == 3 * 1000 - 30 * 100
+        assert indexer.balance_of(c) == 20 * 100
+        assert indexer.total_supply() == 10 * 1000 - 10 * 100
+        assert [holder.address for holder in indexer.holders()] == [a, c]
+
+
+def test_indexer_matches_token_balances(tmp_path, beth_token, admin, deployer, stranger, another_stranger):
+    start_block = chain.height
+
+    beth_token.set_minter(deployer, {"from": admin})
+    beth_token.mint(stranger, 10**18, {"from": deployer})
+    beth_token.mint(another_stranger, 2 * 10**18, {"from": deployer})
+    beth_token.transfer(deployer, 5 * 10**17, {"from": stranger})
+    beth_token.burn(another_stranger, 10**18, {"from": deployer})
+
+    with TransferIndexer(str(tmp_path / "index.sqlite3"), beth_token.address, start_block=start_block) as indexer:
+        indexer.sync(chain.height)
+
+        for account in [stranger, another_stranger, deployer]:
+            assert indexer.balance_of(bytes.fromhex(account.address[2:])) == beth_token.balanceOf(account)
+        assert indexer.total_supply() == beth_token.totalSupply()
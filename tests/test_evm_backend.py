@@ -0,0 +1,109 @@
+import os
+
+import pytest
+import utils.evm_backend
+
+from utils import config
+from utils.abi import get_contract
+from utils.evm_backend import (
+    BACKEND_PYEVM,
+    DEFAULT_FORK_BLOCK,
+    AccountState,
+    ForkState,
+    InProcessBackend,
+    UnrecordedStateError,
+    load_fork_state,
+)
+from utils.rpc_cache import RPC_CACHE_STORE, RpcResponseStore, cache_key
+
+BLOCK_TAG = hex(DEFAULT_FORK_BLOCK)
+CONTRACT = "0x00000000000000000000000000000000000000AA"
+# returns the storage slot 0
+RUNTIME_CODE = bytes.fromhex("60005460005260206000f3")
+# returns the storage slot 1
+SLOT_1_CODE = bytes.fromhex("60015460005260206000f3")
+
+
+def test_load_fork_state(tmp_path):
+    store = RpcResponseStore(str(tmp_path / "cache.sqlite3"))
+    address = CONTRACT.lower()
+    store.put_many(
+        [
+            (cache_key("eth_getCode", [address, BLOCK_TAG]), "0x" + RUNTIME_CODE.hex()),
+            (cache_key("eth_getBalance", [address, BLOCK_TAG]), "0x10"),
+            (cache_key("eth_getStorageAt", [address, "0x0", BLOCK_TAG]), "0x" + f"{42:064x}"),
+            (cache_key("eth_getStorageAt", [address, "0x1", BLOCK_TAG]), "0x" + "0" * 64),
+            # state of another block is ignored
+            (cache_key("eth_getStorageAt", [address, "0x2", hex(DEFAULT_FORK_BLOCK - 1)]), "0x" + f"{1:064x}"),
+            (cache_key("eth_getBlockByNumber", [BLOCK_TAG, False]), {"timestamp": "0x64", "gasLimit": "0x1c9c380"}),
+        ]
+    )
+
+    state = load_fork_state(store, contracts=(CONTRACT,))
+
+    assert (state.timestamp, state.gas_limit) == (100, 30_000_000)
+    assert state.accounts == {CONTRACT: AccountState(16, 0, RUNTIME_CODE, {0: 42})}
+    assert state.recorded_slots == {CONTRACT: {0, 1}}
+
+    with pytest.raises(AssertionError, match="no recorded state"):
+        load_fork_state(store, contracts=(config.vault_proxy_addr,))
+
+
+def fork_state(code: bytes, recorded_slots: set[int]) -> ForkState:
+    return ForkState(
+        DEFAULT_FORK_BLOCK,
+        1692000000,
+        30_000_000,
+        {CONTRACT: AccountState(0, 0, code, {0: 42})},
+        {CONTRACT: frozenset(recorded_slots)},
+    )
+
+
+def test_in_process_backend_executes_fork_code():
+    pytest.importorskip("eth_tester")
+    state = fork_state(RUNTIME_CODE, {0})
+    backend = InProcessBackend(state)
+
+    assert int.from_bytes(backend.web3.eth.call({"to": CONTRACT}), "big") == 42
+    assert backend.web3.eth.get_block("latest")["timestamp"] >= state.timestamp
+
+
+def test_in_process_backend_unrecorded_storage(monkeypatch):
+    pytest.importorskip("eth_tester")
+
+    # a recorded zero slot is read as is
+    backend = InProcessBackend(fork_state(SLOT_1_CODE, {0, 1}))
+    assert int.from_bytes(backend.web3.eth.call({"to": CONTRACT}), "big") == 0
+
+    backend = InProcessBackend(fork_state(SLOT_1_CODE, {0}))
+    with pytest.raises(UnrecordedStateError, match="slot 0x1 of"):
+        backend.web3.eth.call({"to": CONTRACT})
+
+    requests = []
+
+    def batch_request(calls, batch_size, endpoint_uri):
+        requests.append((calls, endpoint_uri))
+        return ["0x" + f"{7:064x}"]
+
+    monkeypatch.setattr(utils.evm_backend, "batch_request", batch_request)
+    backend = InProcessBackend(fork_state(SLOT_1_CODE, {0}), fallback_uri="http://localhost:9545")
+    for _ in range(2):
+        assert int.from_bytes(backend.web3.eth.call({"to": CONTRACT}), "big") == 7
+    # the fetched slot is remembered
+    assert requests == [([("eth_getStorageAt", [CONTRACT, "0x1", BLOCK_TAG])], "http://localhost:9545")]
+
+
+@pytest.mark.skipif(not os.path.exists(RPC_CACHE_STORE), reason="no recorded fork state")
+def test_in_process_reads_match_fork(evm_backend):
+    pytest.importorskip("eth_tester")
+    backend = evm_backend if evm_backend.name == BACKEND_PYEVM else InProcessBackend.from_store()
+
+    reads = [
+        (config.vault_proxy_addr, "version"),
+        (config.beth_token_addr, "totalSupply"),
+        (config.steth_token_addr, "getTotalPooledEther"),
+        (config.lido_dao_voting_addr, "votesLength"),
+    ]
+    for (address, method) in reads:
+        expected = getattr(get_contract(address), method).call(block_identifier=DEFAULT_FORK_BLOCK)
+        assert getattr(backend.contract(address).functions, method)().call() == expected, method
@@ -0,0 +1,37 @@
+from utils.evm_script import (
+    EMPTY_CALLSCRIPT,
+    CallScriptBuilder,
+    encode_call_script,
+    encode_call_script_bytes,
+)
+
+VAULT_PROXY = "0xA2F987A546D4CD1c607Ee8141276876C26b72Bdf"
+AGENT = "0x3e40D73EB977Dc6a537aF587D48316feE66E9C8c"
+
+
+def test_empty_call_script():
+    assert encode_call_script([]) == EMPTY_CALLSCRIPT
+    assert encode_call_script_bytes([]) == bytes.fromhex(EMPTY_CALLSCRIPT[2:])
+
+
+def test_call_script_layout():
+    script = encode_call_script([(VAULT_PROXY, "0xc4c7b5a9"), (AGENT, b"\x01\x02\x03")])
+
+    assert script == (
+        "0x00000001"
+        + VAULT_PROXY[2:].lower() + "00000004" + "c4c7b5a9"
+        + AGENT[2:].lower() + "00000003" + "010203"
+    )
+
+
+def test_bulk_builder_matches_list_encoding():
+    actions = [(VAULT_PROXY if i % 2 else AGENT, "0x" + "ab" * i) for i in range(1000)]
+
+    builder = CallScriptBuilder()
+    for to, calldata in actions:
+        builder.add(to, calldata)
+
+    assert builder.actions_count == len(actions)
+    assert builder.to_hex() == encode_call_script(actions)
+    assert builder.to_bytes() == encode_call_script_bytes(actions)
+    assert len(builder) == 4 + sum(20 + 4 + len(calldata[2:]) // 2 for _, calldata in actions)
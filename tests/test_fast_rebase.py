@@ -0,0 +1,34 @@
+import pytest
+import utils.config as config
+
+from utils.abi import get_contract
+from utils.helpers import ETH
+from utils.mainnet_fork import node_snapshot
+from utils.rebase import force_rebase
+
+
+def rates(lido, vault):
+    return (lido.getTotalPooledEther(), lido.getPooledEthByShares(10**18), vault.get_rate())
+
+
+def test_force_rebase_changes_cl_balance(lido):
+    (deposited_validators, validators, cl_balance) = lido.getBeaconStat()
+    total_pooled_ether = lido.getTotalPooledEther()
+
+    force_rebase(lido, ETH(-1_000))
+
+    assert lido.getBeaconStat() == (deposited_validators, validators, cl_balance - ETH(1_000))
+    assert lido.getTotalPooledEther() == total_pooled_ether - ETH(1_000)
+
+
+@pytest.mark.parametrize('cl_diff', [ETH(-1_000), ETH(-100_000)])
+def test_force_rebase_matches_oracle_report(vault_v4, lido, lido_oracle_report, cl_diff):
+    vault = get_contract(config.vault_proxy_addr)
+
+    with node_snapshot():
+        lido_oracle_report(cl_diff)
+        reported = rates(lido, vault)
+
+    # no fees are minted on a negative rebase, so both ways give the same rates
+    force_rebase(lido, cl_diff)
+    assert rates(lido, vault) == reported
@@ -0,0 +1,35 @@
+from brownie import chain
+
+from utils.abi import get_contract
+from utils.config import vault_proxy_addr
+from utils.dao import force_pass_vote
+from utils.storage import mapping_slot, read_packed, write_packed
+
+
+def test_packed_storage_helpers():
+    word = write_packed(0x01, 1, 8, 0x1122334455667788)
+
+    assert word == 0x112233445566778801
+    assert read_packed(word, 1, 8) == 0x1122334455667788
+    assert read_packed(word, 0, 1) == 1
+    assert write_packed(word, 1, 8, 0) == 0x01
+    assert mapping_slot(0, 2) == int("ac33ff75c19e70fe83507db0d683fd3465c996598dc972688b7ace676c89077b", 16)
+
+
+def test_force_pass_vote(deploy_vault_and_start_dao_vote, dao_voting, stranger):
+    vault = get_contract(vault_proxy_addr)
+    (_, vote_id) = deploy_vault_and_start_dao_vote()
+    assert not dao_voting.canExecute(vote_id)
+    time_before = chain.time()
+
+    force_pass_vote(dao_voting, vote_id)
+
+    vote = dao_voting.getVote(vote_id)
+    assert not vote['open']
+    assert vote['yea'] == vote['votingPower']
+    assert vote['nay'] == 0
+    assert chain.time() - time_before < 60
+
+    dao_voting.executeVote(vote_id, {'from': stranger})
+    assert dao_voting.getVote(vote_id)['executed']
+    assert vault.version() == 4
@@ -0,0 +1,126 @@
+import pytest
+import utils.fixture_profiler
+
+from collections import Counter
+from types import SimpleNamespace
+from web3 import HTTPProvider
+
+from utils.fixture_profiler import (
+    MB,
+    FixtureProfiler,
+    RpcCallCounter,
+    Usage,
+    check_budgets,
+    format_markdown_report,
+)
+
+
+def make_usage(seconds, rss_growth=0, **rpc_calls):
+    usage = Usage()
+    usage.add(seconds, Counter(rpc_calls), rss_growth)
+    return usage
+
+
+def test_usage_accumulates():
+    usage = make_usage(1.5, MB, eth_call=3)
+    usage.add(0.5, Counter(eth_call=1, evm_snapshot=1), MB)
+
+    assert usage.to_dict() == {
+        'count': 2,
+        'seconds': 2.0,
+        'rpc_calls': 5,
+        'rpc_calls_by_method': {'eth_call': 4, 'evm_snapshot': 1},
+        'rss_growth_mb': 2.0,
+    }
+
+
+def test_check_budgets():
+    fixtures = {'deploy_vault_and_pass_dao_vote': make_usage(30.0, eth_call=100)}
+    tests = {'tests/test_vault.py::test_deposit': make_usage(2.0, 200 * MB)}
+    budgets = {
+        'fixtures': {'deploy_vault_and_pass_dao_vote': {'seconds': 60, 'rpc_calls': 50}, 'not_used': {'seconds': 0}},
+        'tests': {'tests/test_vault.py::test_deposit': {'seconds': 5, 'rss_mb': 100}},
+    }
+
+    assert check_budgets(budgets, fixtures, tests) == [
+        'deploy_vault_and_pass_dao_vote: rpc_calls 100.00 > 50',
+        'tests/test_vault.py::test_deposit: rss_mb 200.00 > 100',
+    ]
+
+    report = format_markdown_report(fixtures, tests, check_budgets(budgets, fixtures, tests))
+    assert '| `deploy_vault_and_pass_dao_vote` | 1 | 30.00 | 100 | eth_call 100 | 0.0 |' in report
+    assert '## Budget violations' in report
+
+
+def test_rpc_call_counter(monkeypatch):
+    monkeypatch.setattr(HTTPProvider, 'make_request', lambda provider, method, params: {'result': method})
+    counter = RpcCallCounter()
+    provider = HTTPProvider('http://127.0.0.1:8545')
+
+    counter.install()
+    try:
+        assert provider.make_request('eth_call', []) == {'result': 'eth_call'}
+        provider.make_request('eth_call', [])
+        provider.make_request('evm_snapshot', [])
+    finally:
+        counter.uninstall()
+    provider.make_request('eth_call', [])
+
+    assert counter.calls == Counter(eth_call=2, evm_snapshot=1)
+
+
+def set_up_fixture(profiler, fixturedef):
+    hook = profiler.pytest_fixture_setup(fixturedef, None)
+    next(hook)
+    with pytest.raises(StopIteration):
+        next(hook)
+    return fixturedef.cached_result[0]
+
+
+def test_factory_fixture_calls_are_charged_to_the_fixture(monkeypatch, tmp_path):
+    monkeypatch.setattr(HTTPProvider, 'make_request', lambda provider, method, params: {'result': method})
+    monkeypatch.setattr(utils.fixture_profiler, 'node_rss', lambda: None)
+    provider = HTTPProvider('http://127.0.0.1:8545')
+    profiler = FixtureProfiler(str(tmp_path / 'profile'))
+
+    def deploy(amount):
+        """deploys"""
+        provider.make_request('eth_sendTransaction', [])
+        provider.make_request('eth_getTransactionReceipt', [])
+        return amount
+
+    profiler.counter.install()
+    try:
+        factory = set_up_fixture(profiler, SimpleNamespace(argname='deploy', cached_result=(deploy, 0, None)))
+        contract = set_up_fixture(profiler, SimpleNamespace(argname='vault', cached_result=('0x01', 0, None)))
+
+        assert factory.__doc__ == 'deploys'
+        assert factory(1) == 1
+        assert factory(2) == 2
+    finally:
+        profiler.counter.uninstall()
+
+    assert contract == '0x01'
+    # the setup and the two calls
+    assert profiler.fixtures['deploy'].count == 3
+    assert profiler.fixtures['deploy'].rpc_calls == Counter(eth_sendTransaction=2, eth_getTransactionReceipt=2)
+    assert profiler.fixtures['vault'].count == 1
+    assert profiler.fixtures['vault'].rpc_calls == Counter()
+
+
+def test_rpc_call_counters_are_removed_in_any_order(monkeypatch):
+    make_request = lambda provider, method, params: {'result': method}
+    monkeypatch.setattr(HTTPProvider, 'make_request', make_request)
+    provider = HTTPProvider('http://127.0.0.1:8545')
+    (first, second) = (RpcCallCounter(), RpcCallCounter())
+
+    first.install()
+    second.install()
+    provider.make_request('eth_call', [])
+    first.uninstall()
+    provider.make_request('eth_call', [])
+    second.uninstall()
+    provider.make_request('eth_call', [])
+
+    assert (first.calls, second.calls) == (Counter(eth_call=1), Counter(eth_call=2))
+    assert HTTPProvider.make_request is make_request
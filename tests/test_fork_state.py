@@ -0,0 +1,38 @@
+from utils import config
+
+# the read-only checks of the recorded fork state before the upgrade, on the backend selected by `EVM_BACKEND`,
+# in addition to the checks of the live state in the upgrade tests
+
+
+def test_vault_state(evm_backend):
+    proxy = evm_backend.contract(config.vault_proxy_addr, "AnchorVaultProxy")
+    vault = evm_backend.contract(config.vault_proxy_addr)
+
+    assert proxy.functions.implementation().call() == config.vault_impl_addr
+    assert proxy.functions.proxy_getAdmin().call() == config.lido_dao_agent_address
+    assert vault.functions.version().call() == 3
+    assert vault.functions.admin().call() == config.lido_dao_agent_address
+    assert vault.functions.beth_token().call() == config.beth_token_addr
+    assert vault.functions.steth_token().call() == config.steth_token_addr
+    assert vault.functions.emergency_admin().call() == config.dev_multisig_addr
+    assert vault.functions.operations_allowed().call()
+    assert 0 < vault.functions.get_rate().call() <= 10**18
+
+
+def test_beth_state(evm_backend):
+    beth_token = evm_backend.contract(config.beth_token_addr)
+
+    assert beth_token.functions.symbol().call() == "bETH"
+    assert beth_token.functions.minter().call() == config.vault_proxy_addr
+    assert beth_token.functions.totalSupply().call() > 0
+
+
+def test_lido_state(evm_backend):
+    lido = evm_backend.contract(config.steth_token_addr)
+    vault_shares = lido.functions.sharesOf(config.vault_proxy_addr).call()
+
+    assert lido.functions.getPooledEthByShares(10**18).call() > 10**18
+    assert vault_shares > 0
+    assert lido.functions.balanceOf(config.vault_proxy_addr).call() == (
+        lido.functions.getPooledEthByShares(vault_shares).call()
+    )
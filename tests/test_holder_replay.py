@@ -0,0 +1,157 @@
+import math
+import pytest
+import utils.config as config
+
+from eth_utils import keccak
+from utils.abi import get_contract
+from utils.beth import BethHolder, import_beth_holders_from_csv
+from utils.beth_reconcile import fetch_token_balances
+from utils.helpers import ETH
+from utils.holder_replay import (
+    BETH_BURNED,
+    MODE_INDEPENDENT,
+    MODE_ORDERED,
+    ReplayHolder,
+    VaultState,
+    format_replay_summary,
+    replay_holders,
+    shard_holders,
+    steth_received,
+    withdraw_amounts,
+)
+from utils.mainnet_fork import node_snapshot
+from utils.vault_model import StethShares, simulate_withdrawals
+
+REPLAY_SHARDS = int(config.get_env('REPLAY_SHARDS', is_required=False, default='4'))
+REPLAY_BLOCK_SIZE = int(config.get_env('REPLAY_BLOCK_SIZE', is_required=False, default='200'))
+STETH_ERROR_MARGIN = 2
+
+
+def test_shard_holders():
+    holders = [ReplayHolder(i, f'0x{i:040x}', i) for i in range(10)]
+
+    shards = shard_holders(holders, 3)
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+    assert sum(shards, []) == holders
+
+    assert shard_holders(holders[:2], 4) == [[holders[0]], [holders[1]]]
+
+
+def test_withdraw_amounts():
+    holder = BethHolder(bytes.fromhex('00' * 19 + '01'), 10, False)
+    bridge = BethHolder(bytes.fromhex(config.wormhole_token_bridge_addr[2:]), BETH_BURNED + 5, False)
+
+    assert withdraw_amounts([holder, bridge], [10, BETH_BURNED + 5]) == [10, 5]
+
+
+def test_steth_received():
+    vault = config.vault_proxy_addr
+    topic = '0x' + keccak(text='Withdrawn(address,uint256,uint256)').hex()
+    log = {
+        'address': vault.lower(),
+        'topics': [topic],
+        'data': '0x' + (7).to_bytes(32, 'big').hex() + (6).to_bytes(32, 'big').hex(),
+    }
+
+    assert steth_received({'logs': [log], 'transactionHash': '0x00'}, vault) == 6
+    with pytest.raises(ValueError):
+        steth_received({'logs': [], 'transactionHash': '0x00'}, vault)
+
+
+@pytest.fixture(scope='module', params=[0, 1_000, -1_000], ids=lambda cl_diff: f'rebase {cl_diff} ETH')
+def actual_withdrawals(request, vault_v4, lido, steth_token, rebase_steth):
+    """
+    The holders with a bETH balance, their withdraw amounts, their bETH and stETH balances and
+    the vault state before the replay, after a rebase by the `cl_diff` param reverted on teardown.
+    """
+    with node_snapshot():
+        if request.param != 0:
+            rebase_steth(ETH(request.param))
+        yield withdrawals(lido, steth_token)
+
+
+def withdrawals(lido, steth_token):
+    vault = get_contract(config.vault_proxy_addr)
+    beth_token = get_contract(config.beth_token_addr)
+
+    holders = import_beth_holders_from_csv()
+    addresses = [holder.address for holder in holders]
+    beth_balances = fetch_token_balances(beth_token.address, addresses, 'latest')
+    steth_balances = fetch_token_balances(steth_token.address, addresses, 'latest')
+    amounts = withdraw_amounts(holders, beth_balances)
+    (holders, amounts, balances) = zip(*[
+        (holder, amount, holder_balances)
+        for (holder, amount, holder_balances) in zip(holders, amounts, zip(beth_balances, steth_balances))
+        if amount > 0
+    ])
+
+    state = (
+        steth_token.balanceOf(vault.address),
+        beth_token.totalSupply(),
+        vault.total_beth_refunded(),
+        StethShares(lido.sharesOf(vault.address), lido.getTotalPooledEther(), lido.getTotalShares()),
+    )
+    return (vault, list(holders), list(amounts), list(balances), state)
+
+
+def assert_holder_balances(results, amounts, balances):
+    # every holder has the rest of its bETH, the bridge the burned amount, and the stETH it has received
+    for (result, amount, (beth_balance, steth_balance)) in zip(results, amounts, balances):
+        assert result.beth_balance == beth_balance - amount
+        assert math.isclose(result.steth_balance, steth_balance + result.steth_received, abs_tol=STETH_ERROR_MARGIN)
+
+
+def assert_final_state(replay, amounts, state):
+    # every holder has withdrawn, only the burned bETH is left
+    assert replay.final_state == VaultState(simulate_withdrawals(amounts, *state).steth_balance, BETH_BURNED)
+
+
+def test_replay_independent(actual_withdrawals):
+    (vault, holders, amounts, balances, state) = actual_withdrawals
+
+    replay = replay_holders(holders, amounts, vault.address, vault.version(), MODE_INDEPENDENT, REPLAY_SHARDS)
+    results = replay.results
+    print(format_replay_summary(results))
+
+    assert [result.index for result in results] == list(range(len(holders)))
+    assert [result.revert for result in results] == [None] * len(holders)
+    # every withdrawal is made from the initial state
+    assert [result.steth_received for result in results] == [
+        simulate_withdrawals([amount], *state).steth_amounts[0] for amount in amounts
+    ]
+    assert all(result.gas_used > 0 for result in results)
+    assert_holder_balances(results, amounts, balances)
+    assert replay.final_state is None
+
+
+def test_replay_ordered(actual_withdrawals):
+    (vault, holders, amounts, balances, state) = actual_withdrawals
+
+    replay = replay_holders(holders, amounts, vault.address, vault.version(), MODE_ORDERED)
+    results = replay.results
+    print(format_replay_summary(results))
+
+    assert [result.revert for result in results] == [None] * len(holders)
+    assert [result.steth_received for result in results] == simulate_withdrawals(amounts, *state).steth_amounts
+    assert_holder_balances(results, amounts, balances)
+    assert_final_state(replay, amounts, state)
+
+
+def test_replay_packed(actual_withdrawals):
+    (vault, holders, amounts, balances, state) = actual_withdrawals
+
+    replay = replay_holders(
+        holders, amounts, vault.address, vault.version(), MODE_ORDERED, block_size=REPLAY_BLOCK_SIZE
+    )
+    results = replay.results
+    print(format_replay_summary(results))
+
+    assert [result.revert for result in results] == [None] * len(holders)
+    assert len({result.block for result in results}) == math.ceil(len(holders) / REPLAY_BLOCK_SIZE)
+    # the rate follows the order of the transactions chosen by the node
+    mined = sorted(results, key=lambda result: (result.block, result.tx_index))
+    assert [result.steth_received for result in mined] == simulate_withdrawals(
+        [result.beth_amount for result in mined], *state
+    ).steth_amounts
+    assert_holder_balances(results, amounts, balances)
+    assert_final_state(replay, [result.beth_amount for result in mined], state)
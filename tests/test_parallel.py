@@ -0,0 +1,182 @@
+import os
+import utils.mainnet_fork
+
+from types import SimpleNamespace
+from utils.mainnet_fork import UpgradedState
+from utils.parallel import (
+    NETWORK_INPUT,
+    SPREAD_MARKER,
+    UPGRADED_STATE_FIXTURE,
+    RunDurations,
+    load_durations,
+    order_by_duration,
+    read_scopes,
+    remove_scopes,
+    save_durations,
+    scope_of,
+    scopes_path,
+    upgraded_state_last,
+    use_free_port,
+    write_scopes,
+)
+
+
+def make_item(nodeid, *fixtures, markers=()):
+    return SimpleNamespace(
+        nodeid=nodeid,
+        fixturenames=['fn_isolation', *fixtures],
+        get_closest_marker=lambda name: name if name in markers else None,
+    )
+
+
+def test_upgraded_state_last():
+    items = [
+        make_item('tests/test_vault.py::test_v4', UPGRADED_STATE_FIXTURE),
+        make_item('tests/test_vault.py::test_a'),
+        make_item('tests/test_beth.py::test_v4', UPGRADED_STATE_FIXTURE),
+        make_item('tests/test_beth.py::test_a'),
+        make_item('tests/test_vault.py::test_b'),
+    ]
+
+    assert [item.nodeid for item in upgraded_state_last(items)] == [
+        'tests/test_vault.py::test_a',
+        'tests/test_vault.py::test_b',
+        'tests/test_beth.py::test_a',
+        'tests/test_vault.py::test_v4',
+        'tests/test_beth.py::test_v4',
+    ]
+    assert [scope_of(item) for item in items[:2]] == ['tests/test_vault.py::vault_v4', 'tests/test_vault.py']
+
+
+def test_order_by_duration():
+    items = [
+        make_item('tests/test_beth.py::test_a'),
+        make_item('tests/test_vault.py::test_a'),
+        make_item('tests/test_vault.py::test_b'),
+        make_item('tests/test_vault.py::test_v4', UPGRADED_STATE_FIXTURE),
+        make_item('tests/test_new.py::test_a'),
+        make_item('tests/test_upgrade.py::test_a'),
+    ]
+    durations = {
+        'tests/test_beth.py::test_a': 1.0,
+        'tests/test_vault.py::test_a': 2.0,
+        'tests/test_vault.py::test_b': 3.0,
+        'tests/test_vault.py::test_v4': 100.0,
+        'tests/test_upgrade.py::test_a': 10.0,
+    }
+
+    ordered = [item.nodeid for item in order_by_duration(items, durations)]
+
+    assert ordered == [
+        # not recorded yet, as long as the longest scope
+        'tests/test_new.py::test_a',
+        'tests/test_upgrade.py::test_a',
+        'tests/test_vault.py::test_a',
+        'tests/test_vault.py::test_b',
+        'tests/test_beth.py::test_a',
+        # the longest, but after all the tests without the upgrade
+        'tests/test_vault.py::test_v4',
+    ]
+
+
+def test_spread_tests_are_ordered_by_case():
+    items = [
+        make_item('tests/test_beth.py::test_a'),
+        make_item('tests/test_rebase.py::test_point[0]', markers=[SPREAD_MARKER]),
+        make_item('tests/test_rebase.py::test_point[1]', markers=[SPREAD_MARKER]),
+        make_item('tests/test_rebase.py::test_point[2]', markers=[SPREAD_MARKER]),
+    ]
+    durations = {
+        'tests/test_beth.py::test_a': 5.0,
+        'tests/test_rebase.py::test_point[0]': 3.0,
+        'tests/test_rebase.py::test_point[1]': 6.0,
+    }
+
+    ordered = [item.nodeid for item in order_by_duration(items, durations)]
+
+    assert ordered == [
+        'tests/test_rebase.py::test_point[1]',
+        # not recorded yet, as long as the longest case
+        'tests/test_rebase.py::test_point[2]',
+        'tests/test_beth.py::test_a',
+        'tests/test_rebase.py::test_point[0]',
+    ]
+
+
+def test_scopes_file(tmp_path):
+    path = str(tmp_path / 'scopes.json')
+    scopes = {'tests/test_rebase.py::test_point[0]': 'tests/test_rebase.py::test_point[0]'}
+
+    write_scopes(path, scopes)
+    write_scopes(path, scopes)
+
+    assert read_scopes(path) == scopes
+    assert [p.name for p in tmp_path.iterdir()] == ['scopes.json']
+
+
+def test_scopes_directory_is_removed():
+    path = scopes_path()
+    write_scopes(path, {})
+
+    remove_scopes(path)
+    assert not os.path.exists(os.path.dirname(path))
+
+
+def test_worker_port_is_set_for_the_controller_network(monkeypatch):
+    from brownie._config import CONFIG
+
+    monkeypatch.setitem(CONFIG.networks['hardhat'], 'cmd_settings', {'port': 8545})
+    # the worker has no network option of its own
+    config = SimpleNamespace(workerinput={NETWORK_INPUT: 'hardhat'}, getoption=lambda *args, **kwargs: None)
+
+    use_free_port(config)
+    assert CONFIG.networks['hardhat']['cmd_settings']['port'] != 8545
+
+
+def test_durations_are_merged(tmp_path):
+    path = str(tmp_path / 'durations.json')
+    assert load_durations(path) == {}
+
+    save_durations({'a': 1.0, 'b': 2.0}, path)
+    save_durations({'b': 3.0}, path)
+
+    assert load_durations(path) == {'a': 1.0, 'b': 3.0}
+    assert [p.name for p in tmp_path.iterdir()] == ['durations.json']
+
+
+def test_partial_run_durations(tmp_path):
+    path = str(tmp_path / 'durations.json')
+    save_durations({'a': 1.0, 'b': 2.0, 'c': 3.0}, path)
+
+    def report(nodeid, duration, outcome='passed'):
+        return SimpleNamespace(nodeid=nodeid, duration=duration, passed=outcome == 'passed')
+
+    # `a` is deselected, `b` passes all its phases, `c` fails after its setup
+    run = RunDurations()
+    for phase_report in [report('b', 0.5), report('b', 1.0), report('c', 0.1), report('c', 0.2, 'failed')]:
+        run.record(phase_report)
+    save_durations(run.complete(), path)
+
+    assert load_durations(path) == {'a': 1.0, 'b': 1.5, 'c': 3.0}
+
+
+def test_upgraded_state_is_restored_for_every_module(monkeypatch):
+    requests = []
+
+    def make_request(method, params):
+        requests.append((method, params))
+        return hex(len(requests))
+
+    monkeypatch.setattr(utils.mainnet_fork, 'make_request', make_request)
+    state = UpgradedState()
+
+    # the first module is upgraded on its own
+    state.enter_module('tests/test_vault.py::vault_v4')
+    state.save()
+    state.enter_module('tests/test_vault.py::vault_v4')
+    assert requests == [('evm_snapshot', [])]
+
+    state.enter_module('tests/test_beth.py::vault_v4')
+    state.enter_module('tests/test_beth.py::vault_v4')
+    assert requests[1:] == [('evm_revert', ['0x1']), ('evm_snapshot', [])]
+    assert state.snapshot_id == '0x3'
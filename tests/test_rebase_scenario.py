@@ -0,0 +1,82 @@
+import pytest
+import utils.config as config
+import utils.rebase
+
+from types import SimpleNamespace
+from utils.abi import get_contract
+from utils.helpers import ETH
+from utils.rebase import OracleReporter, RebaseStep, format_rate_curve, run_scenario, sweep
+
+SWEEP_CL_DIFFS = [ETH(-5_000), ETH(-1_000), ETH(0), ETH(1_000)]
+
+
+def test_report_time_elapsed(monkeypatch):
+    hash_consensus = SimpleNamespace(
+        getCurrentFrame=lambda: (100, 0),
+        getChainConfig=lambda: (32, 12, 1_000),
+        getFrameConfig=lambda: (0, 225, 0),
+    )
+    monkeypatch.setattr(utils.rebase, 'force_rebase', lambda lido, cl_diff: None)
+    reporter = OracleReporter(None, hash_consensus, None, fast=True)
+
+    reporter.report(0)
+    assert reporter.report_time == 1_000 + 100 * 12
+    reporter.report(0)
+    assert reporter.report_time == 1_000 + 100 * 12 + 225 * 32 * 12
+    # an explicit zero is not replaced by the frame duration
+    reporter.report(0, time_elapsed=0)
+    assert reporter.report_time == 1_000 + 100 * 12 + 225 * 32 * 12
+
+
+def test_rebase_scenario(vault_v4, make_oracle_reporter):
+    vault = get_contract(config.vault_proxy_addr)
+    reporter = make_oracle_reporter()
+
+    points = run_scenario(
+        reporter, vault, [RebaseStep(ETH(1_000)), RebaseStep(ETH(-3_000)), RebaseStep(ETH(500))]
+    )
+
+    assert [point.step for point in points] == [0, 1, 2, 3]
+    # time moves forward a frame per report
+    assert [b.report_time - a.report_time for (a, b) in zip(points[1:], points[2:])] == [reporter.frame_duration] * 2
+
+    share_rates = [point.share_rate for point in points]
+    assert share_rates[1] > share_rates[0]
+    assert share_rates[2] < share_rates[1]
+    assert share_rates[3] > share_rates[2]
+    assert all(0 < point.vault_rate <= 10**18 for point in points)
+
+
+@pytest.mark.spread
+@pytest.mark.parametrize('cl_diff', SWEEP_CL_DIFFS, ids=lambda cl_diff: f'{cl_diff // 10**18} ETH')
+def test_rebase_sweep_point(vault_v4, make_oracle_reporter, cl_diff):
+    """A point of the rate curve, the points are run by the xdist workers in parallel"""
+    vault = get_contract(config.vault_proxy_addr)
+
+    points = run_scenario(make_oracle_reporter(), vault, [RebaseStep(cl_diff)] * 2)
+    print(format_rate_curve({cl_diff: points}))
+
+    share_rates = [point.share_rate for point in points]
+    vault_rates = [point.vault_rate for point in points]
+    if cl_diff > 0:
+        assert share_rates == sorted(share_rates) and share_rates[0] < share_rates[-1]
+        assert vault_rates == sorted(vault_rates)
+    elif cl_diff < 0:
+        assert share_rates == sorted(share_rates, reverse=True) and share_rates[0] > share_rates[-1]
+        assert vault_rates == sorted(vault_rates, reverse=True)
+    else:
+        assert len(set(share_rates)) == 1
+        assert len(set(vault_rates)) == 1
+
+
+def test_rebase_sweep(vault_v4, make_oracle_reporter, lido):
+    vault = get_contract(config.vault_proxy_addr)
+    total_pooled_ether = lido.getTotalPooledEther()
+    cl_diffs = [ETH(-1_000), ETH(1_000)]
+
+    curve = sweep(make_oracle_reporter, vault, cl_diffs)
+
+    # every run starts from the same state, which is restored afterwards
+    assert len({points[0][3:] for points in curve.values()}) == 1
+    assert lido.getTotalPooledEther() == total_pooled_ether
+    assert curve[cl_diffs[0]][-1].share_rate < curve[cl_diffs[1]][-1].share_rate
@@ -0,0 +1,115 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from utils.rpc_cache import (
+    ERROR_NOT_CACHED,
+    MODE_RECORD,
+    MODE_REPLAY,
+    RpcCache,
+    RpcCacheServer,
+    RpcResponseStore,
+)
+
+FORK_BLOCK = hex(17965130)
+VAULT = "0xA2F987A546D4CD1c607Ee8141276876C26b72Bdf"
+
+
+class Upstream(BaseHTTPRequestHandler):
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        Upstream.calls.extend(request["method"] for request in body)
+        data = json.dumps(
+            [{"jsonrpc": "2.0", "id": request["id"], "result": self.result(request)} for request in body]
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def result(request):
+        if request["method"] == "eth_getStorageAt":
+            return "0x" + f"{int(request['params'][1], 16):064x}"
+        if request["method"] == "eth_getTransactionReceipt":
+            return None
+        return f"{request['method']}:{len(Upstream.calls)}"
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    Upstream.calls = []
+    server = HTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def rpc(uri, method, params):
+    return requests.post(uri, json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).json()
+
+
+def serve(store, mode, upstream_uri=None):
+    server = RpcCacheServer(RpcCache(store, mode, upstream_uri), port=0)
+    server.start()
+    return server
+
+
+def test_record_then_replay(tmp_path, upstream):
+    store = RpcResponseStore(str(tmp_path / "rpc-cache.sqlite3"))
+    proxy = serve(store, MODE_RECORD, upstream)
+
+    recorded = [
+        rpc(proxy.endpoint_uri, "eth_getStorageAt", [VAULT, hex(13), FORK_BLOCK])["result"],
+        rpc(proxy.endpoint_uri, "eth_getCode", [VAULT, FORK_BLOCK])["result"],
+        rpc(proxy.endpoint_uri, "eth_chainId", [])["result"],
+    ]
+    # the slot is normalized, the address case doesn't matter
+    assert rpc(proxy.endpoint_uri, "eth_getStorageAt", [VAULT.lower(), "0x" + "0d".rjust(64, "0"), FORK_BLOCK])[
+        "result"
+    ] == recorded[0]
+    # not pinned to a block and null responses are forwarded every time
+    rpc(proxy.endpoint_uri, "eth_getBalance", [VAULT, "latest"])
+    rpc(proxy.endpoint_uri, "eth_getBalance", [VAULT, "latest"])
+    rpc(proxy.endpoint_uri, "eth_getTransactionReceipt", ["0x" + "00" * 32])
+    rpc(proxy.endpoint_uri, "eth_getTransactionReceipt", ["0x" + "00" * 32])
+
+    assert Upstream.calls == [
+        "eth_getStorageAt",
+        "eth_getCode",
+        "eth_chainId",
+        "eth_getBalance",
+        "eth_getBalance",
+        "eth_getTransactionReceipt",
+        "eth_getTransactionReceipt",
+    ]
+    assert len(store) == 3
+    proxy.shutdown()
+    proxy.server_close()
+
+    replay = serve(store, MODE_REPLAY)
+    batch = requests.post(
+        replay.endpoint_uri,
+        json=[
+            {"jsonrpc": "2.0", "id": 1, "method": "eth_getStorageAt", "params": [VAULT, hex(13), FORK_BLOCK]},
+            {"jsonrpc": "2.0", "id": 2, "method": "eth_getCode", "params": [VAULT, FORK_BLOCK]},
+            {"jsonrpc": "2.0", "id": 3, "method": "eth_chainId", "params": []},
+            {"jsonrpc": "2.0", "id": 4, "method": "eth_getCode", "params": [VAULT, hex(17965131)]},
+        ],
+    ).json()
+
+    assert [item.get("result") for item in batch[:3]] == recorded
+    assert batch[3]["error"]["code"] == ERROR_NOT_CACHED
+    assert len(Upstream.calls) == 7
+    assert (replay.cache.hits, replay.cache.misses) == (3, 1)
+    replay.shutdown()
+    replay.server_close()
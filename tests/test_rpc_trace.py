@@ -0,0 +1,111 @@
+from web3 import HTTPProvider
+
+from utils.fixture_profiler import RpcCallCounter
+from utils.rpc_trace import RpcTracer
+
+VAULT = '0xA2F987A546D4CD1c607Ee8141276876C26b72Bdf'
+# version()
+VERSION_CALL = [{'to': VAULT, 'data': '0x54fd4d50'}, 'latest']
+
+
+class Node:
+    def __init__(self):
+        self.requests = []
+
+    def make_request(self, method, params):
+        self.requests.append(method)
+        return {'jsonrpc': '2.0', 'id': len(self.requests), 'result': hex(len(self.requests))}
+
+
+class MiddlewareOnion:
+    def __init__(self):
+        self.middlewares = {}
+
+    def add(self, middleware, name):
+        self.middlewares[name] = middleware
+
+    def remove(self, name):
+        del self.middlewares[name]
+
+
+def test_redundant_reads_within_epoch(monkeypatch):
+    node = Node()
+    monkeypatch.setattr(
+        HTTPProvider, 'make_request', lambda provider, method, params: node.make_request(method, params)
+    )
+    tracer = RpcTracer()
+
+    class Web3:
+        middleware_onion = MiddlewareOnion()
+
+    tracer.install(Web3)
+    try:
+        request = tracer.middleware(HTTPProvider('http://127.0.0.1:8545').make_request, None)
+
+        request('eth_call', VERSION_CALL)
+        request('eth_call', VERSION_CALL)
+        request('eth_call', VERSION_CALL)
+        request('eth_sendTransaction', [{'to': VAULT}])
+        request('eth_call', VERSION_CALL)
+    finally:
+        tracer.uninstall()
+
+    assert node.requests == ['eth_call'] * 3 + ['eth_sendTransaction', 'eth_call']
+    # a single state change
+    assert tracer.epoch == 1
+    [read] = tracer.redundant_reads()
+    assert (read.method, read.redundant) == ('eth_call', 2)
+    assert all(
+        frame.startswith('tests/test_rpc_trace.py:') and frame.endswith(' test_redundant_reads_within_epoch')
+        for frame in read.frames
+    )
+    assert f'| 2 | `{read.label}` |' in tracer.format_report()
+
+
+def test_read_cache_is_dropped_on_state_change(monkeypatch):
+    node = Node()
+    monkeypatch.setattr(
+        HTTPProvider, 'make_request', lambda provider, method, params: node.make_request(method, params)
+    )
+    tracer = RpcTracer(read_cache=True)
+
+    class Web3:
+        middleware_onion = MiddlewareOnion()
+
+    tracer.install(Web3)
+    try:
+        request = tracer.middleware(node.make_request, None)
+        first = request('eth_call', VERSION_CALL)
+        assert request('eth_call', VERSION_CALL) == first
+
+        # brownie reverts to snapshots through the provider, bypassing the middlewares
+        HTTPProvider('http://127.0.0.1:8545').make_request('evm_revert', ['0x1'])
+        assert request('eth_call', VERSION_CALL) != first
+    finally:
+        tracer.uninstall()
+
+    assert node.requests == ['eth_call', 'evm_revert', 'eth_call']
+    assert [call.cached for call in tracer.calls] == [False, True, False]
+    assert Web3.middleware_onion.middlewares == {}
+
+
+def test_uninstall_with_the_call_counter(monkeypatch):
+    node = Node()
+    make_request = lambda provider, method, params: node.make_request(method, params)
+    monkeypatch.setattr(HTTPProvider, 'make_request', make_request)
+    tracer = RpcTracer()
+    counter = RpcCallCounter()
+
+    class Web3:
+        middleware_onion = MiddlewareOnion()
+
+    tracer.install(Web3)
+    counter.install()
+    tracer.uninstall()
+    HTTPProvider('http://127.0.0.1:8545').make_request('eth_sendTransaction', [{'to': VAULT}])
+    counter.uninstall()
+
+    # the tracer is removed whatever the order
+    assert tracer.epoch == 0
+    assert counter.calls == {'eth_sendTransaction': 1}
+    assert HTTPProvider.make_request is make_request
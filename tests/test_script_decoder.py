@@ -0,0 +1,71 @@
+from brownie import ZERO_ADDRESS
+
+from utils.abi import get_contract
+from utils.config import lido_dao_agent_address, lido_dao_voting_addr, vault_proxy_addr
+from utils.dao import encode_finalize_upgrade_v4, encode_proxy_upgrade
+from utils.evm_script import decode_call_script, encode_call_script
+from utils.script_decoder import decode_script, format_call_tree
+
+NEW_IMPL = "0x07BE9BB2B1789b8F5B2f9345F18378A8B036A171"
+
+
+def test_decode_call_script_round_trip():
+    actions = [(vault_proxy_addr, "0xc4c7b5a9"), (lido_dao_agent_address, "0x")]
+
+    assert decode_call_script(encode_call_script(actions)) == [
+        (vault_proxy_addr.lower(), bytes.fromhex("c4c7b5a9")),
+        (lido_dao_agent_address.lower(), b""),
+    ]
+
+
+def test_decode_upgrade_vote_script():
+    evm_script = encode_call_script([
+        encode_proxy_upgrade(new_impl_address=NEW_IMPL, setup_calldata=b""),
+        encode_finalize_upgrade_v4(),
+    ])
+
+    [upgrade, finalize] = decode_script(evm_script)
+
+    assert upgrade.target == lido_dao_agent_address.lower()
+    assert upgrade.signature == "forward(bytes)"
+    [upgrade_to] = upgrade.children
+    assert upgrade_to.target == vault_proxy_addr.lower()
+    assert upgrade_to.signature == "proxy_upgradeTo(address,bytes)"
+    assert upgrade_to.args[0][2].lower() == NEW_IMPL.lower()
+    assert upgrade_to.children == ()
+
+    assert finalize.signature == "forward(bytes)"
+    [finalize_v4] = finalize.children
+    assert finalize_v4.target == vault_proxy_addr.lower()
+    assert finalize_v4.signature == "finalize_upgrade_v4()"
+
+    assert [call.signature for action in (upgrade, finalize) for call in action.walk()] == [
+        "forward(bytes)",
+        "proxy_upgradeTo(address,bytes)",
+        "forward(bytes)",
+        "finalize_upgrade_v4()",
+    ]
+    assert "proxy_upgradeTo(address,bytes)" in format_call_tree([upgrade, finalize])
+
+
+def test_decode_new_vote_script():
+    voting = get_contract(lido_dao_voting_addr)
+    vote_script = encode_call_script([encode_finalize_upgrade_v4()])
+    new_vote_script = encode_call_script([
+        (voting.address, voting.newVote.encode_input(vote_script, "finalize", False, False))
+    ])
+
+    [new_vote] = decode_script(new_vote_script)
+
+    assert new_vote.signature == "newVote(bytes,string,bool,bool)"
+    [forward] = new_vote.children
+    assert forward.target == lido_dao_agent_address.lower()
+    assert [call.signature for call in forward.children] == ["finalize_upgrade_v4()"]
+
+
+def test_unknown_calldata_is_kept_raw():
+    [call] = decode_script(encode_call_script([(ZERO_ADDRESS, "0xdeadbeef00")]))
+
+    assert call.function is None
+    assert call.signature == "0xdeadbeef"
+    assert call.calldata == bytes.fromhex("deadbeef00")
@@ -1,83 +1,108 @@
-from brownie.network import web3
-from hexbytes import HexBytes
+from brownie import ZERO_ADDRESS
 import utils.config as config
 
-def test_storage_slots(deploy_vault_and_pass_dao_vote):
+from utils.storage_layout import (
+    DEPLOYED_VAULT_VERSION,
+    deployed_vault_layout,
+    diff_layouts,
+    format_diff,
+    parse_vyper_layout,
+    take_snapshot,
+    vault_layout,
+)
 
-    no_liquidation_interval = HexBytes('0x')
-    restricted_liquidation_interval = HexBytes(26 * 60 * 60)
-    last_liquidation_time = web3.eth.get_storage_at(config.vault_proxy_addr, 10)
-    last_liquidation_share_price = web3.eth.get_storage_at(config.vault_proxy_addr, 11)
-    last_liquidation_shares_burnt = HexBytes('0x')
-    version = HexBytes(3)
-    operations_allowed = HexBytes(True)
-    total_beth_refunded = HexBytes(443561118570000000000)
+ZERO_BYTES32 = '0x' + '00' * 32
 
-    #storage slots
-    #we are added the to_32bytes function, because now the get_storage_at method returns 32 bytes
-    slots = []
 
-    slots.append(to_32bytes(HexBytes(config.lido_dao_agent_address)))          #slot0 admin
-    slots.append(to_32bytes(HexBytes(config.beth_token_addr)))                 #slot1 beth_token
-    slots.append(to_32bytes(HexBytes(config.steth_token_addr)))                #slot2 steth_token
-    slots.append(to_32bytes(HexBytes(config.bridge_connector_addr)))           #slot3 bridge_connector
-    slots.append(to_32bytes(HexBytes(config.rewards_liquidator_addr)))         #slot4 rewards_liquidator
-    slots.append(to_32bytes(HexBytes(config.insurance_connector_addr)))        #slot5 insurance_connector
-    slots.append(to_32bytes(HexBytes(config.terra_rewards_distributor_addr)))  #slot6 anchor_rewards_distributor
-    slots.append(to_32bytes(HexBytes(config.vault_liquidations_admin_addr)))   #slot7 liquidations_admin
-    slots.append(to_32bytes(no_liquidation_interval))                          #slot8 no_liquidation_interval
-    slots.append(to_32bytes(restricted_liquidation_interval))                  #slot9 restricted_liquidation_interval
-    slots.append(to_32bytes(last_liquidation_time))                            #slot10 last_liquidation_time
-    slots.append(to_32bytes(last_liquidation_share_price))                     #slot11 last_liquidation_share_price
-    slots.append(to_32bytes(last_liquidation_shares_burnt))                    #slot12 last_liquidation_shares_burnt
-    slots.append(to_32bytes(version))                                          #slot13 version
-    slots.append(to_32bytes(HexBytes(config.dev_multisig_addr)))               #slot14 emergency_admin
-    slots.append(to_32bytes(operations_allowed))                               #slot15 operations_allowed
-    slots.append(to_32bytes(total_beth_refunded))                              #slot16 total_beth_refunded
+def test_storage_layout_is_upgrade_safe():
+    layout = vault_layout()
 
-    #slots which we are change during the upgrade
-    new_slots = {
-        3: { 'old': slots[3], 'new': to_32bytes(HexBytes('0x')) },
-        4: { 'old': slots[4], 'new': to_32bytes(HexBytes('0x')) },
-        5: { 'old': slots[5], 'new': to_32bytes(HexBytes('0x')) },
-        6: { 'old': slots[6], 'new': to_32bytes(HexBytes('0x')) },
-        7: { 'old': slots[7], 'new': to_32bytes(HexBytes('0x')) },
-        8: { 'old': slots[8], 'new': to_32bytes(HexBytes('0x')) },
-        9: { 'old': slots[9], 'new': to_32bytes(HexBytes('0x')) },
-        10: { 'old': slots[10], 'new': to_32bytes(HexBytes('0x')) },
-        11: { 'old': slots[11], 'new': to_32bytes(HexBytes('0x')) },
-        12: { 'old': slots[12], 'new': to_32bytes(HexBytes('0x')) },
-        13: {'old': slots[13], 'new': to_32bytes(HexBytes(4)) },
-        14: {'old': slots[14], 'new': to_32bytes(HexBytes('0x'))}
-    }
+    assert [(variable.slot, variable.name) for variable in layout[:17]] == list(enumerate([
+        'admin',
+        'beth_token',
+        'steth_token',
+        'bridge_connector',
+        'rewards_liquidator',
+        'insurance_connector',
+        'anchor_rewards_distributor',
+        'liquidations_admin',
+        'no_liquidation_interval',
+        'restricted_liquidation_interval',
+        'last_liquidation_time',
+        'last_liquidation_share_price',
+        'last_liquidation_shares_burnt',
+        'version',
+        'emergency_admin',
+        'operations_allowed',
+        'total_beth_refunded',
+    ]))
+    assert diff_layouts(deployed_vault_layout(), layout) == []
 
-    #save previous storage slots
-    prev_slots = []
-    for index, slot in enumerate(slots):
-        data = web3.eth.get_storage_at(config.vault_proxy_addr, index)
-        prev_slots.append(data)
 
-        assert data == slot , "invalid previous slot"
+def test_diff_layouts():
+    old = parse_vyper_layout('admin: public(address)\nversion: public(uint256)\nflag: bool\n')
 
-    #upgrade implementation
-    deploy_vault_and_pass_dao_vote()
+    new = parse_vyper_layout('admin: public(address)\nversion: uint256\nflag: bool\nx: uint256\n')
+    assert diff_layouts(old, new) == []
+    assert diff_layouts(old, parse_vyper_layout('admin: public(address)\nflag: bool\n')) == [
+        '`version` is removed, slot 1 is reused by `flag`',
+        '`flag` moved from slot 2 to 1',
+    ]
+    assert diff_layouts(old, parse_vyper_layout('admin: public(address)\nversion: bytes32\nflag: bool\n')) == [
+        '`version` changed type from uint256 to bytes32',
+    ]
 
-    #check new storage slots
-    for index, slot in enumerate(prev_slots):
-        data = web3.eth.get_storage_at(config.vault_proxy_addr, index)
 
-        #we will change  slots after upgrade
-        if index in list(new_slots.keys()):
-            assert slot == new_slots[index]['old']
-            assert data == new_slots[index]['new']
-        else:
-             #check previous value
-            assert data == slot, "invalid previous slot after upgrade"
+def test_storage_slots(deploy_vault_and_pass_dao_vote):
+    deployed = take_snapshot(config.vault_proxy_addr, deployed_vault_layout())
+    assert deployed.values['proxy_implementation'] == config.vault_impl_addr
+    assert deployed.values['version'] == DEPLOYED_VAULT_VERSION
+
+    layout = vault_layout()
+    before = take_snapshot(config.vault_proxy_addr, layout)
+
+    assert before.values == {
+        'admin': config.lido_dao_agent_address,
+        'beth_token': config.beth_token_addr,
+        'steth_token': config.steth_token_addr,
+        'bridge_connector': config.bridge_connector_addr,
+        'rewards_liquidator': config.rewards_liquidator_addr,
+        'insurance_connector': config.insurance_connector_addr,
+        'anchor_rewards_distributor': '0x' + config.terra_rewards_distributor_addr[2:].zfill(64),
+        'liquidations_admin': config.vault_liquidations_admin_addr,
+        'no_liquidation_interval': 0,
+        'restricted_liquidation_interval': 26 * 60 * 60,
+        # not checked, change with every liquidation
+        'last_liquidation_time': before.values['last_liquidation_time'],
+        'last_liquidation_share_price': before.values['last_liquidation_share_price'],
+        'last_liquidation_shares_burnt': 0,
+        'version': 3,
+        'emergency_admin': config.dev_multisig_addr,
+        'operations_allowed': True,
+        'total_beth_refunded': 443561118570000000000,
+        'proxy_implementation': before.values['proxy_implementation'],
+        'proxy_admin': config.lido_dao_agent_address,
+    }
+
+    #upgrade implementation
+    vault = deploy_vault_and_pass_dao_vote()
 
-            #check initial value
-            assert data == slots[index], "invalid initial value"
+    after = take_snapshot(config.vault_proxy_addr, layout)
 
-def to_32bytes(value: HexBytes):
-    if len(value) == 0:
-        return HexBytes("0x")
-    return HexBytes("0x" + value.hex()[2:].zfill(64))
\ No newline at end of file
+    #the slots 3-14 are reset during the upgrade, the other ones are kept
+    assert after.values == {
+        **before.values,
+        'bridge_connector': ZERO_ADDRESS,
+        'rewards_liquidator': ZERO_ADDRESS,
+        'insurance_connector': ZERO_ADDRESS,
+        'anchor_rewards_distributor': ZERO_BYTES32,
+        'liquidations_admin': ZERO_ADDRESS,
+        'no_liquidation_interval': 0,
+        'restricted_liquidation_interval': 0,
+        'last_liquidation_time': 0,
+        'last_liquidation_share_price': 0,
+        'last_liquidation_shares_burnt': 0,
+        'version': 4,
+        'emergency_admin': ZERO_ADDRESS,
+        'proxy_implementation': vault.address,
+    }, format_diff(before.diff(after, layout))
@@ -4,6 +4,7 @@ import brownie
 import utils.config as config
 
 from brownie import ZERO_ADDRESS, reverts
+from utils.abi import get_contract
 from utils.helpers import ETH, _shares_rate_from_event
 
 ZERO_BYTES32 = '0x0000000000000000000000000000000000000000000000000000000000000000'
@@ -29,6 +30,7 @@ def test_minting_disabled_but_preupgrade_beth_are_withdrawable(
     stranger,
     steth_token,
     lido_oracle_report,
+    rebase_steth,
     deploy_vault_and_pass_dao_vote,
     deposit_amount,
     steth_approx_equal,
@@ -76,16 +78,12 @@ def test_minting_disabled_but_preupgrade_beth_are_withdrawable(
     ##################
 
     # initialize vault proxy
-    vault_proxy = brownie.Contract.from_abi(
-        "AnchorVaultProxy", config.vault_proxy_addr, brownie.AnchorVaultProxy.abi
-    )
+    vault_proxy = get_contract(config.vault_proxy_addr, "AnchorVaultProxy")
 
     # initialize vault
-    vault = brownie.Contract.from_abi(
-        "AnchorVault", config.vault_proxy_addr, brownie.AnchorVault.abi
-    )
+    vault = get_contract(config.vault_proxy_addr)
 
-    beth_token = brownie.interface.ERC20(vault.beth_token())
+    beth_token = get_contract(vault.beth_token(), "bEth")
 
     liquidations_admin = accounts.at(vault.liquidations_admin(), force=True)
 
@@ -197,9 +195,10 @@ def test_minting_disabled_but_preupgrade_beth_are_withdrawable(
     # STAGE 5. Rebase #
     ###################
 
-    lido_oracle_report(cl_diff=ETH(1_000))
-
-    shares_rate_before, shares_rate_after = _shares_rate_from_event(tx)
+    # only the share rate matters for the withdrawal rate
+    shares_rate_before = steth_token.getPooledEthByShares(10**18)
+    rebase_steth(ETH(1_000))
+    shares_rate_after = steth_token.getPooledEthByShares(10**18)
     assert shares_rate_after > shares_rate_before, "Shares rate has not increased"
 
     #####################
@@ -250,7 +249,7 @@ def test_expected_withdrawal_rate_after_negative_rebase(
     stranger,
     steth_token,
     deploy_vault_and_pass_dao_vote,
-    lido_oracle_report,
+    rebase_steth,
     deposit_amount,
     lido,
 ):
@@ -279,12 +278,10 @@ def test_expected_withdrawal_rate_after_negative_rebase(
     ##################
 
     # initialize vault
-    vault = brownie.Contract.from_abi(
-        "AnchorVault", config.vault_proxy_addr, brownie.AnchorVault.abi
-    )
+    vault = get_contract(config.vault_proxy_addr)
 
     # initialize beth token
-    beth_token = brownie.interface.ERC20(vault.beth_token())
+    beth_token = get_contract(vault.beth_token(), "bEth")
 
     #################
     # STAGE 1. Mint #
@@ -347,9 +344,10 @@ def test_expected_withdrawal_rate_after_negative_rebase(
     # STAGE 4. Rebase #
     ###################
 
-    tx = lido_oracle_report(cl_diff=ETH(-1_000))
-
-    shares_rate_before, shares_rate_after = _shares_rate_from_event(tx)
+    # no fees are minted on a negative rebase, so the fast one changes the rates the same way
+    shares_rate_before = lido.getPooledEthByShares(10**18)
+    rebase_steth(ETH(-1_000))
+    shares_rate_after = lido.getPooledEthByShares(10**18)
     assert shares_rate_after < shares_rate_before, "Shares rate has not decreased"
 
     #####################
@@ -396,12 +394,10 @@ def test_emergency_stop_works_as_expected(
     ##################
 
     # initialize vault
-    vault = brownie.Contract.from_abi(
-        "AnchorVault", config.vault_proxy_addr, brownie.AnchorVault.abi
-    )
+    vault = get_contract(config.vault_proxy_addr)
 
     # initialize beth token
-    beth_token = brownie.interface.ERC20(vault.beth_token())
+    beth_token = get_contract(vault.beth_token(), "bEth")
 
     # take over emergency admin account
     emergency_admin = accounts.at(vault.emergency_admin(), True)
@@ -564,21 +560,17 @@ def test_emergency_stop_works_as_expected(
 def test_minting_beth_from_steth_disabled(
     stranger,
     lido,
-    deploy_vault_and_pass_dao_vote,
+    vault_v4,
     deposit_amount,
 ):
     # initialize vault
-    vault = brownie.Contract.from_abi(
-        "AnchorVault", config.vault_proxy_addr, brownie.AnchorVault.abi
-    )
+    vault = get_contract(config.vault_proxy_addr)
 
     # initialize Lido
-    lido = brownie.interface.Lido(vault.steth_token())
+    lido = get_contract(vault.steth_token(), "Lido")
 
     # initialize beth
-    beth_token = brownie.interface.ERC20(vault.beth_token())
-
-    deploy_vault_and_pass_dao_vote()
+    beth_token = get_contract(vault.beth_token(), "bEth")
 
     lido.submit(brownie.ZERO_ADDRESS, {"from": stranger, "value": deposit_amount})
 
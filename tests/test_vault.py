@@ -1,14 +1,12 @@
-import brownie
 import utils.config as config
 from brownie import reverts
+from utils.abi import get_contract
 
 """
 Vault finalize test
 """
 def test_finalize_upgrade_v4_cannot_be_called_on_v4_vault(deploy_vault_and_pass_dao_vote, lido_dao_agent, stranger):
-    vault = brownie.Contract.from_abi(
-        "AnchorVault", config.vault_proxy_addr, brownie.AnchorVault.abi
-    )
+    vault = get_contract(config.vault_proxy_addr)
 
     # check vault version
     assert vault.version() == 3, "version matches"
@@ -30,9 +28,7 @@ def test_finalize_upgrade_v4_cannot_be_called_on_v4_vault(deploy_vault_and_pass_
 Change admin test
 """
 def test_change_admin(deploy_vault_and_pass_dao_vote, stranger, admin, helpers, lido_dao_agent):
-    vault = brownie.Contract.from_abi(
-        "AnchorVault", config.vault_proxy_addr, brownie.AnchorVault.abi
-    )
+    vault = get_contract(config.vault_proxy_addr)
     assert vault.version() == 3
     deploy_vault_and_pass_dao_vote()
     assert vault.version() == 4
@@ -48,4 +44,25 @@ def test_change_admin(deploy_vault_and_pass_dao_vote, stranger, admin, helpers,
     vault.change_admin(stranger, {"from": lido_dao_agent})
 
     assert vault.admin() == stranger
-    assert lido_dao_agent != stranger
\ No newline at end of file
+    assert lido_dao_agent != stranger
+"""
+Session upgrade test
+"""
+def test_upgraded_state_is_restored_for_every_test(vault_v4, stranger, lido_dao_agent):
+    vault = get_contract(config.vault_proxy_addr)
+    proxy = get_contract(config.vault_proxy_addr, "AnchorVaultProxy")
+
+    assert proxy.implementation() == vault_v4
+    assert vault.version() == 4
+    assert vault.admin() == lido_dao_agent
+
+    # reverted by fn_isolation, the next test gets the same state
+    vault.change_admin(stranger, {"from": lido_dao_agent})
+    assert vault.admin() == stranger
+
+
+def test_upgraded_state_is_not_affected_by_other_tests(vault_v4, lido_dao_agent):
+    vault = get_contract(config.vault_proxy_addr)
+
+    assert vault.version() == 4
+    assert vault.admin() == lido_dao_agent
@@ -0,0 +1,328 @@
+import random
+
+import brownie
+import pytest
+import utils.config as config
+
+from brownie.test import strategy
+from hypothesis import settings
+from hypothesis import strategies as st
+from hypothesis.stateful import RuleBasedStateMachine, invariant, precondition, rule
+
+from utils.abi import get_contract
+from utils.beth import import_beth_holders_from_csv
+from utils.vault_model import (
+    RATE_PRECISION,
+    AnchorVaultModel,
+    BethModel,
+    ModelRevert,
+    StethShares,
+    get_rate,
+    get_steth_amount,
+    simulate_withdrawals,
+)
+
+ADMIN = "0x" + "aa" * 20
+STRANGER = "0x" + "bb" * 20
+VAULT = "0x" + "cc" * 20
+MODEL_HOLDERS = ["0x" + f"{i:040x}" for i in range(1, 6)]
+# holders from the actual snapshot the model is cross-checked with, the Wormhole bridge is skipped
+SAMPLED_HOLDERS_COUNT = 10
+
+
+def test_get_rate():
+    assert get_rate(steth_balance=100, beth_supply=100, total_beth_refunded=0) == RATE_PRECISION
+    assert get_rate(steth_balance=101, beth_supply=100, total_beth_refunded=0) == RATE_PRECISION
+    assert get_rate(steth_balance=90, beth_supply=110, total_beth_refunded=10) == 9 * 10**17
+    assert get_rate(steth_balance=2, beth_supply=3, total_beth_refunded=0) == 666666666666666666
+
+    with pytest.raises(AssertionError):
+        get_rate(steth_balance=1, beth_supply=1, total_beth_refunded=2)
+
+
+def test_get_steth_amount_rounds_down():
+    assert get_steth_amount(10**18, RATE_PRECISION) == 10**18
+    assert get_steth_amount(1, 666666666666666666) == 0
+    assert get_steth_amount(3, 666666666666666666) == 1
+
+
+def test_collateralized_withdrawals_are_one_to_one():
+    holders = import_beth_holders_from_csv()
+    amounts = [holder.balance for holder in holders]
+    supply = sum(amounts)
+
+    result = simulate_withdrawals(amounts, supply + 1, supply, 0)
+
+    assert result.steth_amounts == amounts
+    assert result.rates == [RATE_PRECISION] * len(amounts)
+    assert result.steth_balance == 1
+    assert result.beth_supply == 0
+
+
+def test_undercollateralized_withdrawals_follow_the_vault_math():
+    amounts = [3, 5, 7, 10**18, 1]
+    (steth_balance, beth_supply, refunded) = (10**18, 2 * 10**18, 5 * 10**17)
+
+    result = simulate_withdrawals(amounts, steth_balance, beth_supply, refunded)
+
+    for (amount, steth_amount, rate) in zip(amounts, result.steth_amounts, result.rates):
+        assert rate == get_rate(steth_balance, beth_supply, refunded)
+        assert steth_amount == amount * rate // RATE_PRECISION
+        steth_balance -= steth_amount
+        beth_supply -= amount
+
+    assert (result.steth_balance, result.beth_supply) == (steth_balance, beth_supply)
+
+
+def test_withdrawals_with_steth_shares_rounding():
+    shares = StethShares(vault_shares=10**18, total_pooled_ether=11 * 10**17 + 7, total_shares=10**18 + 3)
+    amounts = [10**17 + 1, 3 * 10**17 + 5, 13]
+    supply = 2 * 10**18
+
+    result = simulate_withdrawals(amounts, shares.balance(), supply, 0, shares)
+
+    for (amount, steth_amount) in zip(amounts, result.steth_amounts):
+        rate = get_rate(shares.balance(), supply, 0)
+        assert steth_amount == get_steth_amount(amount, rate)
+        shares = shares.transfer(steth_amount)
+        supply -= amount
+
+    assert result.steth_balance == shares.balance()
+
+
+class VaultModelMachine(RuleBasedStateMachine):
+    """Random operation sequences against the model only, checks the vault invariants"""
+
+    def __init__(self):
+        super().__init__()
+        beth = BethModel(minter=VAULT, admin=ADMIN, balances={holder: 0 for holder in MODEL_HOLDERS})
+        self.vault = AnchorVaultModel(VAULT, beth, ADMIN)
+
+    @rule(holder=st.sampled_from(MODEL_HOLDERS), amount=st.integers(min_value=0, max_value=10**24))
+    def mint(self, holder, amount):
+        # the supply is minted by the previous vault versions, modelled by minting along with stETH
+        self.vault.beth.mint(VAULT, holder, amount)
+        self.vault.set_steth_balance(self.vault.steth_balance + amount)
+
+    @rule(refunded=st.integers(min_value=0, max_value=10**20))
+    def refund(self, refunded):
+        if refunded <= self.vault.beth.total_supply:
+            self.vault.total_beth_refunded = refunded
+
+    @rule(numerator=st.integers(min_value=0, max_value=1100))
+    def rebase(self, numerator):
+        self.vault.set_steth_balance(self.vault.steth_balance * numerator // 1000)
+
+    @rule(
+        holder=st.sampled_from(MODEL_HOLDERS),
+        amount=st.one_of(st.integers(min_value=0, max_value=1000), st.integers(min_value=0, max_value=10**25)),
+        version=st.sampled_from([3, 4, 4, 4]),
+    )
+    def withdraw(self, holder, amount, version):
+        vault = self.vault
+        state_before = (vault.steth_balance, vault.beth.total_supply, vault.beth.balance_of(holder))
+
+        if vault.beth.total_supply < vault.total_beth_refunded:
+            # `_get_rate` underflows once the supply is below the refunded amount
+            with pytest.raises(ModelRevert):
+                vault.withdraw(holder, amount, version)
+            return
+
+        rate_before = vault.get_rate()
+        expected_steth_amount = amount * rate_before // RATE_PRECISION
+        should_revert = (
+            version != 4
+            or not vault.operations_allowed
+            or amount > state_before[2]
+            or expected_steth_amount > state_before[0]
+        )
+
+        try:
+            steth_amount = vault.withdraw(holder, amount, version)
+        except ModelRevert as e:
+            assert should_revert
+            assert (vault.steth_balance, vault.beth.total_supply, vault.beth.balance_of(holder)) == state_before
+            assert (e.reason == "unexpected contract version") == (vault.operations_allowed and version != 4)
+            return
+
+        assert not should_revert
+        assert steth_amount == expected_steth_amount <= amount
+        assert vault.steth_balance == state_before[0] - steth_amount
+        assert vault.beth.balance_of(holder) == state_before[2] - amount
+
+        if vault.beth.total_supply > vault.total_beth_refunded:
+            # withdrawals round down in favour of the remaining holders, so the rate never drops
+            assert vault.get_rate() >= rate_before
+
+    @rule(is_admin=st.booleans())
+    def pause(self, is_admin):
+        try:
+            self.vault.pause(ADMIN if is_admin else STRANGER)
+            assert is_admin
+        except ModelRevert:
+            assert not is_admin or not self.vault.operations_allowed
+
+    @rule(is_admin=st.booleans())
+    def resume(self, is_admin):
+        try:
+            self.vault.resume(ADMIN if is_admin else STRANGER)
+            assert is_admin
+        except ModelRevert:
+            assert not is_admin or self.vault.operations_allowed
+
+    @precondition(lambda self: self.vault.admin == ADMIN.lower())
+    @rule()
+    def finalize_upgrade_v4_reverts(self):
+        with pytest.raises(ModelRevert, match="unexpected contract version"):
+            self.vault.finalize_upgrade_v4(ADMIN)
+
+    @invariant()
+    def supply_matches_balances(self):
+        assert sum(self.vault.beth.balances.values()) == self.vault.beth.total_supply
+
+    @invariant()
+    def rate_is_capped(self):
+        if self.vault.beth.total_supply >= self.vault.total_beth_refunded:
+            assert 0 <= self.vault.get_rate() <= RATE_PRECISION
+
+    @invariant()
+    def steth_balance_is_not_negative(self):
+        assert self.vault.steth_balance >= 0
+
+
+TestVaultModelMachine = VaultModelMachine.TestCase
+TestVaultModelMachine.settings = settings(max_examples=200, stateful_step_count=50, deadline=None)
+
+
+def test_model_random_sequences():
+    """Same rules without the hypothesis overhead, trades the shrinking for the number of sequences"""
+
+    rng = random.Random(20231018)
+    invariants = [
+        VaultModelMachine.supply_matches_balances,
+        VaultModelMachine.rate_is_capped,
+        VaultModelMachine.steth_balance_is_not_negative,
+    ]
+    operations = [
+        lambda m: m.mint(rng.choice(MODEL_HOLDERS), rng.choice([rng.randint(0, 1000), rng.randint(0, 10**24)])),
+        lambda m: m.refund(rng.randint(0, 10**20)),
+        lambda m: m.rebase(rng.randint(0, 1100)),
+        lambda m: m.withdraw(
+            rng.choice(MODEL_HOLDERS),
+            rng.choice([rng.randint(0, 1000), rng.randint(0, 10**25), m.vault.beth.balance_of(MODEL_HOLDERS[0])]),
+            rng.choice([3, 4, 4, 4]),
+        ),
+        lambda m: m.pause(rng.random() < 0.8),
+        lambda m: m.resume(rng.random() < 0.8),
+    ]
+
+    for _ in range(2_000):
+        machine = VaultModelMachine()
+        for _ in range(50):
+            rng.choice(operations)(machine)
+            for check in invariants:
+                check(machine)
+
+
+class VaultDifferentialMachine:
+    """Random operation sequences run against both the upgraded vault and the model"""
+
+    st_holder = strategy("uint256", max_value=SAMPLED_HOLDERS_COUNT - 1)
+    st_percent = strategy("uint256", max_value=110)
+    st_is_admin = strategy("bool")
+
+    def __init__(cls, accounts, vault, beth_token, steth_token, lido, lido_dao_agent, stranger):
+        cls.vault = vault
+        cls.beth_token = beth_token
+        cls.steth_token = steth_token
+        cls.lido = lido
+        cls.admin = lido_dao_agent
+        cls.stranger = stranger
+        cls.holders = [
+            accounts.at(holder.address_hex, force=True)
+            for holder in import_beth_holders_from_csv()[1 : SAMPLED_HOLDERS_COUNT + 1]
+        ]
+
+    def setup(self):
+        beth = BethModel(
+            minter=self.beth_token.minter(),
+            admin=self.beth_token.admin(),
+            balances={holder.address: self.beth_token.balanceOf(holder) for holder in self.holders},
+            total_supply=self.beth_token.totalSupply(),
+        )
+        self.model = AnchorVaultModel(
+            self.vault.address,
+            beth,
+            self.vault.admin(),
+            steth_shares=StethShares(
+                self.lido.sharesOf(self.vault), self.lido.getTotalPooledEther(), self.lido.getTotalShares()
+            ),
+            version=self.vault.version(),
+            operations_allowed=self.vault.operations_allowed(),
+            total_beth_refunded=self.vault.total_beth_refunded(),
+        )
+
+    def _withdraw(self, holder, amount, version):
+        try:
+            steth_amount = self.model.withdraw(holder.address, amount, version)
+        except ModelRevert as e:
+            with brownie.reverts(e.reason):
+                self.vault.withdraw(amount, version, holder, {"from": holder})
+        else:
+            tx = self.vault.withdraw(amount, version, holder, {"from": holder})
+            assert tx.events["Withdrawn"]["steth_amount_received"] == steth_amount
+
+    def rule_withdraw(self, st_holder, st_percent):
+        holder = self.holders[st_holder]
+        self._withdraw(holder, self.model.beth.balance_of(holder.address) * st_percent // 100, self.model.version)
+
+    def rule_withdraw_unexpected_version(self, st_holder):
+        holder = self.holders[st_holder]
+        self._withdraw(holder, self.model.beth.balance_of(holder.address), self.model.version - 1)
+
+    def rule_pause(self, st_is_admin):
+        caller = self.admin if st_is_admin else self.stranger
+        try:
+            self.model.pause(caller.address)
+        except ModelRevert:
+            with brownie.reverts():
+                self.vault.pause({"from": caller})
+        else:
+            self.vault.pause({"from": caller})
+
+    def rule_resume(self, st_is_admin):
+        caller = self.admin if st_is_admin else self.stranger
+        try:
+            self.model.resume(caller.address)
+        except ModelRevert:
+            with brownie.reverts():
+                self.vault.resume({"from": caller})
+        else:
+            self.vault.resume({"from": caller})
+
+    def invariant(self):
+        assert self.vault.get_rate() == self.model.get_rate()
+        assert self.vault.operations_allowed() == self.model.operations_allowed
+        assert self.beth_token.totalSupply() == self.model.beth.total_supply
+        assert self.steth_token.balanceOf(self.vault) == self.model.steth_balance
+        for holder in self.holders:
+            assert self.beth_token.balanceOf(holder) == self.model.beth.balance_of(holder.address)
+
+
+def test_model_matches_upgraded_vault(
+    state_machine, vault_v4, accounts, steth_token, lido, lido_dao_agent, stranger
+):
+    vault = get_contract(config.vault_proxy_addr)
+    beth_token = get_contract(config.beth_token_addr)
+
+    state_machine(
+        VaultDifferentialMachine,
+        accounts,
+        vault,
+        beth_token,
+        steth_token,
+        lido,
+        lido_dao_agent,
+        stranger,
+        settings={"max_examples": 20, "stateful_step_count": 10},
+    )
@@ -0,0 +1,55 @@
+import pytest
+
+from utils.abi import get_contract
+from utils.config import vault_proxy_addr
+from utils.dao import encode_finalize_upgrade_v4, encode_proxy_upgrade
+from utils.evm_script import decode_call_script
+from utils.vote_builder import (
+    VOTE_EXECUTION_OVERHEAD_GAS,
+    VoteAction,
+    build_votes,
+    format_votes_report,
+    split_into_votes,
+)
+
+
+def make_actions(gas_amounts):
+    return [VoteAction(vault_proxy_addr, bytes([i]) * 4, gas) for (i, gas) in enumerate(gas_amounts)]
+
+
+def test_split_keeps_order_and_fills_votes():
+    actions = make_actions([400, 300, 300, 500, 100])
+
+    votes = split_into_votes(actions, VOTE_EXECUTION_OVERHEAD_GAS + 1000)
+
+    assert [[action.gas for action in vote.actions] for vote in votes] == [[400, 300, 300], [500, 100]]
+    assert [action for vote in votes for action in vote.actions] == actions
+    assert all(vote.gas <= VOTE_EXECUTION_OVERHEAD_GAS + 1000 for vote in votes)
+    assert [len(decode_call_script(vote.evm_script)) for vote in votes] == [3, 2]
+    assert votes[0].script_size == 4 + 3 * (20 + 4 + 4)
+
+
+def test_split_rejects_action_over_budget():
+    with pytest.raises(ValueError):
+        split_into_votes(make_actions([100, 2000]), VOTE_EXECUTION_OVERHEAD_GAS + 1000)
+
+
+def test_build_upgrade_votes(deployer, AnchorVault):
+    vault = get_contract(vault_proxy_addr)
+    new_vault = AnchorVault.deploy({"from": deployer})
+    actions = [
+        encode_proxy_upgrade(new_impl_address=new_vault, setup_calldata=b""),
+        encode_finalize_upgrade_v4(),
+    ]
+
+    [vote] = build_votes(actions)
+
+    assert len(vote.actions) == 2
+    assert all(action.gas > 0 for action in vote.actions)
+    assert "finalize_upgrade_v4()" in format_votes_report([vote])
+    # the actions were applied only for the estimation
+    assert vault.version() == 3
+
+    votes = build_votes(actions, gas_budget=VOTE_EXECUTION_OVERHEAD_GAS + max(a.gas for a in vote.actions))
+    assert [len(v.actions) for v in votes] == [1, 1]
+
@@ -0,0 +1,60 @@
+from utils.config import vault_proxy_addr
+from utils.trace import build_call_tree
+from utils.vote_profiler import format_profile_report, profile_vote_execution
+
+ERC1967_IMPLEMENTATION_SLOT = 0x360894A13BA1A3210667C828492DB98DCA3E2076CC3735A920A3CA505D382BBC
+VAULT_VERSION_SLOT = 13
+
+CALLER = "0x" + "11" * 20
+TARGET = "0x" + "22" * 20
+LIBRARY = "0x" + "33" * 20
+
+
+def word(value):
+    return format(value, "064x")
+
+
+def test_build_call_tree():
+    struct_logs = [
+        {"op": "SLOAD", "depth": 1, "gas": 1000, "stack": [word(1)]},
+        {"op": "CALL", "depth": 1, "gas": 900, "stack": [word(int(TARGET, 16)), word(0)]},
+        {"op": "SSTORE", "depth": 2, "gas": 800, "stack": [word(7), word(2)]},
+        {"op": "DELEGATECALL", "depth": 2, "gas": 700, "stack": [word(int(LIBRARY, 16)), word(0)]},
+        {"op": "SSTORE", "depth": 3, "gas": 600, "stack": [word(5), word(3)]},
+        {"op": "REVERT", "depth": 3, "gas": 500, "stack": []},
+        {"op": "STOP", "depth": 2, "gas": 450, "stack": []},
+        {"op": "STOP", "depth": 1, "gas": 300, "stack": []},
+    ]
+
+    root = build_call_tree(struct_logs, CALLER, 750)
+
+    [call] = root.children
+    [delegate_call] = call.children
+    assert (call.op, call.target, call.gas_used) == ("CALL", TARGET, 600)
+    assert (delegate_call.storage_address, delegate_call.gas_used, delegate_call.reverted) == (TARGET, 250, True)
+    assert root.storage_reads() == {CALLER: [1]}
+    # the write of the reverted delegate call is rolled back
+    assert root.storage_writes() == {TARGET: {2: 7}}
+
+
+def test_profile_upgrade_vote(deploy_vault_and_start_dao_vote, helpers, dao_voting, tmp_path):
+    (new_vault, vote_id) = deploy_vault_and_start_dao_vote()
+    tx = helpers.pass_and_exec_dao_vote(vote_id)
+
+    profiles = profile_vote_execution(dao_voting, vote_id, tx.txid, cache_dir=str(tmp_path))
+
+    assert [profile.description for profile in profiles] == [
+        "forward(bytes) -> proxy_upgradeTo(address,bytes)",
+        "forward(bytes) -> finalize_upgrade_v4()",
+    ]
+    assert 0 < sum(profile.gas for profile in profiles) < tx.gas_used
+    assert profiles[0].storage_writes()[vault_proxy_addr.lower()][ERC1967_IMPLEMENTATION_SLOT] == int(
+        new_vault.address, 16
+    )
+    assert profiles[1].storage_writes()[vault_proxy_addr.lower()][VAULT_VERSION_SLOT] == 4
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # the second profile is built from the cached trace
+    cached = profile_vote_execution(dao_voting, vote_id, tx.txid, cache_dir=str(tmp_path))
+    assert [profile.gas for profile in cached] == [profile.gas for profile in profiles]
+    assert "finalize_upgrade_v4()" in format_profile_report(profiles)
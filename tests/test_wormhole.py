@@ -0,0 +1,66 @@
+import random
+
+from utils.wormhole import (
+    CHAIN_ID_ETHERUM,
+    CHAIN_ID_TERRA,
+    TRANSFER_PAYLOAD_SIZE,
+    TransferPayload,
+    assemble_transfer_payload,
+    decode_transfer_payload,
+    decode_transfer_payloads,
+    denormalize_amount,
+    encode_transfer_payloads,
+    normalize_amount,
+    to_bytes32,
+)
+
+BETH_TOKEN = "0x707F9118e33A9B8998beA41dd0d46f38bb963FC8"
+TERRA_ADDRESS = "0xabcdefabcdefabcdefabcdefabcdefabcdefabcdefabcdefabcdefabcdefabcd"
+
+
+def test_normalize_amount_is_exact():
+    amount = 123456789_123456789_123456789
+
+    assert normalize_amount(amount, 18) == 123456789_12345678
+    assert denormalize_amount(normalize_amount(amount, 18), 18) == 123456789_123456780_000000000
+    # float division gives 1234567891234567936 here
+    assert normalize_amount(12345678912345678999999999999, 18) == 1234567891234567899
+    assert normalize_amount(10**18 - 1, 18) == 10**8 - 1
+    assert normalize_amount(12345, 6) == denormalize_amount(12345, 6) == 12345
+
+
+def test_assemble_transfer_payload_layout():
+    payload = assemble_transfer_payload(BETH_TOKEN, 10**8, TERRA_ADDRESS, CHAIN_ID_ETHERUM, CHAIN_ID_TERRA, 7)
+
+    assert payload == (
+        "0x01"
+        + f"{10**8:064x}"
+        + BETH_TOKEN[2:].lower().rjust(64, "0")
+        + "0002"
+        + TERRA_ADDRESS[2:]
+        + "0003"
+        + f"{7:064x}"
+    )
+    assert decode_transfer_payload(payload) == TransferPayload(
+        10**8, to_bytes32(BETH_TOKEN), CHAIN_ID_ETHERUM, to_bytes32(TERRA_ADDRESS), CHAIN_ID_TERRA, 7
+    )
+
+
+def test_bulk_round_trip():
+    rnd = random.Random(1)
+    payloads = [
+        TransferPayload(
+            rnd.randrange(2**256),
+            rnd.randbytes(32),
+            rnd.randrange(2**16),
+            rnd.randbytes(32),
+            rnd.randrange(2**16),
+            rnd.randrange(2**256),
+        )
+        for _ in range(1000)
+    ]
+
+    data = encode_transfer_payloads(payloads)
+
+    assert len(data) == TRANSFER_PAYLOAD_SIZE * len(payloads)
+    assert decode_transfer_payloads(data) == payloads
@@ -0,0 +1,95 @@
+import pytest
+from brownie import reverts
+from eth_utils import to_checksum_address
+
+import utils.config as config
+from utils.abi import get_contract
+from utils.beth_reconcile import fetch_token_balances
+from utils.wormhole import CHAIN_ID_ETHERUM, TransferPayload, normalize_amount, to_bytes32
+from utils.wormhole_vaa import (
+    TERRA_TOKEN_BRIDGE_EMITTER,
+    GuardianSet,
+    parse_vaa,
+    recover_signers,
+    transfer_vaas,
+)
+
+# a load-test size by default, set a smaller one for a quick run
+REDEMPTIONS_COUNT = int(config.get_env("REDEMPTIONS_COUNT", is_required=False, default="2000"))
+REDEMPTIONS_PER_TX = 20
+
+
+@pytest.fixture(scope="module")
+def guardian_set():
+    return GuardianSet.generate(seed=b"anchor-collateral-steth")
+
+
+@pytest.fixture(scope="module")
+def token_bridge(deployer, accounts, guardian_set, MockWormholeTokenBridge):
+    bridge = MockWormholeTokenBridge.deploy(
+        guardian_set.addresses, guardian_set.index, 3, TERRA_TOKEN_BRIDGE_EMITTER, {"from": deployer}
+    )
+
+    # move the bETH locked in the real token bridge to the mock one
+    beth_token = get_contract(config.beth_token_addr)
+    real_bridge = accounts.at(config.wormhole_token_bridge_addr, force=True)
+    beth_token.transfer(bridge, beth_token.balanceOf(real_bridge), {"from": real_bridge})
+
+    return bridge
+
+
+def make_transfer(recipient, amount, fee=0):
+    return TransferPayload(
+        normalize_amount(amount, 18),
+        to_bytes32(config.beth_token_addr),
+        CHAIN_ID_ETHERUM,
+        to_bytes32(str(recipient)),
+        CHAIN_ID_ETHERUM,
+        normalize_amount(fee, 18),
+    )
+
+
+def test_vaa_signatures(guardian_set):
+    transfers = [make_transfer("0x" + f"{i:040x}", (i + 1) * 10**18) for i in range(20)]
+
+    vaas = transfer_vaas(transfers, guardian_set, first_sequence=5, processes=1)
+
+    # small chunks to sign in the process pool
+    assert transfer_vaas(transfers, guardian_set, first_sequence=5, processes=2, chunk_size=4) == vaas
+    vaa = parse_vaa(vaas[3])
+    assert vaa.body.sequence == 8
+    assert len(vaa.signatures) == guardian_set.quorum == 13
+    assert recover_signers(vaa) == guardian_set.addresses[: guardian_set.quorum]
+
+
+def test_bridge_then_withdraw(vault_v4, token_bridge, guardian_set, accounts, stranger):
+    beth_token = get_contract(config.beth_token_addr)
+    # only the last recipient sends a transaction
+    recipients = [to_checksum_address(f"0x{i + 0x1000:040x}") for i in range(REDEMPTIONS_COUNT - 1)] + [accounts.add()]
+    amounts = [(i % 100 + 1) * 10**15 + 123 for i in range(REDEMPTIONS_COUNT)]
+    vaas = transfer_vaas([make_transfer(r, a) for (r, a) in zip(recipients, amounts)], guardian_set)
+
+    for i in range(0, len(vaas), REDEMPTIONS_PER_TX):
+        token_bridge.completeTransfers(vaas[i : i + REDEMPTIONS_PER_TX], {"from": stranger})
+
+    # amounts are truncated to 8 decimals by the bridge
+    balances = fetch_token_balances(beth_token.address, [str(r) for r in recipients], "latest")
+    assert balances == [a - a % 10**10 for a in amounts]
+
+    with reverts("transfer already completed"):
+        token_bridge.completeTransfer(vaas[0], {"from": stranger})
+
+    [forged_vaa] = transfer_vaas([make_transfer(stranger, 10**18)], GuardianSet.generate(seed=b"forged"))
+    with reverts("VM signature invalid"):
+        token_bridge.completeTransfer(forged_vaa, {"from": stranger})
+
+    vault = get_contract(config.vault_proxy_addr)
+    steth_token = get_contract(config.steth_token_addr)
+
+    recipient = recipients[-1]
+    stranger.transfer(recipient, 10**17)
+    beth_balance = beth_token.balanceOf(recipient)
+    vault.withdraw(beth_balance, vault.version(), {"from": recipient})
+
+    assert beth_token.balanceOf(recipient) == 0
+    assert steth_token.balanceOf(recipient) > 0
@@ -0,0 +1,242 @@
+"""
+ABI registry of the `interfaces/` directory and the compiled project contracts.
+
+The registry maps function selectors and event topics to their decoders and is
+built once: the result is saved to `build/abi_registry.json` together with a hash
+of all the ABI files, and is rebuilt only when any of the files changes.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
+
+import eth_abi
+from eth_utils.abi import collapse_if_tuple, event_abi_to_log_topic, function_abi_to_4byte_selector
+
+from utils import config
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERFACES_DIR = os.path.join(PROJECT_ROOT, "interfaces")
+BUILD_CONTRACTS_DIR = os.path.join(PROJECT_ROOT, "build", "contracts")
+REGISTRY_CACHE_PATH = os.path.join(PROJECT_ROOT, "build", "abi_registry.json")
+REGISTRY_FORMAT_VERSION = 1
+
+# project contracts compiled by brownie, their ABIs are taken from the build artifacts
+COMPILED_CONTRACTS = ("AnchorVault", "AnchorVaultProxy", "bEth")
+
+# ABIs of the contracts deployed at the addresses from `utils/config.py`
+CONFIG_CONTRACTS = {
+    config.vault_proxy_addr: "AnchorVault",
+    config.beth_token_addr: "bEth",
+    config.steth_token_addr: "Lido",
+    config.ust_token_addr: "UST",
+    config.wormhole_addr: "Wormhole",
+    config.lido_dao_voting_addr: "Voting",
+    config.lido_dao_agent_address: "Agent",
+    config.lido_dao_token_manager_address: "TokenManager",
+    config.lido_accounting_oracle: "AccountingOracle",
+    config.lido_accounting_oracle_hash_consensus: "HashConsensus",
+}
+
+
+class AbiFunction(NamedTuple):
+    """ABI function entry resolved by its selector"""
+
+    contract: str
+    name: str
+    signature: str
+    input_names: tuple[str, ...]
+    input_types: tuple[str, ...]
+
+    def decode_input(self, calldata: bytes) -> dict[str, Any]:
+        return dict(zip(self.input_names, eth_abi.decode_abi(list(self.input_types), calldata[4:])))
+
+
+class AbiEvent(NamedTuple):
+    """ABI event entry resolved by its topic"""
+
+    contract: str
+    name: str
+    signature: str
+    input_names: tuple[str, ...]
+    input_types: tuple[str, ...]
+    indexed: tuple[bool, ...]
+
+    def decode_log(self, topics: list, data: bytes) -> dict[str, Any]:
+        """Decode the event arguments from the log topics (without the first one) and data"""
+
+        data_types = [arg_type for arg_type, indexed in zip(self.input_types, self.indexed) if not indexed]
+        data_values = iter(eth_abi.decode_abi(data_types, data))
+        topic_values = iter(topics)
+
+        args = {}
+        for name, arg_type, indexed in zip(self.input_names, self.input_types, self.indexed):
+            if indexed:
+                topic = bytes(next(topic_values))
+                # dynamic indexed values are stored as hashes and can't be decoded
+                is_dynamic = arg_type in ("bytes", "string") or arg_type.endswith("]") or arg_type.startswith("(")
+                args[name] = topic if is_dynamic else eth_abi.decode_single(arg_type, topic)
+            else:
+                args[name] = next(data_values)
+        return args
+
+
+def _read_abi(path: str) -> list:
+    with open(path) as f:
+        data = json.load(f)
+    return data["abi"] if isinstance(data, dict) else data
+
+
+def abi_files() -> dict[str, str]:
+    """Contract name to ABI file path, for the interfaces and the compiled contracts"""
+
+    files = {
+        os.path.splitext(os.path.basename(path))[0]: path
+        for path in sorted(glob.glob(os.path.join(INTERFACES_DIR, "*.json")))
+    }
+    for name in COMPILED_CONTRACTS:
+        path = os.path.join(BUILD_CONTRACTS_DIR, f"{name}.json")
+        if os.path.exists(path):
+            files[name] = path
+    return files
+
+
+def abi_files_hash(files: dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(name.encode())
+        with open(files[name], "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def load_abis() -> dict[str, list]:
+    return {name: _read_abi(path) for name, path in abi_files().items()}
+
+
+def function_signature(abi_entry: dict) -> str:
+    return f"{abi_entry['name']}({','.join(collapse_if_tuple(arg) for arg in abi_entry['inputs'])})"
+
+
+def build_selector_index(abis: dict[str, list]) -> dict[bytes, AbiFunction]:
+    """
+    Maps 4-byte selectors to functions.
+
+    The same function declared by several contracts (e.g. `transfer(address,uint256)`)
+    is decoded the same way, so the first contract in the name order is kept.
+    """
+
+    index = {}
+    for contract in sorted(abis):
+        for entry in abis[contract]:
+            if entry.get("type") != "function":
+                continue
+            selector = function_abi_to_4byte_selector(entry)
+            if selector in index:
+                continue
+            index[selector] = AbiFunction(
+                contract=contract,
+                name=entry["name"],
+                signature=function_signature(entry),
+                input_names=tuple(arg["name"] for arg in entry["inputs"]),
+                input_types=tuple(collapse_if_tuple(arg) for arg in entry["inputs"]),
+            )
+    return index
+
+
+def build_topic_index(abis: dict[str, list]) -> dict[bytes, AbiEvent]:
+    """Maps event topics to events, the same way as `build_selector_index` does"""
+
+    index = {}
+    for contract in sorted(abis):
+        for entry in abis[contract]:
+            if entry.get("type") != "event" or entry.get("anonymous"):
+                continue
+            topic = event_abi_to_log_topic(entry)
+            if topic in index:
+                continue
+            index[topic] = AbiEvent(
+                contract=contract,
+                name=entry["name"],
+                signature=function_signature(entry),
+                input_names=tuple(arg["name"] for arg in entry["inputs"]),
+                input_types=tuple(collapse_if_tuple(arg) for arg in entry["inputs"]),
+                indexed=tuple(bool(arg.get("indexed")) for arg in entry["inputs"]),
+            )
+    return index
+
+
+class AbiRegistry:
+    def __init__(self, files_hash: str, abis: dict[str, list]):
+        self.files_hash = files_hash
+        self.abis = abis
+        self.functions = build_selector_index(abis)
+        self.events = build_topic_index(abis)
+
+    def save(self, path: str = REGISTRY_CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"version": REGISTRY_FORMAT_VERSION, "hash": self.files_hash, "abis": self.abis}, f)
+
+    @classmethod
+    def load(cls, path: str = REGISTRY_CACHE_PATH, files_hash: Optional[str] = None) -> Optional["AbiRegistry"]:
+        """Load the saved registry, returns None if it's missing or outdated"""
+
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != REGISTRY_FORMAT_VERSION or (files_hash is not None and data["hash"] != files_hash):
+            return None
+        return cls(data["hash"], data["abis"])
+
+    def function(self, calldata: bytes) -> Optional[AbiFunction]:
+        return self.functions.get(bytes(calldata[:4]))
+
+    def event(self, topic: bytes) -> Optional[AbiEvent]:
+        return self.events.get(bytes(topic))
+
+    def decode_log(self, log: dict) -> Optional[tuple[str, dict[str, Any]]]:
+        """Decode a raw `eth_getLogs` or receipt log into the event name and arguments"""
+
+        topics = [bytes.fromhex(t[2:]) if isinstance(t, str) else bytes(t) for t in log["topics"]]
+        event = self.event(topics[0]) if topics else None
+        if event is None:
+            return None
+        data = log["data"]
+        data = bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+        return (event.name, event.decode_log(topics[1:], data))
+
+
+@lru_cache(maxsize=None)
+def get_registry(cache_path: str = REGISTRY_CACHE_PATH) -> AbiRegistry:
+    """Registry for the session, loaded from the disk cache when the ABI files are unchanged"""
+
+    files = abi_files()
+    files_hash = abi_files_hash(files)
+    registry = AbiRegistry.load(cache_path, files_hash)
+    if registry is None:
+        registry = AbiRegistry(files_hash, {name: _read_abi(path) for name, path in files.items()})
+        registry.save(cache_path)
+    return registry
+
+
+def get_selector_index() -> dict[bytes, AbiFunction]:
+    return get_registry().functions
+
+
+@lru_cache(maxsize=None)
+def get_contract(address: str, abi_name: Optional[str] = None):
+    """
+    Cached brownie contract handle.
+
+    The ABI is looked up by the address in `CONFIG_CONTRACTS` unless `abi_name` is given.
+    """
+
+    from brownie import Contract
+
+    abi_name = abi_name or CONFIG_CONTRACTS[address]
+    return Contract.from_abi(abi_name, address, get_registry().abis[abi_name])
@@ -1,12 +1,81 @@
 import csv
+import os
+from functools import lru_cache
+from typing import Iterable, Iterator, NamedTuple
 
 CSV_DOWNLOADED_AT_BLOCK = 17965130
+BETH_HOLDERS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "beth-holders.csv")
+BETH_DECIMALS = 18
 
-def import_beth_holders_from_csv():
-    with open("beth-holders.csv") as csvfile:
+
+class BethHolder(NamedTuple):
+    """bETH holder record from the holders snapshot"""
+
+    address: bytes
+    balance: int
+    pending: bool
+
+    @property
+    def address_hex(self) -> str:
+        return "0x" + self.address.hex()
+
+
+def parse_balance(balance: str, decimals: int = BETH_DECIMALS) -> int:
+    """Convert a formatted token amount like `2,745.26921048` into an exact integer amount"""
+
+    whole, _, fraction = balance.replace(",", "").strip().partition(".")
+    assert len(fraction) <= decimals, f"Balance {balance} has more than {decimals} decimals"
+    return int(whole or "0") * 10**decimals + int(fraction.ljust(decimals, "0"))
+
+
+def format_balance(amount: int, decimals: int = BETH_DECIMALS) -> str:
+    """Convert an integer amount into the CSV representation, e.g. `2,745.26921048`"""
+
+    whole, fraction = divmod(amount, 10**decimals)
+    fraction_str = f"{fraction:0{decimals}d}".rstrip("0")
+    return f"{whole:,}" + (f".{fraction_str}" if fraction_str else "")
+
+
+def parse_holder_row(row: list[str]) -> BethHolder:
+    """Convert a raw `HolderAddress,Balance,PendingBalanceUpdate` CSV row into a holder record"""
+
+    [address, balance, pending] = row
+    address_bytes = bytes.fromhex(address[2:] if address.startswith("0x") else address)
+    assert len(address_bytes) == 20, f"Invalid holder address {address}"
+    return BethHolder(address_bytes, parse_balance(balance), pending.strip().lower() == "yes")
+
+
+def iter_beth_holders(path: str = BETH_HOLDERS_CSV) -> Iterator[BethHolder]:
+    """Stream holder records from the CSV snapshot one row at a time"""
+
+    with open(path, newline="") as csvfile:
         csv_reader = csv.reader(csvfile, delimiter=",")
-        holders = list(csv_reader)[1:]
+        next(csv_reader, None)  # header
+        for row in csv_reader:
+            if row:
+                yield parse_holder_row(row)
+
+
+def write_beth_holders_csv(path: str, holders: Iterable[BethHolder]):
+    """Write holder records in the same format as the downloaded CSV snapshot"""
+
+    with open(path, "w", newline="") as csvfile:
+        csv_writer = csv.writer(csvfile, delimiter=",", quoting=csv.QUOTE_ALL)
+        csv_writer.writerow(["HolderAddress", "Balance", "PendingBalanceUpdate"])
+        for holder in holders:
+            csv_writer.writerow([holder.address_hex, format_balance(holder.balance), "Yes" if holder.pending else "No"])
+
+
+@lru_cache(maxsize=None)
+def import_beth_holders_from_csv(path: str = BETH_HOLDERS_CSV) -> tuple[BethHolder, ...]:
+    """Read and cache the whole CSV snapshot on the first call"""
+
+    return tuple(iter_beth_holders(path))
 
-    return holders
 
-beth_holders = import_beth_holders_from_csv()
\ No newline at end of file
+def __getattr__(name):
+    # `beth_holders` is kept for backward compatibility, but it is loaded lazily
+    # on the first access instead of on the module import
+    if name == "beth_holders":
+        return import_beth_holders_from_csv()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
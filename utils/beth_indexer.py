@@ -0,0 +1,183 @@
+"""
+Incremental bETH holders indexer built from the `Transfer` events of `contracts/bEth.vy`.
+
+Balances are kept in a local SQLite database. Logs are fetched in block-range chunks,
+every chunk is applied in a single database transaction together with the checkpoint,
+so an interrupted run resumes from the last fully processed block.
+"""
+
+import sqlite3
+from typing import Callable, Iterator, Optional, Sequence
+
+from utils.beth import BethHolder
+from utils.rpc import make_request, to_block_id
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+ZERO_ADDRESS_BYTES = bytes(20)
+
+MIN_CHUNK_SIZE = 1
+DEFAULT_CHUNK_SIZE = 2_000
+MAX_CHUNK_SIZE = 100_000
+# logs per chunk the chunk size is adjusted to, keeps the memory usage bounded
+TARGET_LOGS_PER_CHUNK = 5_000
+
+_SQL_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    address BLOB PRIMARY KEY,
+    balance BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+RpcRequest = Callable[[str, Sequence], object]
+
+
+def _topic_to_address(topic: str) -> bytes:
+    return bytes.fromhex(topic[-40:])
+
+
+class TransferIndexer:
+    def __init__(
+        self,
+        db_path: str,
+        token_address: str,
+        start_block: int = 0,
+        request: RpcRequest = make_request,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.token_address = token_address.lower()
+        self.request = request
+        self.chunk_size = chunk_size
+
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(_SCHEMA)
+
+        indexed_token = self._get_checkpoint("token")
+        if indexed_token is None:
+            with self.db:
+                self._set_checkpoint("token", self.token_address)
+                self._set_checkpoint("last_block", start_block - 1)
+        else:
+            assert indexed_token == self.token_address, f"{db_path} indexes another token {indexed_token}"
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get_checkpoint(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM checkpoint WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_checkpoint(self, key: str, value):
+        self.db.execute("INSERT OR REPLACE INTO checkpoint (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def last_block(self) -> int:
+        return int(self._get_checkpoint("last_block"))
+
+    def _get_logs(self, from_block: int, to_block: int) -> list:
+        return self.request(
+            "eth_getLogs",
+            [
+                {
+                    "address": self.token_address,
+                    "topics": [TRANSFER_TOPIC],
+                    "fromBlock": to_block_id(from_block),
+                    "toBlock": to_block_id(to_block),
+                }
+            ],
+        )
+
+    def _apply_chunk(self, logs: list, to_block: int):
+        deltas: dict[bytes, int] = {}
+        for log in logs:
+            if log.get("removed"):
+                continue
+            [_, sender, receiver] = log["topics"][:3]
+            value = int(log["data"], 16)
+            sender = _topic_to_address(sender)
+            receiver = _topic_to_address(receiver)
+            # mints come from and burns go to the zero address
+            if sender != ZERO_ADDRESS_BYTES:
+                deltas[sender] = deltas.get(sender, 0) - value
+            if receiver != ZERO_ADDRESS_BYTES:
+                deltas[receiver] = deltas.get(receiver, 0) + value
+
+        addresses = list(deltas)
+        with self.db:
+            for start in range(0, len(addresses), _SQL_BATCH_SIZE):
+                batch = addresses[start : start + _SQL_BATCH_SIZE]
+                current = dict(
+                    self.db.execute(
+                        f"SELECT address, balance FROM balances WHERE address IN ({','.join('?' * len(batch))})", batch
+                    )
+                )
+                updates = []
+                for address in batch:
+                    balance = int.from_bytes(current.get(address, b""), "big") + deltas[address]
+                    assert balance >= 0, f"Negative balance of 0x{address.hex()} at block {to_block}"
+                    updates.append((address, balance.to_bytes(32, "big")))
+                self.db.executemany("INSERT OR REPLACE INTO balances (address, balance) VALUES (?, ?)", updates)
+            self.db.execute("DELETE FROM balances WHERE balance = ?", (bytes(32),))
+            self._set_checkpoint("last_block", to_block)
+
+    def sync(self, to_block: int, on_chunk: Optional[Callable[[int, int, int], None]] = None) -> int:
+        """
+        Index all the blocks up to `to_block` inclusive, returns the number of processed logs.
+
+        The chunk size is halved when the node rejects a request (usually because of the
+        response size limits) and is adjusted to `TARGET_LOGS_PER_CHUNK` otherwise.
+        """
+
+        processed = 0
+        from_block = self.last_block + 1
+
+        while from_block <= to_block:
+            chunk_to_block = min(from_block + self.chunk_size - 1, to_block)
+            try:
+                logs = self._get_logs(from_block, chunk_to_block)
+            except Exception:
+                if self.chunk_size <= MIN_CHUNK_SIZE:
+                    raise
+                self.chunk_size = max(self.chunk_size // 2, MIN_CHUNK_SIZE)
+                continue
+
+            self._apply_chunk(logs, chunk_to_block)
+            processed += len(logs)
+            if on_chunk is not None:
+                on_chunk(from_block, chunk_to_block, len(logs))
+
+            if len(logs) > TARGET_LOGS_PER_CHUNK:
+                self.chunk_size = max(self.chunk_size // 2, MIN_CHUNK_SIZE)
+            elif len(logs) < TARGET_LOGS_PER_CHUNK // 2:
+                self.chunk_size = min(self.chunk_size * 2, MAX_CHUNK_SIZE)
+
+            from_block = chunk_to_block + 1
+
+        return processed
+
+    def balance_of(self, address: bytes) -> int:
+        row = self.db.execute("SELECT balance FROM balances WHERE address = ?", (address,)).fetchone()
+        return 0 if row is None else int.from_bytes(row[0], "big")
+
+    def total_supply(self) -> int:
+        return sum(int.from_bytes(balance, "big") for (balance,) in self.db.execute("SELECT balance FROM balances"))
+
+    def holders(self) -> Iterator[BethHolder]:
+        """Holders with non-zero balances, sorted by balance in descending order as the downloaded CSV is"""
+
+        # balances are fixed-width big-endian blobs, so the byte order is the numeric one
+        for (address, balance) in self.db.execute(
+            "SELECT address, balance FROM balances ORDER BY balance DESC, address"
+        ):
+            yield BethHolder(address, int.from_bytes(balance, "big"), False)
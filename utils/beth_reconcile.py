@@ -0,0 +1,87 @@
+from typing import Iterable, Optional, Sequence, TypedDict, Union
+
+from utils.beth import BethHolder
+from utils.rpc import DEFAULT_BATCH_SIZE, batch_request, to_block_id
+
+BALANCE_OF_SELECTOR = "0x70a08231"
+
+
+class BalanceChange(TypedDict):
+    """Holder balance change between two snapshots"""
+
+    address: str
+    old_balance: int
+    new_balance: int
+
+
+class HoldersDiff(TypedDict):
+    """Reconciliation report of the holders snapshot against on-chain balances"""
+
+    block: int
+    changed: list[BalanceChange]
+    emptied: list[BalanceChange]
+    new: list[BalanceChange]
+
+
+def _address_bytes(address: Union[str, bytes]) -> bytes:
+    return (
+        address if isinstance(address, bytes) else bytes.fromhex(address[2:] if address.startswith("0x") else address)
+    )
+
+
+def fetch_token_balances(
+    token_address: str,
+    addresses: Sequence[Union[str, bytes]],
+    block: Union[int, str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    endpoint_uri: Optional[str] = None,
+) -> list[int]:
+    """Read `balanceOf` of every address in batched `eth_call` requests pinned to a single block"""
+
+    block_id = to_block_id(block)
+    calls = [
+        (
+            "eth_call",
+            [{"to": token_address, "data": BALANCE_OF_SELECTOR + _address_bytes(address).hex().zfill(64)}, block_id],
+        )
+        for address in addresses
+    ]
+    return [int(result, 16) for result in batch_request(calls, batch_size, endpoint_uri)]
+
+
+def reconcile_holders(
+    holders: Iterable[BethHolder], balances: dict[bytes, int], block: int
+) -> tuple[list[BethHolder], HoldersDiff]:
+    """
+    Build the refreshed holders list from the actual balances.
+
+    `balances` must contain every snapshot holder and may contain extra candidate
+    addresses, non-zero ones are reported as new holders. The refreshed list is
+    sorted by balance in descending order, as the downloaded CSV is. The holders
+    keep their pending balance update flags, the new ones have none.
+    """
+
+    diff = HoldersDiff(block=block, changed=[], emptied=[], new=[])
+    pending = {}
+
+    for holder in holders:
+        pending[holder.address] = holder.pending
+        balance = balances[holder.address]
+        change = BalanceChange(address=holder.address_hex, old_balance=holder.balance, new_balance=balance)
+        if balance == 0:
+            diff["emptied"].append(change)
+        elif balance != holder.balance:
+            diff["changed"].append(change)
+
+    for address, balance in balances.items():
+        if address not in pending and balance > 0:
+            diff["new"].append(BalanceChange(address="0x" + address.hex(), old_balance=0, new_balance=balance))
+
+    refreshed = [
+        BethHolder(address, balance, pending.get(address, False))
+        for address, balance in balances.items()
+        if balance > 0
+    ]
+    refreshed.sort(key=lambda holder: (-holder.balance, holder.address))
+
+    return (refreshed, diff)
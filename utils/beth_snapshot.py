@@ -0,0 +1,212 @@
+"""
+Columnar binary format for bETH holder snapshots.
+
+The file is laid out as a fixed-size header followed by fixed-width columns,
+so it can be memory-mapped and read without any parsing:
+
+    header    32 bytes   magic, format version, snapshot block, holders count
+    address   20 bytes   per holder, in the original snapshot order
+    balance   32 bytes   per holder, big-endian uint256
+    pending    1 byte    per holder, 0 or 1
+    index      4 bytes   per holder, big-endian uint32 row numbers sorted by address
+
+The index column allows O(log n) lookups by address while keeping the original
+order of the rows, so the conversion to CSV and back is lossless.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Iterator, Optional, Union
+
+from utils.beth import (
+    BETH_HOLDERS_CSV,
+    CSV_DOWNLOADED_AT_BLOCK,
+    BethHolder,
+    iter_beth_holders,
+    write_beth_holders_csv,
+)
+
+BETH_HOLDERS_SNAPSHOT = os.path.splitext(BETH_HOLDERS_CSV)[0] + ".bin"
+
+SNAPSHOT_MAGIC = b"BETHSNAP"
+SNAPSHOT_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct(">8sHHQQ4x")
+ADDRESS_SIZE = 20
+BALANCE_SIZE = 32
+PENDING_SIZE = 1
+INDEX_SIZE = 4
+ROW_SIZE = ADDRESS_SIZE + BALANCE_SIZE + PENDING_SIZE + INDEX_SIZE
+
+
+def _to_address_bytes(address: Union[str, bytes]) -> bytes:
+    if isinstance(address, str):
+        address = bytes.fromhex(address[2:] if address.startswith("0x") else address)
+    assert len(address) == ADDRESS_SIZE, f"Invalid address {address!r}"
+    return address
+
+
+def write_snapshot(path: str, holders: Iterable[BethHolder], block: int):
+    """Write holder records into a binary snapshot taken at `block`"""
+
+    addresses = bytearray()
+    balances = bytearray()
+    pending = bytearray()
+
+    for holder in holders:
+        addresses += _to_address_bytes(holder.address)
+        balances += holder.balance.to_bytes(BALANCE_SIZE, "big")
+        pending.append(1 if holder.pending else 0)
+
+    count = len(pending)
+    order = sorted(range(count), key=lambda i: addresses[i * ADDRESS_SIZE : (i + 1) * ADDRESS_SIZE])
+    index = b"".join(i.to_bytes(INDEX_SIZE, "big") for i in order)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, 0, block, count))
+        f.write(addresses)
+        f.write(balances)
+        f.write(pending)
+        f.write(index)
+
+
+class HolderSnapshot:
+    """Read-only memory-mapped view of a binary holder snapshot"""
+
+    def __init__(self, path: str = BETH_HOLDERS_SNAPSHOT):
+        self.path = path
+        with open(path, "rb") as f:
+            assert os.fstat(f.fileno()).st_size >= _HEADER.size, f"Snapshot {path} is truncated"
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, self.block, self._count) = _HEADER.unpack_from(self._mmap, 0)
+        assert magic == SNAPSHOT_MAGIC, f"{path} is not a bETH holders snapshot"
+        assert version == SNAPSHOT_FORMAT_VERSION, f"Unsupported snapshot format version {version}"
+        assert len(self._mmap) == _HEADER.size + self._count * ROW_SIZE, f"Snapshot {path} is truncated"
+
+        self._addresses_offset = _HEADER.size
+        self._balances_offset = self._addresses_offset + self._count * ADDRESS_SIZE
+        self._pending_offset = self._balances_offset + self._count * BALANCE_SIZE
+        self._index_offset = self._pending_offset + self._count * PENDING_SIZE
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def address(self, row: int) -> bytes:
+        offset = self._addresses_offset + row * ADDRESS_SIZE
+        return self._mmap[offset : offset + ADDRESS_SIZE]
+
+    def balance(self, row: int) -> int:
+        offset = self._balances_offset + row * BALANCE_SIZE
+        return int.from_bytes(self._mmap[offset : offset + BALANCE_SIZE], "big")
+
+    def pending(self, row: int) -> bool:
+        return self._mmap[self._pending_offset + row] != 0
+
+    def __getitem__(self, row: int) -> BethHolder:
+        if row < 0:
+            row += self._count
+        if not 0 <= row < self._count:
+            raise IndexError("holder index out of range")
+        return BethHolder(self.address(row), self.balance(row), self.pending(row))
+
+    def __iter__(self) -> Iterator[BethHolder]:
+        for row in range(self._count):
+            yield self[row]
+
+    def _sorted_row(self, position: int) -> int:
+        offset = self._index_offset + position * INDEX_SIZE
+        return int.from_bytes(self._mmap[offset : offset + INDEX_SIZE], "big")
+
+    def find(self, address: Union[str, bytes]) -> Optional[int]:
+        """Binary search the address index, returns the row number or None"""
+
+        address = _to_address_bytes(address)
+        (lo, hi) = (0, self._count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.address(self._sorted_row(mid)) < address:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < self._count:
+            row = self._sorted_row(lo)
+            if self.address(row) == address:
+                return row
+        return None
+
+    def __contains__(self, address: Union[str, bytes]) -> bool:
+        return self.find(address) is not None
+
+    def get(self, address: Union[str, bytes]) -> Optional[BethHolder]:
+        row = self.find(address)
+        return None if row is None else self[row]
+
+    def balance_of(self, address: Union[str, bytes]) -> int:
+        row = self.find(address)
+        return 0 if row is None else self.balance(row)
+
+    def total_balance(self) -> int:
+        return sum(self.balance(row) for row in range(self._count))
+
+
+def csv_to_snapshot(
+    csv_path: str = BETH_HOLDERS_CSV, snapshot_path: str = BETH_HOLDERS_SNAPSHOT, block: int = CSV_DOWNLOADED_AT_BLOCK
+):
+    write_snapshot(snapshot_path, iter_beth_holders(csv_path), block)
+
+
+def snapshot_to_csv(snapshot_path: str = BETH_HOLDERS_SNAPSHOT, csv_path: str = BETH_HOLDERS_CSV) -> int:
+    """Convert a binary snapshot back to CSV, returns the snapshot block"""
+
+    with HolderSnapshot(snapshot_path) as snapshot:
+        write_beth_holders_csv(csv_path, snapshot)
+        return snapshot.block
+
+
+def open_holder_snapshot(
+    snapshot_path: str = BETH_HOLDERS_SNAPSHOT, csv_path: str = BETH_HOLDERS_CSV, block: int = CSV_DOWNLOADED_AT_BLOCK
+) -> HolderSnapshot:
+    """Open the binary snapshot, (re)building it from the CSV when it is missing or outdated"""
+
+    if not os.path.exists(snapshot_path) or os.path.getmtime(snapshot_path) < os.path.getmtime(csv_path):
+        csv_to_snapshot(csv_path, snapshot_path, block)
+    return HolderSnapshot(snapshot_path)
+
+
+def main(args):
+    """
+    Usage:
+        python -m utils.beth_snapshot to-bin [csv_path] [snapshot_path] [block]
+        python -m utils.beth_snapshot to-csv [snapshot_path] [csv_path]
+    """
+
+    if len(args) < 1 or args[0] not in ("to-bin", "to-csv"):
+        print(main.__doc__)
+        return 1
+
+    if args[0] == "to-bin":
+        [csv_path, snapshot_path, block] = (args[1:] + [None] * 3)[:3]
+        csv_to_snapshot(
+            csv_path or BETH_HOLDERS_CSV, snapshot_path or BETH_HOLDERS_SNAPSHOT, int(block or CSV_DOWNLOADED_AT_BLOCK)
+        )
+    else:
+        [snapshot_path, csv_path] = (args[1:] + [None] * 2)[:2]
+        snapshot_to_csv(snapshot_path or BETH_HOLDERS_SNAPSHOT, csv_path or BETH_HOLDERS_CSV)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,5 +1,6 @@
-from utils.evm_script import encode_call_script, EMPTY_CALLSCRIPT
-from brownie import interface, AnchorVault
+from utils.evm_script import encode_call_script, CallScriptBuilder, EMPTY_CALLSCRIPT
+from utils.abi import get_contract
+from utils.storage import get_storage_at, mapping_slot, read_packed, set_storage_at, write_packed
 from utils.config import (
     lido_dao_agent_address,
     vault_proxy_addr
@@ -8,6 +9,7 @@ from utils.config import (
 from typing import (
     Tuple,
     Sequence,
+    Union,
 )
 
 def create_vote(voting, token_manager, vote_desc, evm_script, tx_params):
@@ -25,17 +27,19 @@ def create_vote(voting, token_manager, vote_desc, evm_script, tx_params):
     return (vote_id, tx)
 
 
-def agent_forward(call_script: Sequence[Tuple[str, str]]) -> Tuple[str, str]:
-    agent = interface.Agent(lido_dao_agent_address)
+def agent_forward(call_script: Union[Sequence[Tuple[str, str]], CallScriptBuilder]) -> Tuple[str, str]:
+    agent = get_contract(lido_dao_agent_address)
+    if not isinstance(call_script, CallScriptBuilder):
+        call_script = CallScriptBuilder().extend(call_script)
     return (
         lido_dao_agent_address,
         agent.forward.encode_input(
-            encode_call_script(call_script)
+            call_script.to_bytes()
         )
     )
 
 def encode_proxy_upgrade(new_impl_address: str, setup_calldata: str) -> Tuple[str, str]:
-    proxy = interface.AnchorVaultProxy(vault_proxy_addr)
+    proxy = get_contract(vault_proxy_addr, "AnchorVaultProxy")
 
     return agent_forward(
         [
@@ -47,7 +51,7 @@ def encode_proxy_upgrade(new_impl_address: str, setup_calldata: str) -> Tuple[st
     )
 
 def encode_finalize_upgrade_v4() -> Tuple[str, str]:
-    vault = AnchorVault.at(vault_proxy_addr)
+    vault = get_contract(vault_proxy_addr)
 
     return agent_forward(
         [
@@ -57,3 +61,36 @@ def encode_finalize_upgrade_v4() -> Tuple[str, str]:
             )
         ]
     )
+
+# Aragon Voting storage layout: `mapping(uint256 => Vote) votes` is declared at slot 2, the packed
+# first word of `Vote` is (executed: bool, startDate: uint64, snapshotBlock: uint64, supportRequired: uint64)
+VOTING_VOTES_SLOT = 2
+VOTE_START_DATE_OFFSET = 1
+VOTE_START_DATE_SIZE = 8
+VOTE_YEA_WORD = 2
+VOTE_NAY_WORD = 3
+VOTE_VOTING_POWER_WORD = 4
+
+def force_pass_vote(voting, vote_id):
+    """
+    Make a vote executable by writing the Voting storage directly: all the voting power
+    is counted as `yea` and the vote start is moved back by the vote duration.
+    """
+    vote_slot = mapping_slot(vote_id, VOTING_VOTES_SLOT)
+    address = voting.address
+
+    voting_power = get_storage_at(address, vote_slot + VOTE_VOTING_POWER_WORD)
+    set_storage_at(address, vote_slot + VOTE_YEA_WORD, voting_power)
+    set_storage_at(address, vote_slot + VOTE_NAY_WORD, 0)
+
+    word = get_storage_at(address, vote_slot)
+    start_date = read_packed(word, VOTE_START_DATE_OFFSET, VOTE_START_DATE_SIZE)
+    new_start_date = start_date - voting.voteTime()
+    set_storage_at(address, vote_slot, write_packed(word, VOTE_START_DATE_OFFSET, VOTE_START_DATE_SIZE, new_start_date))
+
+    vote = voting.getVote(vote_id)
+    actual = (vote['startDate'], vote['yea'], vote['nay'], vote['votingPower'])
+    if actual != (new_start_date, voting_power, 0, voting_power):
+        raise AssertionError(f'unexpected Voting storage layout, vote {vote_id} is {vote}')
+    if not voting.canExecute(vote_id):
+        raise AssertionError(f'vote {vote_id} is not executable after the storage override')
@@ -0,0 +1,220 @@
+"""
+Read backends for the fork tier: the forked node or an in-process EVM.
+
+The in-process backend runs py-evm through eth-tester, seeded with the fork block
+state recorded by `utils.rpc_cache`. It needs neither a node process nor HTTP round
+trips, which dominate the cost of the many small reads like `vault.version()`.
+
+The backend is selected with the `EVM_BACKEND` environment variable: `node` (the
+default) reads through the brownie connection, `pyevm` from the in-process EVM.
+eth-tester and py-evm are not project dependencies and are imported only then.
+
+Only the storage slots the recorded run has read are known to the in-process EVM.
+Reading another slot of a fork contract raises `UnrecordedStateError` instead of
+returning zero, or with `EVM_STATE_FALLBACK=<endpoint>` reads the slot at the fork
+block from that endpoint, e.g. the caching proxy.
+"""
+
+from typing import NamedTuple, Optional
+
+from eth_utils import to_canonical_address, to_checksum_address
+
+from utils import config
+from utils.abi import CONFIG_CONTRACTS, get_registry
+from utils.config import get_env
+from utils.rpc import batch_request
+from utils.rpc_cache import RPC_CACHE_STORE, RpcResponseStore
+
+DEFAULT_FORK_BLOCK = 17965130
+
+BACKEND_NODE = "node"
+BACKEND_PYEVM = "pyevm"
+
+# contracts the unit tier reads, their code must be in the recorded state
+FORK_CONTRACTS = (
+    config.vault_proxy_addr,
+    config.vault_impl_addr,
+    config.beth_token_addr,
+    config.steth_token_addr,
+    config.lido_dao_voting_addr,
+)
+
+
+class UnrecordedStateError(LookupError):
+    pass
+
+
+class AccountState(NamedTuple):
+    balance: int
+    nonce: int
+    code: bytes
+    storage: dict[int, int]
+
+
+class ForkState(NamedTuple):
+    block: int
+    timestamp: int
+    gas_limit: int
+    accounts: dict[str, AccountState]
+    # the slots of every account read by the recorded run, the zero ones included
+    recorded_slots: dict[str, frozenset[int]]
+
+
+def load_fork_state(
+    store: RpcResponseStore, block: int = DEFAULT_FORK_BLOCK, contracts: tuple = FORK_CONTRACTS
+) -> ForkState:
+    """State of the accounts at `block` as far as it was recorded by the caching proxy"""
+
+    block_tag = hex(block)
+    fields: dict[str, dict] = {}
+
+    def account(address: str) -> dict:
+        return fields.setdefault(address, {"balance": 0, "nonce": 0, "code": b"", "storage": {}})
+
+    for (params, result) in store.responses("eth_getStorageAt"):
+        if params[2] == block_tag:
+            account(params[0])["storage"][int(params[1], 16)] = int(result, 16)
+    for (params, result) in store.responses("eth_getCode"):
+        if params[1] == block_tag:
+            account(params[0])["code"] = bytes.fromhex(result[2:])
+    for (params, result) in store.responses("eth_getBalance"):
+        if params[1] == block_tag:
+            account(params[0])["balance"] = int(result, 16)
+    for (params, result) in store.responses("eth_getTransactionCount"):
+        if params[1] == block_tag:
+            account(params[0])["nonce"] = int(result, 16)
+
+    header = next(
+        (result for (params, result) in store.responses("eth_getBlockByNumber") if params[0] == block_tag), None
+    )
+    assert header is not None, f"block {block} is not in the RPC cache"
+
+    # zero storage values are implicit in the genesis state
+    accounts = {
+        to_checksum_address(address): AccountState(
+            f["balance"], f["nonce"], f["code"], {slot: value for (slot, value) in f["storage"].items() if value}
+        )
+        for (address, f) in fields.items()
+        if f["code"] or f["balance"] or f["nonce"] or f["storage"]
+    }
+    missing = [address for address in contracts if to_checksum_address(address) not in accounts]
+    assert not missing, f"no recorded state of {missing} at block {block}, record a fork test run first"
+    recorded_slots = {to_checksum_address(address): frozenset(f["storage"]) for (address, f) in fields.items()}
+
+    return ForkState(block, int(header["timestamp"], 16), int(header["gasLimit"], 16), accounts, recorded_slots)
+
+
+def fork_account_db_class(state: ForkState, fallback_uri: Optional[str] = None):
+    """
+    py-evm account DB failing on the reads of the storage of the fork contracts that
+    wasn't recorded, or reading it from `fallback_uri` at the fork block.
+    """
+
+    from eth.db.account import AccountDB
+
+    recorded = {
+        to_canonical_address(address): state.recorded_slots.get(address, frozenset())
+        for (address, account) in state.accounts.items()
+        if account.code
+    }
+    fetched: dict[tuple[bytes, int], int] = {}
+
+    class ForkAccountDB(AccountDB):
+        def get_storage(self, address, slot, from_journal=True):
+            value = super().get_storage(address, slot, from_journal)
+            # the slots written on the in-process chain are not zero unless cleared
+            if value or address not in recorded or slot in recorded[address]:
+                return value
+            if (address, slot) not in fetched:
+                contract = to_checksum_address(address)
+                if fallback_uri is None:
+                    raise UnrecordedStateError(
+                        f"slot {hex(slot)} of {contract} at block {state.block} is not recorded, "
+                        f"record a fork test run reading it first"
+                    )
+                [word] = batch_request([("eth_getStorageAt", [contract, hex(slot), hex(state.block)])], 1, fallback_uri)
+                fetched[(address, slot)] = int(word, 16)
+            return fetched[(address, slot)]
+
+    return ForkAccountDB
+
+
+class NodeBackend:
+    """Reads through a web3 connection, the brownie one by default"""
+
+    name = BACKEND_NODE
+
+    def __init__(self, web3=None):
+        if web3 is None:
+            from brownie import web3
+        self.web3 = web3
+
+    def contract(self, address: str, abi_name: Optional[str] = None):
+        abi_name = abi_name or CONFIG_CONTRACTS[address]
+        return self.web3.eth.contract(address=to_checksum_address(address), abi=get_registry().abis[abi_name])
+
+
+class InProcessBackend(NodeBackend):
+    """
+    py-evm chain with the fork state as the genesis state.
+
+    The chain starts at block 0 with the timestamp and the gas limit of the fork block,
+    the test accounts of eth-tester are funded in addition to the fork accounts. The
+    unrecorded storage is handled by `fork_account_db_class`.
+    """
+
+    name = BACKEND_PYEVM
+
+    def __init__(self, state: ForkState, fallback_uri: Optional[str] = None):
+        try:
+            from eth.vm.forks import LondonVM
+            from eth_tester import EthereumTester, PyEVMBackend
+            from web3 import EthereumTesterProvider, Web3
+        except ImportError as e:
+            raise ImportError("the in-process backend requires `pip install eth-tester[py-evm]`") from e
+
+        genesis_params = PyEVMBackend.generate_genesis_params(
+            overrides={"timestamp": state.timestamp, "gas_limit": state.gas_limit}
+        )
+        genesis_state = PyEVMBackend.generate_genesis_state()
+        for (address, account) in state.accounts.items():
+            genesis_state[to_canonical_address(address)] = account._asdict()
+
+        state_class = LondonVM.get_state_class().configure(account_db_class=fork_account_db_class(state, fallback_uri))
+        vm_configuration = ((0, LondonVM.configure(_state_class=state_class)),)
+
+        self.state = state
+        self.tester = EthereumTester(
+            PyEVMBackend(
+                genesis_parameters=genesis_params, genesis_state=genesis_state, vm_configuration=vm_configuration
+            )
+        )
+        super().__init__(Web3(EthereumTesterProvider(self.tester)))
+
+    @classmethod
+    def from_store(
+        cls, store_path: str = RPC_CACHE_STORE, block: int = DEFAULT_FORK_BLOCK, fallback_uri: Optional[str] = None
+    ) -> "InProcessBackend":
+        store = RpcResponseStore(store_path)
+        try:
+            return cls(load_fork_state(store, block), fallback_uri)
+        finally:
+            store.close()
+
+    def snapshot(self) -> int:
+        return self.tester.take_snapshot()
+
+    def revert(self, snapshot_id: int):
+        self.tester.revert_to_snapshot(snapshot_id)
+
+
+def get_backend(name: Optional[str] = None) -> NodeBackend:
+    name = name or get_env("EVM_BACKEND", is_required=False, default=BACKEND_NODE)
+    if name == BACKEND_PYEVM:
+        return InProcessBackend.from_store(
+            get_env("RPC_CACHE_STORE", is_required=False, default=RPC_CACHE_STORE),
+            int(get_env("FORK_BLOCK", is_required=False, default=DEFAULT_FORK_BLOCK)),
+            get_env("EVM_STATE_FALLBACK", is_required=False),
+        )
+    assert name == BACKEND_NODE, f"unknown EVM backend {name}"
+    return NodeBackend()
@@ -1,20 +1,98 @@
-import eth_abi
-from web3 import Web3
-from eth_typing.evm import HexAddress
+from typing import Iterable, Tuple, Union
 
 EMPTY_CALLSCRIPT = '0x00000001'
 
+CALLSCRIPT_SPEC_ID = 1
+EXECUTOR_ID_SIZE = 4
+ADDRESS_SIZE = 20
+CALLDATA_LENGTH_SIZE = 4
+
 def create_executor_id(id):
     return '0x' + str(id).zfill(8)
 
 def strip_byte_prefix(hexstr):
     return hexstr[2:] if hexstr[0:2] == '0x' else hexstr
 
-def encode_call_script(actions, spec_id = 1):
-    result = create_executor_id(spec_id)
-    for to, calldata in actions:
-        addr_bytes = Web3.toBytes(hexstr=HexAddress(to)).hex()
-        calldata_bytes = strip_byte_prefix(calldata)
-        length = eth_abi.encode_single('int256', len(calldata_bytes) // 2).hex()
-        result += addr_bytes + length[56:] + calldata_bytes
-    return result
+def to_bytes(value: Union[str, bytes]) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return bytes.fromhex(strip_byte_prefix(value))
+
+
+class CallScriptBuilder:
+    """
+    Incremental Aragon callscript encoder.
+
+    Actions are appended to a single bytearray, so building a script of any number
+    of actions takes linear time:
+
+        builder = CallScriptBuilder()
+        for (to, calldata) in actions:
+            builder.add(to, calldata)
+        script = builder.to_hex()
+    """
+
+    def __init__(self, spec_id: int = CALLSCRIPT_SPEC_ID):
+        self._script = bytearray(spec_id.to_bytes(EXECUTOR_ID_SIZE, 'big'))
+        self.actions_count = 0
+
+    def add(self, to: Union[str, bytes], calldata: Union[str, bytes]) -> 'CallScriptBuilder':
+        addr_bytes = to_bytes(to)
+        calldata_bytes = to_bytes(calldata)
+        assert len(addr_bytes) == ADDRESS_SIZE, f'invalid action target {to}'
+        self._script += addr_bytes
+        self._script += len(calldata_bytes).to_bytes(CALLDATA_LENGTH_SIZE, 'big')
+        self._script += calldata_bytes
+        self.actions_count += 1
+        return self
+
+    def extend(self, actions: Iterable[Tuple[Union[str, bytes], Union[str, bytes]]]) -> 'CallScriptBuilder':
+        for to, calldata in actions:
+            self.add(to, calldata)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._script)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._script)
+
+    def to_hex(self) -> str:
+        return '0x' + self._script.hex()
+
+
+def encode_call_script_bytes(actions, spec_id = CALLSCRIPT_SPEC_ID) -> bytes:
+    return CallScriptBuilder(spec_id).extend(actions).to_bytes()
+
+def encode_call_script(actions, spec_id = CALLSCRIPT_SPEC_ID) -> str:
+    return CallScriptBuilder(spec_id).extend(actions).to_hex()
+
+
+def decode_call_script(script: Union[str, bytes]) -> list:
+    """Split a callscript into a list of `(target, calldata)` actions"""
+
+    script_bytes = to_bytes(script)
+    assert len(script_bytes) >= EXECUTOR_ID_SIZE, 'callscript is too short'
+    spec_id = int.from_bytes(script_bytes[:EXECUTOR_ID_SIZE], 'big')
+    assert spec_id == CALLSCRIPT_SPEC_ID, f'unsupported callscript spec id {spec_id}'
+
+    actions = []
+    offset = EXECUTOR_ID_SIZE
+    while offset < len(script_bytes):
+        assert offset + ADDRESS_SIZE + CALLDATA_LENGTH_SIZE <= len(script_bytes), 'malformed callscript'
+        to = '0x' + script_bytes[offset : offset + ADDRESS_SIZE].hex()
+        offset += ADDRESS_SIZE
+        length = int.from_bytes(script_bytes[offset : offset + CALLDATA_LENGTH_SIZE], 'big')
+        offset += CALLDATA_LENGTH_SIZE
+        assert offset + length <= len(script_bytes), 'malformed callscript'
+        actions.append((to, script_bytes[offset : offset + length]))
+        offset += length
+
+    return actions
+
+def is_call_script(value: Union[str, bytes]) -> bool:
+    try:
+        decode_call_script(value)
+    except (AssertionError, ValueError):
+        return False
+    return True
@@ -0,0 +1,242 @@
+"""
+Pytest plugin profiling the fixtures and the tests of the fork suite.
+
+For every fixture setup and every test call it records the wall time, the JSON-RPC
+calls sent to the node by method and the growth of the node RSS. The totals are
+written to `build/test-profile.json` and `build/test-profile.md` at the end of the
+session, and checked against the budgets if a budgets file is given:
+
+    {"fixtures": {"deploy_vault_and_pass_dao_vote": {"seconds": 60, "rpc_calls": 2000}},
+     "tests": {"tests/test_vault.py::test_deposit": {"seconds": 5, "rss_mb": 50}}}
+
+Fixture budgets are checked against the totals over all the setups of the fixture.
+Most of the expensive fixtures, like `deploy_vault_and_pass_dao_vote`, return a
+function doing the work, every call of which is charged to the fixture in addition
+to the setup. These calls are also included in the cost of the test making them.
+"""
+
+import functools
+import inspect
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+import pytest
+
+from utils.rpc import add_provider_hook, remove_provider_hook
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.path.join(PROJECT_ROOT, "build")
+PROFILE_NAME = "test-profile"
+
+REPORT_TOP = 20
+MB = 1024 * 1024
+
+
+class Usage:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rpc_calls: Counter = Counter()
+        self.rss_growth = 0
+
+    def add(self, seconds: float, rpc_calls: Counter, rss_growth: int):
+        self.count += 1
+        self.seconds += seconds
+        self.rpc_calls.update(rpc_calls)
+        self.rss_growth += rss_growth
+
+    def value(self, metric: str) -> float:
+        if metric == "seconds":
+            return self.seconds
+        if metric == "rpc_calls":
+            return sum(self.rpc_calls.values())
+        if metric == "rss_mb":
+            return self.rss_growth / MB
+        raise ValueError(f"unknown budget metric {metric}")
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "seconds": round(self.seconds, 3),
+            "rpc_calls": sum(self.rpc_calls.values()),
+            "rpc_calls_by_method": dict(self.rpc_calls.most_common()),
+            "rss_growth_mb": round(self.rss_growth / MB, 1),
+        }
+
+
+class RpcCallCounter:
+    """
+    Counts the requests sent by every web3 HTTP provider, brownie included.
+
+    The requests are observed at the provider class rather than the brownie
+    connection, which is created only after the plugins are configured.
+    """
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self._installed = False
+
+    def count(self, method: str):
+        self.calls[method] += 1
+
+    def install(self):
+        add_provider_hook(self.count)
+        self._installed = True
+
+    def uninstall(self):
+        if self._installed:
+            remove_provider_hook(self.count)
+            self._installed = False
+
+
+def node_rss() -> Optional[int]:
+    """RSS of the node launched by brownie and its child processes, None if it isn't running"""
+
+    import psutil
+    from brownie import rpc
+
+    process = getattr(rpc, "process", None)
+    if process is None:
+        return None
+    try:
+        return sum(p.memory_info().rss for p in [process, *process.children(recursive=True)])
+    except psutil.Error:
+        return None
+
+
+class FixtureProfiler:
+    def __init__(self, report_path: str, budgets_path: Optional[str] = None):
+        self.report_path = report_path
+        self.budgets = _load_budgets(budgets_path)
+        self.fixtures: dict[str, Usage] = {}
+        self.tests: dict[str, Usage] = {}
+        self.counter = RpcCallCounter()
+        self.violations: list[str] = []
+
+    @contextmanager
+    def _measure(self, usage: Usage):
+        calls_before = self.counter.calls.copy()
+        rss_before = node_rss()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            rss_after = node_rss()
+            rss_growth = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+            usage.add(seconds, self.counter.calls - calls_before, rss_growth)
+
+    def pytest_sessionstart(self, session):
+        self.counter.install()
+
+    def _charge_calls(self, factory, usage: Usage):
+        @functools.wraps(factory)
+        def measured(*args, **kwargs):
+            with self._measure(usage):
+                return factory(*args, **kwargs)
+
+        return measured
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        usage = self.fixtures.setdefault(fixturedef.argname, Usage())
+        # the fixtures it depends on are set up by now, so this is the fixture's own cost
+        with self._measure(usage):
+            yield
+
+        (value, cache_key, exc_info) = fixturedef.cached_result
+        if exc_info is None and (inspect.isfunction(value) or inspect.ismethod(value)):
+            # the tests get the cached value, the result of the hook isn't used
+            fixturedef.cached_result = (self._charge_calls(value, usage), cache_key, exc_info)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        with self._measure(self.tests.setdefault(item.nodeid, Usage())):
+            yield
+
+    def pytest_sessionfinish(self, session):
+        self.counter.uninstall()
+        self.violations = check_budgets(self.budgets, self.fixtures, self.tests)
+        self.write_reports()
+        if self.violations and session.exitstatus == 0:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep("-", f"profile written to {self.report_path}.{{json,md}}")
+        for violation in self.violations:
+            terminalreporter.write_line(f"BUDGET EXCEEDED {violation}", red=True)
+
+    def write_reports(self):
+        os.makedirs(os.path.dirname(self.report_path), exist_ok=True)
+        report = {
+            "fixtures": {name: usage.to_dict() for (name, usage) in self.fixtures.items()},
+            "tests": {nodeid: usage.to_dict() for (nodeid, usage) in self.tests.items()},
+            "budget_violations": self.violations,
+        }
+        with open(f"{self.report_path}.json", "w") as f:
+            json.dump(report, f, indent=2)
+        with open(f"{self.report_path}.md", "w") as f:
+            f.write(format_markdown_report(self.fixtures, self.tests, self.violations))
+
+
+def _load_budgets(path: Optional[str]) -> dict:
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_budgets(budgets: dict, fixtures: dict[str, Usage], tests: dict[str, Usage]) -> list[str]:
+    violations = []
+    for (kind, usages) in (("fixtures", fixtures), ("tests", tests)):
+        for (name, limits) in budgets.get(kind, {}).items():
+            if name not in usages:
+                continue
+            for (metric, limit) in limits.items():
+                value = usages[name].value(metric)
+                if value > limit:
+                    violations.append(f"{name}: {metric} {value:.2f} > {limit}")
+    return violations
+
+
+def _format_table(title: str, usages: dict[str, Usage]) -> list[str]:
+    lines = [
+        f"## {title}",
+        "",
+        "| name | count | seconds | RPC calls | top methods | node RSS growth, MB |",
+        "| --- | ---: | ---: | ---: | --- | ---: |",
+    ]
+    top = sorted(usages.items(), key=lambda item: item[1].seconds, reverse=True)[:REPORT_TOP]
+    for (name, usage) in top:
+        methods = ", ".join(f"{method} {count}" for (method, count) in usage.rpc_calls.most_common(3))
+        lines.append(
+            f"| `{name}` | {usage.count} | {usage.seconds:.2f} | {sum(usage.rpc_calls.values())} "
+            f"| {methods} | {usage.rss_growth / MB:.1f} |"
+        )
+    return lines + [""]
+
+
+def format_markdown_report(fixtures: dict[str, Usage], tests: dict[str, Usage], violations: list[str]) -> str:
+    total = Counter()
+    for usage in [*fixtures.values(), *tests.values()]:
+        total.update(usage.rpc_calls)
+
+    lines = ["# Test profile", ""]
+    lines += _format_table("Fixtures", fixtures)
+    lines += _format_table("Tests", tests)
+    lines += ["## RPC calls by method", ""]
+    lines += [f"* `{method}`: {count}" for (method, count) in total.most_common()]
+    if violations:
+        lines += ["", "## Budget violations", ""]
+        lines += [f"* {violation}" for violation in violations]
+    return "\n".join(lines) + "\n"
+
+
+def profile_report_path(config) -> str:
+    # every xdist worker writes a report of its own
+    worker = getattr(config, "workerinput", {}).get("workerid")
+    return os.path.join(PROFILE_DIR, f"{PROFILE_NAME}-{worker}" if worker else PROFILE_NAME)
@@ -0,0 +1,423 @@
+"""
+Replay of the bETH withdrawals of the actual holders on forks of the local node.
+
+The holders are split into shards, and every shard is replayed in a process of a
+pool on a fork node of its own. That node is launched with the brownie settings of
+the active network and forks the local node at its current block, so it starts
+with whatever state the caller has set up (the upgraded vault, rebases). The
+results are merged into one list in the order of the holders.
+
+Two modes are supported:
+
+* independent: every withdrawal is made from the initial state, reverted after
+  the receipt is read, so the shards can run in parallel;
+* ordered: the withdrawals are made one after another in the given order, as the
+  rate after each depends on the ones before it, on a single fork node.
+
+The ordered replay can be block-packed: with the automine off, up to `block_size`
+transactions are sent in a single batch request, the nonces being set by the
+client, then mined in one block and their receipts read in a batch. The order
+of the transactions within the block is the one chosen by the node, the results
+carry the block and the index of every transaction in it.
+
+Every result carries the bETH and stETH balances of the holder after the withdrawal,
+and the ordered replay the vault stETH balance and the bETH supply after the last one.
+
+The transactions are sent with raw JSON-RPC requests on behalf of the unlocked
+holder accounts with a zero gas price, no brownie objects are used in the pool.
+"""
+
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional, Sequence
+
+import requests
+from eth_abi import decode_abi, encode_abi
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+
+from utils import config
+from utils.beth import BethHolder
+from utils.parallel import free_port
+from utils.rpc import RpcError, batch_request, batch_request_outcomes
+
+# bETH bridged to an unreachable Terra address on 2022-01-26 and held by the Wormhole token bridge
+# forever, the stETH was refunded to the depositors by the DAO, see `AnchorVault.total_beth_refunded`
+# and https://github.com/lidofinance/anchor-collateral-steth/pull/19
+BETH_BURNED = 4449999990000000000 + 439111118580000000000
+
+WITHDRAW_SELECTOR = function_signature_to_4byte_selector("withdraw(uint256,uint256,address)")
+BALANCE_OF_SELECTOR = function_signature_to_4byte_selector("balanceOf(address)")
+TOTAL_SUPPLY_SELECTOR = function_signature_to_4byte_selector("totalSupply()")
+WITHDRAWN_TOPIC = "0x" + keccak(text="Withdrawn(address,uint256,uint256)").hex()
+WITHDRAW_GAS = 500_000
+
+MODE_INDEPENDENT = "independent"
+MODE_ORDERED = "ordered"
+
+NODE_HOST = "http://127.0.0.1"
+NODE_START_TIMEOUT = 120
+REQUEST_TIMEOUT = 120
+
+
+class ReplayHolder(NamedTuple):
+    index: int
+    address: str
+    beth_amount: int
+
+
+class HolderResult(NamedTuple):
+    index: int
+    address: str
+    beth_amount: int
+    steth_received: int
+    gas_used: int
+    # revert reason, None if the withdrawal has succeeded; the reason of a reverted block-packed
+    # withdrawal is the one of a call on the state before its block, not before the transaction
+    revert: Optional[str]
+    # None if the transaction was rejected by the node
+    block: Optional[int] = None
+    tx_index: Optional[int] = None
+    # the balances of the holder after the withdrawal, after its block if block-packed
+    beth_balance: Optional[int] = None
+    steth_balance: Optional[int] = None
+
+
+class VaultState(NamedTuple):
+    steth_balance: int
+    beth_supply: int
+
+
+class Replay(NamedTuple):
+    results: list[HolderResult]
+    # the state after the last withdrawal of the ordered replay, None for the independent one
+    final_state: Optional[VaultState]
+
+
+class ShardTask(NamedTuple):
+    shard: int
+    holders: list[ReplayHolder]
+    fork: str
+    vault_address: str
+    vault_version: int
+    mode: str
+    block_size: Optional[int]
+    node_cmd: str
+    node_settings: dict
+
+
+class NodeClient:
+    """JSON-RPC client of a node keeping the HTTP connection between the requests"""
+
+    def __init__(self, endpoint_uri: str):
+        self.endpoint_uri = endpoint_uri
+        self.session = requests.Session()
+        self.ids = itertools.count()
+
+    def request(self, method: str, params: Sequence) -> object:
+        payload = {"jsonrpc": "2.0", "id": next(self.ids), "method": method, "params": list(params)}
+        response = self.session.post(self.endpoint_uri, json=payload, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise RpcError(method, body["error"])
+        return body["result"]
+
+    def close(self):
+        self.session.close()
+
+
+def replay_holders(
+    holders: Sequence[BethHolder],
+    amounts: Sequence[int],
+    vault_address: str,
+    vault_version: int,
+    mode: str = MODE_INDEPENDENT,
+    shards: Optional[int] = None,
+    block_size: Optional[int] = None,
+) -> Replay:
+    """
+    Withdraw `amounts` of bETH on behalf of the `holders` on forks of the local node
+    at its current block, returns a result per holder in the order of `holders`.
+
+    With `block_size` the ordered replay mines up to that many withdrawals per block.
+    """
+
+    from brownie import web3
+
+    assert mode in (MODE_INDEPENDENT, MODE_ORDERED), f"unknown replay mode {mode}"
+    assert len(holders) == len(amounts), "an amount is expected for every holder"
+    assert block_size is None or mode == MODE_ORDERED, "only the ordered replay can be block-packed"
+
+    replayed = [
+        ReplayHolder(i, to_checksum_address(holder.address_hex), amount)
+        for (i, (holder, amount)) in enumerate(zip(holders, amounts))
+    ]
+    shards = 1 if mode == MODE_ORDERED else shards or multiprocessing.cpu_count()
+    (node_cmd, node_settings) = node_config()
+    if block_size is not None:
+        # the node packs the transactions into a block by their gas limits
+        node_settings["gas_limit"] = max(node_settings.get("gas_limit", 0), block_size * WITHDRAW_GAS)
+    fork = f"{web3.provider.endpoint_uri}@{web3.eth.block_number}"
+
+    tasks = [
+        ShardTask(shard, part, fork, vault_address, vault_version, mode, block_size, node_cmd, node_settings)
+        for (shard, part) in enumerate(shard_holders(replayed, shards))
+    ]
+    # spawned workers don't inherit the brownie connection and the threads of the parent
+    with ProcessPoolExecutor(max_workers=len(tasks), mp_context=multiprocessing.get_context("spawn")) as pool:
+        replays = list(pool.map(replay_shard, tasks))
+    results = sorted(
+        itertools.chain.from_iterable(replay.results for replay in replays), key=lambda result: result.index
+    )
+    return Replay(results, replays[0].final_state if mode == MODE_ORDERED else None)
+
+
+def withdraw_amounts(holders: Sequence[BethHolder], beth_balances: Sequence[int]) -> list[int]:
+    """The whole bETH balances, but for the burned bETH held by the Wormhole token bridge"""
+
+    return [
+        balance - BETH_BURNED if holder.address_hex == config.wormhole_token_bridge_addr.lower() else balance
+        for (holder, balance) in zip(holders, beth_balances)
+    ]
+
+
+def shard_holders(holders: Sequence[ReplayHolder], shards: int) -> list[list[ReplayHolder]]:
+    """Split the holders into at most `shards` contiguous parts of nearly equal size"""
+
+    assert shards > 0, "at least one shard is expected"
+    (size, extra) = divmod(len(holders), shards)
+    parts = []
+    start = 0
+    for shard in range(shards):
+        end = start + size + (1 if shard < extra else 0)
+        if end > start:
+            parts.append(list(holders[start:end]))
+        start = end
+    return parts
+
+
+def node_config() -> tuple[str, dict]:
+    """Command and settings of the node of the active brownie network, without its port and fork"""
+
+    from brownie import network
+    from brownie._config import CONFIG
+
+    network_config = CONFIG.networks[network.show_active()]
+    settings = {key: value for (key, value) in network_config["cmd_settings"].items() if key not in ("port", "fork")}
+    return (network_config["cmd"], settings)
+
+
+def launch_node(node_cmd: str, node_settings: dict, fork: str) -> tuple[object, NodeClient]:
+    from brownie.network.rpc import ganache
+
+    port = free_port()
+    process = ganache.launch(node_cmd, **node_settings, port=port, fork=fork)
+    client = NodeClient(f"{NODE_HOST}:{port}")
+
+    deadline = time.monotonic() + NODE_START_TIMEOUT
+    while True:
+        try:
+            client.request("web3_clientVersion", [])
+            return (process, client)
+        except requests.ConnectionError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                stop_node(process)
+                raise
+            time.sleep(0.2)
+
+
+def stop_node(process):
+    import psutil
+
+    try:
+        for child in process.children(recursive=True):
+            child.kill()
+        process.kill()
+    except psutil.NoSuchProcess:
+        pass
+
+
+def replay_shard(task: ShardTask) -> Replay:
+    (process, client) = launch_node(task.node_cmd, task.node_settings, task.fork)
+    try:
+        for holder in task.holders:
+            client.request("evm_unlockUnknownAccount", [holder.address])
+        if task.block_size is not None:
+            results = replay_packed(client, task)
+        else:
+            results = []
+            for holder in task.holders:
+                if task.mode == MODE_INDEPENDENT:
+                    snapshot_id = client.request("evm_snapshot", [])
+                results.append(withdraw(client, holder, task.vault_address, task.vault_version))
+                if task.mode == MODE_INDEPENDENT:
+                    client.request("evm_revert", [snapshot_id])
+
+        if task.mode == MODE_INDEPENDENT:
+            return Replay(results, None)
+        return Replay(results, vault_state(client, task.vault_address))
+    finally:
+        client.close()
+        stop_node(process)
+
+
+def replay_packed(client: NodeClient, task: ShardTask) -> list[HolderResult]:
+    stop_automine(client)
+
+    addresses = list(dict.fromkeys(holder.address for holder in task.holders))
+    counts = batch_request(
+        [("eth_getTransactionCount", [address, "latest"]) for address in addresses],
+        endpoint_uri=client.endpoint_uri,
+    )
+    nonces = {address: int(count, 16) for (address, count) in zip(addresses, counts)}
+
+    results = []
+    for start in range(0, len(task.holders), task.block_size):
+        chunk = task.holders[start : start + task.block_size]
+        txs = []
+        for holder in chunk:
+            txs.append(
+                {**withdraw_tx(holder, task.vault_address, task.vault_version), "nonce": hex(nonces[holder.address])}
+            )
+            nonces[holder.address] += 1
+        # the whole chunk is sent in one round trip, the node only queues the transactions
+        outcomes = batch_request_outcomes(
+            [("eth_sendTransaction", [tx]) for tx in txs], batch_size=len(txs), endpoint_uri=client.endpoint_uri
+        )
+
+        chunk_results = []
+        sent = []
+        for (holder, tx, outcome) in zip(chunk, txs, outcomes):
+            if isinstance(outcome, RpcError):
+                chunk_results.append(HolderResult(*holder, 0, 0, revert_reason(outcome)))
+            else:
+                sent.append((holder, tx, outcome))
+
+        receipts = mine_pending(client, [tx_hash for (_, _, tx_hash) in sent])
+        for ((holder, tx, _), receipt) in zip(sent, receipts):
+            # the state before the transaction is gone within the block, the revert is explained before the block
+            chunk_results.append(holder_result(client, holder, tx, receipt, hex(int(receipt["blockNumber"], 16) - 1)))
+        results += with_balances(client, chunk_results)
+    return results
+
+
+def stop_automine(client: NodeClient):
+    try:
+        client.request("miner_stop", [])
+    except RpcError:
+        client.request("evm_setAutomine", [False])
+
+
+def mine_pending(client: NodeClient, tx_hashes: Sequence[str]) -> list[dict]:
+    """Mine blocks until all the transactions are included, returns their receipts"""
+
+    receipts: dict[str, dict] = {}
+    while len(receipts) < len(tx_hashes):
+        client.request("evm_mine", [])
+        pending = [tx_hash for tx_hash in tx_hashes if tx_hash not in receipts]
+        found = batch_request(
+            [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in pending], endpoint_uri=client.endpoint_uri
+        )
+        included = {tx_hash: receipt for (tx_hash, receipt) in zip(pending, found) if receipt is not None}
+        assert included, f"{len(pending)} transactions are left pending after mining a block"
+        receipts.update(included)
+    return [receipts[tx_hash] for tx_hash in tx_hashes]
+
+
+def withdraw_tx(holder: ReplayHolder, vault_address: str, vault_version: int) -> dict:
+    data = WITHDRAW_SELECTOR + encode_abi(
+        ["uint256", "uint256", "address"], [holder.beth_amount, vault_version, holder.address]
+    )
+    return {
+        "from": holder.address,
+        "to": vault_address,
+        "data": "0x" + data.hex(),
+        "gas": hex(WITHDRAW_GAS),
+        "gasPrice": "0x0",
+    }
+
+
+def withdraw(client: NodeClient, holder: ReplayHolder, vault_address: str, vault_version: int) -> HolderResult:
+    tx = withdraw_tx(holder, vault_address, vault_version)
+    try:
+        tx_hash = client.request("eth_sendTransaction", [tx])
+    except RpcError as error:
+        # nodes reporting the VM errors in the response reject a reverted transaction
+        return HolderResult(*holder, 0, 0, revert_reason(error))
+
+    receipt = client.request("eth_getTransactionReceipt", [tx_hash])
+    return with_balances(client, [holder_result(client, holder, tx, receipt)])[0]
+
+
+def holder_result(
+    client: NodeClient, holder: ReplayHolder, tx: dict, receipt: dict, call_block: str = "latest"
+) -> HolderResult:
+    """The result of a mined withdrawal, a revert is explained by repeating it as a call at `call_block`"""
+
+    gas_used = int(receipt["gasUsed"], 16)
+    position = (int(receipt["blockNumber"], 16), int(receipt["transactionIndex"], 16))
+    if int(receipt["status"], 16) == 0:
+        reason = "reverted"
+        # the latest state is the one before the transaction but for the sender nonce, so the call reverts the same way
+        try:
+            call = {key: value for (key, value) in tx.items() if key != "nonce"}
+            client.request("eth_call", [call, call_block])
+        except RpcError as error:
+            reason = revert_reason(error)
+        return HolderResult(*holder, 0, gas_used, reason, *position)
+
+    return HolderResult(*holder, steth_received(receipt, tx["to"]), gas_used, None, *position)
+
+
+def with_balances(client: NodeClient, results: Sequence[HolderResult]) -> list[HolderResult]:
+    """The results with the current bETH and stETH balances of the holders, read in a batch"""
+
+    data = [BALANCE_OF_SELECTOR + encode_abi(["address"], [result.address]) for result in results]
+    calls = [
+        ("eth_call", [{"to": token, "data": "0x" + call_data.hex()}, "latest"])
+        for call_data in data
+        for token in (config.beth_token_addr, config.steth_token_addr)
+    ]
+    balances = [int(word, 16) for word in batch_request(calls, endpoint_uri=client.endpoint_uri)]
+    return [
+        result._replace(beth_balance=beth_balance, steth_balance=steth_balance)
+        for (result, beth_balance, steth_balance) in zip(results, balances[::2], balances[1::2])
+    ]
+
+
+def vault_state(client: NodeClient, vault_address: str) -> VaultState:
+    balance_of_vault = BALANCE_OF_SELECTOR + encode_abi(["address"], [vault_address])
+    calls = [
+        ("eth_call", [{"to": config.steth_token_addr, "data": "0x" + balance_of_vault.hex()}, "latest"]),
+        ("eth_call", [{"to": config.beth_token_addr, "data": "0x" + TOTAL_SUPPLY_SELECTOR.hex()}, "latest"]),
+    ]
+    (steth_balance, beth_supply) = batch_request(calls, endpoint_uri=client.endpoint_uri)
+    return VaultState(int(steth_balance, 16), int(beth_supply, 16))
+
+
+def steth_received(receipt: dict, vault_address: str) -> int:
+    for log in receipt["logs"]:
+        if log["address"].lower() == vault_address.lower() and log["topics"][0].lower() == WITHDRAWN_TOPIC:
+            (_, steth_amount) = decode_abi(["uint256", "uint256"], bytes.fromhex(log["data"][2:]))
+            return steth_amount
+    raise ValueError(f"no Withdrawn event in the transaction {receipt['transactionHash']}")
+
+
+def revert_reason(error: RpcError) -> str:
+    if isinstance(error.error, dict):
+        return str(error.error.get("message", error.error))
+    return str(error.error)
+
+
+def format_replay_summary(results: Sequence[HolderResult]) -> str:
+    reverted = [result for result in results if result.revert is not None]
+    lines = [
+        f"{len(results)} holders, {len(reverted)} reverted",
+        f"bETH withdrawn: {sum(result.beth_amount for result in results if result.revert is None)}",
+        f"stETH received: {sum(result.steth_received for result in results)}",
+        f"gas used: {sum(result.gas_used for result in results)}",
+    ]
+    lines += [f"reverted {result.address}: {result.revert}" for result in reverted]
+    return "\n".join(lines)
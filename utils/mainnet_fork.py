@@ -1,6 +1,8 @@
 from contextlib import contextmanager
 from brownie import chain
 
+from utils.rpc import make_request
+
 
 @contextmanager
 def chain_snapshot():
@@ -11,3 +13,40 @@ def chain_snapshot():
     finally:
         print('Reverting the chain...')
         chain.revert()
+
+
+@contextmanager
+def node_snapshot():
+    """
+    Reverts the node to the state on enter, unlike `chain_snapshot` can be nested
+    and used inside isolated tests: brownie keeps a single snapshot of its own.
+    """
+    snapshot_id = make_request('evm_snapshot', [])
+    try:
+        yield
+    finally:
+        make_request('evm_revert', [snapshot_id])
+
+
+class UpgradedState:
+    """
+    Node state after a session-wide change, restored for every module using it.
+
+    Ganache drops a snapshot when it reverts to it, so a new one is taken right after.
+    Reverting to the snapshot drops the later ones as well, the tests of the other
+    modules can't be run on the state before the change anymore.
+    """
+
+    def __init__(self):
+        self.snapshot_id = None
+        self.module = None
+
+    def save(self):
+        self.snapshot_id = make_request('evm_snapshot', [])
+
+    def enter_module(self, module: str):
+        """Restore the saved state before the module fixtures of the next module are set up"""
+        if self.snapshot_id is not None and module != self.module:
+            make_request('evm_revert', [self.snapshot_id])
+            self.save()
+        self.module = module
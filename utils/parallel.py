@@ -0,0 +1,196 @@
+"""
+Parallel fork test runs with pytest-xdist (`brownie test -n <workers>`).
+
+Every worker launches its own fork node on a free port, so the snapshot stacks of
+the workers are isolated. Tests are distributed by module: the module fixtures
+deploy contracts and pass DAO votes, which must not be repeated on every worker.
+The modules are handed out longest first by the durations recorded in the
+previous runs. A run records the durations of the tests it has run in full only,
+the other recorded ones are kept, so partial runs (`-k`, `-x`) don't lose them.
+
+The vault is upgraded once per session and the upgrade can't be undone without
+losing it, so the tests using the upgraded vault are run after all the other ones,
+in scopes of their own: a worker gets them only when the other scopes are handed out.
+
+The cases of the tests marked `spread`, e.g. the points of a sweep, are handed out
+one by one, every worker running any of them sets up the module fixtures on its own.
+Only the modules whose tests don't depend on the order they run in can use it.
+"""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DURATIONS_PATH = os.path.join(PROJECT_ROOT, "build", "test-durations.json")
+
+# the fixture changing the fork state for the rest of the session
+UPGRADED_STATE_FIXTURE = "vault_v4"
+
+SPREAD_MARKER = "spread"
+# the workers pass the scopes of the tests to the scheduler in a file, the controller doesn't collect
+SCOPES_INPUT = "scopes_path"
+# the workers fork the network selected on the controller
+NETWORK_INPUT = "network"
+
+
+def is_worker(config) -> bool:
+    return hasattr(config, "workerinput")
+
+
+def is_parallel(config) -> bool:
+    return is_worker(config) or bool(config.getoption("numprocesses", default=None))
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def selected_network(config) -> str:
+    from brownie._config import CONFIG
+
+    return config.getoption("network", default=None) or CONFIG.settings["networks"]["default"]
+
+
+def use_free_port(config):
+    """Move the fork node of this worker to a free port instead of `port + worker index`"""
+
+    from brownie._config import CONFIG
+
+    CONFIG.networks[config.workerinput[NETWORK_INPUT]]["cmd_settings"]["port"] = free_port()
+
+
+def load_durations(path: str = DURATIONS_PATH) -> dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_durations(durations: dict[str, float], path: str = DURATIONS_PATH):
+    """Merge the durations of this run into the recorded ones"""
+
+    if not durations:
+        return
+    merged = {**load_durations(path), **durations}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # an interrupted write must not lose the recorded durations
+    tmp_path = f"{path}.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(merged, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class RunDurations:
+    """The durations of the tests of this run, by the reports of all their phases"""
+
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+        self.incomplete: set[str] = set()
+
+    def record(self, report):
+        if report.passed:
+            self.durations[report.nodeid] = self.durations.get(report.nodeid, 0.0) + report.duration
+        else:
+            # a failed or skipped test has stopped early, its duration is no estimate of the next run
+            self.incomplete.add(report.nodeid)
+
+    def complete(self) -> dict[str, float]:
+        return {nodeid: duration for (nodeid, duration) in self.durations.items() if nodeid not in self.incomplete}
+
+
+def scopes_path() -> str:
+    return os.path.join(tempfile.mkdtemp(prefix="fork-tests-"), "scopes.json")
+
+
+def remove_scopes(path: str):
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def write_scopes(path: str, scopes: dict[str, str]):
+    # all the workers write the same scopes, the rename makes them appear at once
+    tmp_path = f"{path}.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(scopes, f)
+    os.replace(tmp_path, path)
+
+
+def read_scopes(path: str) -> dict[str, str]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def module_of(nodeid: str) -> str:
+    return nodeid.split("::", 1)[0]
+
+
+def is_spread(item) -> bool:
+    return item.get_closest_marker(SPREAD_MARKER) is not None
+
+
+def uses_upgraded_state(item) -> bool:
+    return UPGRADED_STATE_FIXTURE in getattr(item, "fixturenames", ())
+
+
+def upgraded_module_of(item) -> str:
+    return f"{module_of(item.nodeid)}::{UPGRADED_STATE_FIXTURE}"
+
+
+def scope_of(item) -> str:
+    if is_spread(item):
+        return item.nodeid
+    return upgraded_module_of(item) if uses_upgraded_state(item) else module_of(item.nodeid)
+
+
+def upgraded_state_last(items: list) -> list:
+    """The tests with the upgraded vault after all the other ones, both grouped by module in the module order"""
+
+    modules: dict[str, int] = {}
+    for item in items:
+        modules.setdefault(module_of(item.nodeid), len(modules))
+
+    # the stable sort keeps the order of the tests within a module
+    return sorted(items, key=lambda item: (uses_upgraded_state(item), modules[module_of(item.nodeid)]))
+
+
+def order_by_duration(items: list, durations: dict[str, float]) -> list:
+    """
+    Tests grouped by scope, the longest scopes first, the upgraded state ones after the others.
+
+    Scopes without recorded durations are assumed to be as long as the longest known one.
+    """
+
+    totals: dict[str, float] = {}
+    for item in items:
+        scope = scope_of(item)
+        totals[scope] = totals.get(scope, 0.0) + durations.get(item.nodeid, 0.0)
+    unknown = max(totals.values(), default=0.0)
+    recorded = {scope_of(item) for item in items if item.nodeid in durations}
+
+    def key(item) -> tuple[bool, float]:
+        scope = scope_of(item)
+        return (uses_upgraded_state(item), -(totals[scope] if scope in recorded else unknown))
+
+    # the stable sort keeps the order of the tests within a scope
+    return sorted(items, key=key)
+
+
+def make_scheduler(config, log, path: str):
+    """Hands the scopes out in the collection order (see `order_by_duration`) to the workers as they get idle"""
+
+    from xdist.scheduler import LoadScopeScheduling
+
+    class CollectedScopeScheduling(LoadScopeScheduling):
+        scopes = None
+
+        def _split_scope(self, nodeid):
+            if self.scopes is None:
+                # written by the workers on collection, before the scheduling starts
+                self.scopes = read_scopes(path)
+            return self.scopes[nodeid]
+
+    return CollectedScopeScheduling(config, log)
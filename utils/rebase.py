@@ -0,0 +1,170 @@
+"""
+Sequences of Lido oracle reports on the fork and their effect on the vault rate.
+
+Reports are sent to `Lido.handleOracleReport` on behalf of the accounting oracle.
+The first one is dated by the reference slot of the current consensus frame, as
+`lido_oracle_report` does, and every next one a frame later, the chain time being
+moved past the report time before it is sent.
+
+Sweeps run a scenario for every value from the same state: each run is made in a
+node snapshot reverted afterwards.
+
+The fast mode skips the accounting of the report (fees, withdrawals, sanity checks)
+and writes the CL balance to the Lido storage instead. The total pooled ether and
+so the share rate change as by a report, except no fee shares are minted on a
+positive rebase.
+"""
+
+from typing import Callable, NamedTuple, Optional, Sequence
+
+from brownie import chain, web3
+from eth_utils import keccak
+
+from utils.helpers import SHARE_RATE_PRECISION
+from utils.mainnet_fork import node_snapshot
+from utils.storage import get_storage_at, read_packed, set_storage_at, write_packed
+
+# Lido unstructured storage: CL balance in the low 128 bits, the number of CL validators in the high ones
+LIDO_CL_BALANCE_AND_VALIDATORS_SLOT = int.from_bytes(keccak(b"lido.Lido.clBalanceAndClValidators"), "big")
+CL_BALANCE_OFFSET = 0
+CL_BALANCE_SIZE = 16
+
+
+class RebaseStep(NamedTuple):
+    cl_diff: int
+    # the frame duration of the hash consensus by default
+    time_elapsed: Optional[int] = None
+
+
+class RebasePoint(NamedTuple):
+    step: int
+    cl_diff: int
+    report_time: int
+    total_pooled_ether: int
+    total_shares: int
+    share_rate: int
+    vault_rate: int
+
+
+def force_rebase(lido, cl_diff: int):
+    """Change the CL balance of Lido by `cl_diff` with a storage write"""
+
+    word = get_storage_at(lido.address, LIDO_CL_BALANCE_AND_VALIDATORS_SLOT)
+    cl_balance = read_packed(word, CL_BALANCE_OFFSET, CL_BALANCE_SIZE)
+    assert cl_balance + cl_diff > 0, f"CL balance {cl_balance} can't change by {cl_diff}"
+
+    new_word = write_packed(word, CL_BALANCE_OFFSET, CL_BALANCE_SIZE, cl_balance + cl_diff)
+    set_storage_at(lido.address, LIDO_CL_BALANCE_AND_VALIDATORS_SLOT, new_word)
+
+    (_, _, beacon_balance) = lido.getBeaconStat()
+    assert beacon_balance == cl_balance + cl_diff, "the Lido storage layout doesn't match"
+
+
+class OracleReporter:
+    def __init__(self, lido, hash_consensus, accounting_oracle: str, fast: bool = False):
+        self.lido = lido
+        self.accounting_oracle = accounting_oracle
+        self.fast = fast
+
+        (ref_slot, _) = hash_consensus.getCurrentFrame()
+        (slots_per_epoch, seconds_per_slot, genesis_time) = hash_consensus.getChainConfig()
+        (_, epochs_per_frame, _) = hash_consensus.getFrameConfig()
+        self.frame_duration = epochs_per_frame * slots_per_epoch * seconds_per_slot
+        self.report_time = genesis_time + ref_slot * seconds_per_slot
+        self.reports_sent = 0
+
+    def report(self, cl_diff: int, time_elapsed: Optional[int] = None):
+        """
+        Report the CL balance changed by `cl_diff` since the last report, returns
+        the report transaction or None in the fast mode.
+        """
+
+        if time_elapsed is None:
+            time_elapsed = self.frame_duration
+        if self.reports_sent:
+            self.report_time += time_elapsed
+
+        if self.fast:
+            force_rebase(self.lido, cl_diff)
+            self.reports_sent += 1
+            return None
+
+        advance_time_past(self.report_time)
+
+        (_, validators, balance) = self.lido.getBeaconStat()
+        assert balance + cl_diff > 0, f"CL balance {balance} can't change by {cl_diff}"
+
+        tx = self.lido.handleOracleReport(
+            self.report_time,
+            time_elapsed,
+            validators,
+            balance + cl_diff,
+            0,
+            0,
+            0,
+            [],
+            0,
+            {"from": self.accounting_oracle},
+        )
+        self.reports_sent += 1
+        return tx
+
+
+def advance_time_past(timestamp: int):
+    latest = web3.eth.get_block("latest")["timestamp"]
+    if latest <= timestamp:
+        chain.sleep(timestamp - latest + 1)
+        chain.mine()
+
+
+def record_point(lido, vault, step: int, cl_diff: int, report_time: int) -> RebasePoint:
+    total_pooled_ether = lido.getTotalPooledEther()
+    total_shares = lido.getTotalShares()
+    return RebasePoint(
+        step,
+        cl_diff,
+        report_time,
+        total_pooled_ether,
+        total_shares,
+        total_pooled_ether * SHARE_RATE_PRECISION // total_shares,
+        vault.get_rate(),
+    )
+
+
+def run_scenario(reporter: OracleReporter, vault, steps: Sequence[RebaseStep]) -> list[RebasePoint]:
+    """
+    Send a report per step and record the rates after each, the point of step 0
+    being the state before the first report.
+    """
+
+    points = [record_point(reporter.lido, vault, 0, 0, reporter.report_time)]
+    for (i, step) in enumerate(steps, start=1):
+        reporter.report(step.cl_diff, step.time_elapsed)
+        points.append(record_point(reporter.lido, vault, i, step.cl_diff, reporter.report_time))
+    return points
+
+
+def sweep(
+    make_reporter: Callable[[], OracleReporter],
+    vault,
+    cl_diffs: Sequence[int],
+    steps: Callable[[int], Sequence[RebaseStep]] = lambda cl_diff: [RebaseStep(cl_diff)],
+) -> dict[int, list[RebasePoint]]:
+    """
+    Run the scenario `steps(cl_diff)` for each of `cl_diffs`, every run from the
+    current state, which is restored at the end.
+    """
+
+    result = {}
+    for cl_diff in cl_diffs:
+        with node_snapshot():
+            result[cl_diff] = run_scenario(make_reporter(), vault, steps(cl_diff))
+    return result
+
+
+def format_rate_curve(curve: dict[int, list[RebasePoint]]) -> str:
+    lines = ["cl_diff, ETH | steps | share rate | vault rate"]
+    for (cl_diff, points) in curve.items():
+        last = points[-1]
+        lines.append(f"{cl_diff / 10**18:>12} | {last.step:>5} | {last.share_rate:>28} | {last.vault_rate:>19}")
+    return "\n".join(lines)
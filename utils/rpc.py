@@ -0,0 +1,124 @@
+import itertools
+from typing import Any, Callable, Optional, Sequence, Tuple, Union
+
+import requests
+from brownie import web3
+
+DEFAULT_BATCH_SIZE = 500
+
+RpcCall = Tuple[str, Sequence[Any]]
+
+# called with the method of every request sent by a web3 HTTP provider
+provider_hooks: list[Callable[[str], None]] = []
+_provider_make_request: Optional[Callable] = None
+
+
+class RpcError(Exception):
+    def __init__(self, method, error):
+        super().__init__(f"{method} failed: {error}")
+        self.method = method
+        self.error = error
+
+
+def to_block_id(block: Union[int, str]) -> str:
+    return hex(block) if isinstance(block, int) else block
+
+
+def get_endpoint_uri() -> str:
+    return web3.provider.endpoint_uri
+
+
+def batch_request(
+    calls: Sequence[RpcCall], batch_size: int = DEFAULT_BATCH_SIZE, endpoint_uri: Optional[str] = None
+) -> list:
+    """
+    Send JSON-RPC calls in batches of `batch_size` requests per HTTP round trip.
+
+    Returns the `result` of every call in the order of `calls`, raises `RpcError`
+    if any of the calls has failed.
+    """
+
+    results = batch_request_outcomes(calls, batch_size, endpoint_uri)
+    for result in results:
+        if isinstance(result, RpcError):
+            raise result
+    return results
+
+
+def batch_request_outcomes(
+    calls: Sequence[RpcCall], batch_size: int = DEFAULT_BATCH_SIZE, endpoint_uri: Optional[str] = None
+) -> list:
+    """Same as `batch_request`, but returns an `RpcError` in place of the result of every failed call"""
+
+    endpoint_uri = endpoint_uri or get_endpoint_uri()
+    results: list = []
+    ids = itertools.count()
+
+    with requests.Session() as session:
+        for start in range(0, len(calls), batch_size):
+            chunk = calls[start : start + batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": next(ids), "method": method, "params": list(params)}
+                for method, params in chunk
+            ]
+            response = session.post(endpoint_uri, json=payload, timeout=120)
+            response.raise_for_status()
+
+            body = response.json()
+            if isinstance(body, dict):
+                # some nodes answer with a single error object if the whole batch was rejected
+                raise RpcError("batch", body.get("error", body))
+
+            by_id = {item["id"]: item for item in body}
+            for request in payload:
+                item = by_id.get(request["id"])
+                if item is None or "error" in item:
+                    results.append(RpcError(request["method"], item["error"] if item else "no response"))
+                else:
+                    results.append(item["result"])
+
+    return results
+
+
+def make_request(method: str, params: Sequence[Any]) -> Any:
+    """Single JSON-RPC call through the active brownie provider"""
+
+    response = web3.provider.make_request(method, list(params))
+    if "error" in response:
+        raise RpcError(method, response["error"])
+    return response["result"]
+
+
+def add_provider_hook(hook: Callable[[str], None]):
+    """
+    Call `hook(method)` on every request sent by a web3 HTTP provider, brownie included.
+
+    The provider class is patched once for all the hooks, so they can be removed in any
+    order. The raw `evm_*` requests of brownie bypass the web3 middlewares.
+    """
+
+    global _provider_make_request
+    from web3 import HTTPProvider
+
+    if _provider_make_request is None:
+        _provider_make_request = make_request = HTTPProvider.make_request
+
+        def hooked_make_request(provider, method, params):
+            for provider_hook in list(provider_hooks):
+                provider_hook(method)
+            return make_request(provider, method, params)
+
+        HTTPProvider.make_request = hooked_make_request
+    provider_hooks.append(hook)
+
+
+def remove_provider_hook(hook: Callable[[str], None]):
+    """Remove the hook, the provider class is restored with the last one"""
+
+    global _provider_make_request
+    from web3 import HTTPProvider
+
+    provider_hooks.remove(hook)
+    if not provider_hooks and _provider_make_request is not None:
+        HTTPProvider.make_request = _provider_make_request
+        _provider_make_request = None
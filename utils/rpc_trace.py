@@ -0,0 +1,243 @@
+"""
+web3 middleware tracing the JSON-RPC requests of the tests and scripts.
+
+Every request is logged with its method, a hash of its params, the latency and the
+project frame it was made from. The reads repeated with identical params while the
+chain state didn't change are reported as redundant, and can optionally be answered
+from a read cache which is dropped on every state change.
+
+The state is assumed to change only by the requests of this process, which holds
+for the local fork node but not for a live network. The state changes are counted
+at the provider class: brownie sends the `evm_*` requests straight to the provider,
+bypassing the middlewares, and the provider sees the other ones too.
+
+Usage in scripts:
+
+    tracer = RpcTracer(read_cache=True)
+    tracer.install()
+    ...
+    print(tracer.format_report())
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Callable, NamedTuple
+
+from utils.abi import get_registry
+from utils.rpc import add_provider_hook, remove_provider_hook
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACE_REPORT_PATH = os.path.join(PROJECT_ROOT, "build", "rpc-trace.md")
+
+MIDDLEWARE_NAME = "rpc_tracer"
+
+# requests not changing the chain state, any other one starts a new state epoch
+READ_METHODS = frozenset(
+    (
+        "eth_call",
+        "eth_estimateGas",
+        "eth_getBalance",
+        "eth_getCode",
+        "eth_getStorageAt",
+        "eth_getTransactionCount",
+        "eth_getBlockByNumber",
+        "eth_getBlockByHash",
+        "eth_getTransactionByHash",
+        "eth_getTransactionReceipt",
+        "eth_getLogs",
+        "eth_blockNumber",
+        "eth_chainId",
+        "eth_gasPrice",
+        "eth_accounts",
+        "net_version",
+        "web3_clientVersion",
+        "debug_traceTransaction",
+    )
+)
+# reads served from the cache when it is enabled
+CACHEABLE_METHODS = frozenset(
+    (
+        "eth_call",
+        "eth_getBalance",
+        "eth_getCode",
+        "eth_getStorageAt",
+        "eth_getTransactionCount",
+        "eth_blockNumber",
+        "eth_chainId",
+        "net_version",
+    )
+)
+
+REPORT_TOP = 30
+
+
+class RpcCall(NamedTuple):
+    method: str
+    params_hash: str
+    epoch: int
+    latency: float
+    frame: str
+    label: str
+    cached: bool
+
+
+class RedundantRead(NamedTuple):
+    method: str
+    label: str
+    params_hash: str
+    redundant: int
+    frames: Counter
+
+
+def params_key(params: Any) -> str:
+    return json.dumps(params, sort_keys=True, default=repr, separators=(",", ":"))
+
+
+def params_hash(key: str) -> str:
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def call_label(method: str, params: Any) -> str:
+    """Contract function of an `eth_call`, the method itself otherwise"""
+
+    if method != "eth_call" or not params or not isinstance(params[0], dict):
+        return method
+    data = params[0].get("data") or params[0].get("input") or b""
+    calldata = bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+    function = get_registry().function(calldata)
+    return f"{function.contract}.{function.signature}" if function else f"eth_call {calldata[:4].hex()}"
+
+
+def calling_frame(skip: tuple[str, ...] = (__file__,)) -> str:
+    """The innermost frame of the project code outside of the installed packages"""
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_ROOT) and "site-packages" not in filename and filename not in skip:
+            return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+class RpcTracer:
+    def __init__(self, read_cache: bool = False):
+        self.read_cache = read_cache
+        self.calls: list[RpcCall] = []
+        self.epoch = 0
+        self._cache: dict[tuple[str, str], dict] = {}
+        self._cache_epoch = 0
+        self._hooked = False
+        self._web3 = None
+
+    def on_state_change(self, method: str):
+        if method not in READ_METHODS:
+            self.epoch += 1
+
+    def middleware(self, make_request: Callable, w3) -> Callable:
+        def trace_middleware(method: str, params: Any) -> dict:
+            key = params_key(params)
+            cached = None
+            if self.read_cache and method in CACHEABLE_METHODS:
+                if self._cache_epoch != self.epoch:
+                    self._cache.clear()
+                    self._cache_epoch = self.epoch
+                cached = self._cache.get((method, key))
+
+            started = time.perf_counter()
+            if cached is not None:
+                response = cached
+            else:
+                # the state changes are counted by the provider hook, which sees every request
+                response = make_request(method, params)
+            latency = time.perf_counter() - started
+
+            if self.read_cache and cached is None and method in CACHEABLE_METHODS and self._cache_epoch == self.epoch:
+                if response.get("result") is not None and "error" not in response:
+                    self._cache[(method, key)] = response
+
+            self.calls.append(
+                RpcCall(
+                    method,
+                    params_hash(key),
+                    self.epoch,
+                    latency,
+                    calling_frame(),
+                    call_label(method, params),
+                    cached is not None,
+                )
+            )
+            return response
+
+        return trace_middleware
+
+    def install(self, w3=None):
+        """Add the middleware to the web3 connection, the brownie one by default"""
+
+        if w3 is None:
+            from brownie import web3 as w3
+
+        w3.middleware_onion.add(self.middleware, MIDDLEWARE_NAME)
+        self._web3 = w3
+        add_provider_hook(self.on_state_change)
+        self._hooked = True
+
+    def uninstall(self):
+        if self._web3 is not None:
+            self._web3.middleware_onion.remove(MIDDLEWARE_NAME)
+            self._web3 = None
+        if self._hooked:
+            remove_provider_hook(self.on_state_change)
+            self._hooked = False
+
+    def redundant_reads(self) -> list[RedundantRead]:
+        """Reads repeated with the same params within a state epoch, the most repeated first"""
+
+        seen = set()
+        redundant: dict[tuple[str, str], RedundantRead] = {}
+        for call in self.calls:
+            if call.method not in READ_METHODS:
+                continue
+            if (call.epoch, call.method, call.params_hash) not in seen:
+                seen.add((call.epoch, call.method, call.params_hash))
+                continue
+            read = redundant.setdefault(
+                (call.method, call.params_hash), RedundantRead(call.method, call.label, call.params_hash, 0, Counter())
+            )
+            read.frames[call.frame] += 1
+            redundant[(call.method, call.params_hash)] = read._replace(redundant=read.redundant + 1)
+        return sorted(redundant.values(), key=lambda read: read.redundant, reverse=True)
+
+    def format_report(self, top: int = REPORT_TOP) -> str:
+        reads = self.redundant_reads()
+        total_latency = sum(call.latency for call in self.calls)
+        cached = sum(1 for call in self.calls if call.cached)
+        lines = [
+            "# JSON-RPC trace",
+            "",
+            f"{len(self.calls)} requests in {self.epoch + 1} state epochs, {total_latency:.2f} s in total, "
+            f"{cached} served from the read cache",
+            f"{sum(read.redundant for read in reads)} redundant reads",
+            "",
+            "| redundant | request | params | made from |",
+            "| ---: | --- | --- | --- |",
+        ]
+        for read in reads[:top]:
+            frames = ", ".join(f"`{frame}` {count}" for (frame, count) in read.frames.most_common(3))
+            lines.append(f"| {read.redundant} | `{read.label}` | {read.params_hash} | {frames} |")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: str = TRACE_REPORT_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.format_report())
+
+
+def trace_report_path(config) -> str:
+    # every xdist worker writes a report of its own
+    worker = getattr(config, "workerinput", {}).get("workerid")
+    return TRACE_REPORT_PATH.replace(".md", f"-{worker}.md") if worker else TRACE_REPORT_PATH
@@ -0,0 +1,100 @@
+"""
+Decoder of the vote scripts produced by `utils/dao.py`.
+
+A script is split into actions recursively: every `bytes` argument that is a
+callscript (e.g. of `Agent.forward` or `Voting.newVote`) or a calldata of a known
+function (e.g. the setup calldata of `proxy_upgradeTo`) becomes a nested call.
+"""
+
+from typing import Any, NamedTuple, Optional, Union
+
+import eth_abi
+
+from utils.abi import AbiFunction, get_selector_index
+from utils.evm_script import decode_call_script, is_call_script, to_bytes
+
+SELECTOR_SIZE = 4
+
+
+class DecodedCall(NamedTuple):
+    """Action of a callscript with the decoded function call and the nested actions"""
+
+    target: str
+    calldata: bytes
+    function: Optional[AbiFunction]
+    args: tuple[tuple[str, str, Any], ...]
+    children: tuple["DecodedCall", ...]
+
+    @property
+    def signature(self) -> str:
+        if self.function is not None:
+            return self.function.signature
+        return "0x" + self.calldata[:SELECTOR_SIZE].hex() if self.calldata else "<fallback>"
+
+    def walk(self):
+        """Iterate the call and all the nested ones depth-first"""
+
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+def decode_calldata(target: str, calldata: Union[str, bytes], selector_index=None) -> DecodedCall:
+    calldata = to_bytes(calldata)
+    selector_index = get_selector_index() if selector_index is None else selector_index
+    function = selector_index.get(calldata[:SELECTOR_SIZE]) if len(calldata) >= SELECTOR_SIZE else None
+
+    if function is None:
+        return DecodedCall(target, calldata, None, (), ())
+
+    try:
+        values = eth_abi.decode_abi(list(function.input_types), calldata[SELECTOR_SIZE:])
+    except Exception:
+        # a selector clash with an unrelated function, keep the call undecoded
+        return DecodedCall(target, calldata, None, (), ())
+
+    args = tuple(zip(function.input_names, function.input_types, values))
+    children = []
+    for (_, arg_type, value) in args:
+        if arg_type != "bytes" or len(value) == 0:
+            continue
+        if is_call_script(value):
+            children.extend(decode_script(value, selector_index))
+        elif len(value) >= SELECTOR_SIZE and value[:SELECTOR_SIZE] in selector_index:
+            # calldata executed in the context of the same contract, e.g. the proxy setup call
+            children.append(decode_calldata(target, value, selector_index))
+
+    return DecodedCall(target, calldata, function, args, tuple(children))
+
+
+def decode_script(script: Union[str, bytes], selector_index=None) -> list[DecodedCall]:
+    """Decode all the actions of a callscript into call trees"""
+
+    selector_index = get_selector_index() if selector_index is None else selector_index
+    return [decode_calldata(target, calldata, selector_index) for (target, calldata) in decode_call_script(script)]
+
+
+def decode_vote_script(voting, vote_id) -> list[DecodedCall]:
+    """Decode the script of an existing vote"""
+
+    script = voting.getVote(vote_id)[-1]
+    return decode_script(script)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bytes):
+        return "0x" + value.hex() if len(value) <= 64 else f"0x{value[:32].hex()}... ({len(value)} bytes)"
+    return str(value)
+
+
+def format_call_tree(calls: list[DecodedCall], indent: int = 0) -> str:
+    lines = []
+    for call in calls:
+        lines.append(f"{'  ' * indent}{call.target}.{call.signature}")
+        for (name, arg_type, value) in call.args:
+            if arg_type == "bytes" and call.children:
+                continue
+            lines.append(f"{'  ' * (indent + 2)}{name or '_'}: {arg_type} = {_format_value(value)}")
+        if call.children:
+            lines.append(format_call_tree(list(call.children), indent + 1))
+    return "\n".join(lines)
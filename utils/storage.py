@@ -0,0 +1,70 @@
+"""
+Direct access to contract storage of the local node.
+
+Writes go through the node-specific RPC methods: `evm_setAccountStorageAt` (ganache),
+`anvil_setStorageAt` (anvil) or `hardhat_setStorageAt` (hardhat). The first one the
+node supports is remembered for the following writes.
+"""
+
+from typing import Optional, Union
+
+from eth_utils import keccak
+
+from utils.rpc import RpcError, make_request, to_block_id
+
+WORD_SIZE = 32
+
+SET_STORAGE_METHODS = ("evm_setAccountStorageAt", "anvil_setStorageAt", "hardhat_setStorageAt", "evm_setStorageAt")
+
+_set_storage_method: Optional[str] = None
+
+
+def to_word(value: Union[int, bytes]) -> bytes:
+    if isinstance(value, int):
+        return value.to_bytes(WORD_SIZE, "big")
+    assert len(value) <= WORD_SIZE, f"value is longer than a word: 0x{value.hex()}"
+    return bytes(value).rjust(WORD_SIZE, b"\x00")
+
+
+def mapping_slot(key: Union[int, bytes], slot: int) -> int:
+    """Slot of `mapping[key]` for a mapping declared at `slot`"""
+
+    return int.from_bytes(keccak(to_word(key) + to_word(slot)), "big")
+
+
+def get_storage_at(address: str, slot: int, block: Union[int, str] = "latest") -> int:
+    return int(make_request("eth_getStorageAt", [address, hex(slot), to_block_id(block)]), 16)
+
+
+def _set_storage_params(method: str, address: str, slot: int, value: Union[int, bytes]) -> list:
+    # hardhat only accepts the slot as a quantity without leading zeros
+    slot_param = hex(slot) if method == "hardhat_setStorageAt" else "0x" + to_word(slot).hex()
+    return [address, slot_param, "0x" + to_word(value).hex()]
+
+
+def set_storage_at(address: str, slot: int, value: Union[int, bytes]):
+    global _set_storage_method
+
+    if _set_storage_method is not None:
+        make_request(_set_storage_method, _set_storage_params(_set_storage_method, address, slot, value))
+        return
+
+    for method in SET_STORAGE_METHODS:
+        try:
+            make_request(method, _set_storage_params(method, address, slot, value))
+        except (RpcError, ValueError):
+            continue
+        _set_storage_method = method
+        return
+    raise RpcError("set storage", f"the node supports none of {', '.join(SET_STORAGE_METHODS)}")
+
+
+def read_packed(word: int, offset: int, size: int) -> int:
+    """Value of `size` bytes at the byte `offset` from the right of a storage word"""
+
+    return (word >> (offset * 8)) & ((1 << (size * 8)) - 1)
+
+
+def write_packed(word: int, offset: int, size: int, value: int) -> int:
+    mask = ((1 << (size * 8)) - 1) << (offset * 8)
+    return (word & ~mask) | ((value << (offset * 8)) & mask)
@@ -0,0 +1,207 @@
+"""
+Storage layout of the vault behind its proxy, and typed snapshots and diffs of it.
+
+The layout of `AnchorVault.vy` is taken from the `layout` output of the Vyper
+compiler when the installed compiler provides one. Vyper 0.2.12 used by the project
+doesn't, so the slots are assigned to the storage declarations of the source in
+their order, one slot per variable, as that compiler does for value types. The
+ERC1967 implementation and admin slots of `AnchorVaultProxy` are appended.
+
+The source of the deployed v3 implementation isn't in the repo, its storage
+declarations are pinned here for the upgrade safety check of the new versions.
+
+A snapshot reads all the slots in a single batched JSON-RPC request.
+"""
+
+import os
+import re
+from typing import Any, NamedTuple, Optional, Union
+
+from eth_utils import keccak, to_checksum_address
+
+from utils.rpc import batch_request, to_block_id
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANCHOR_VAULT_SOURCE = os.path.join(PROJECT_ROOT, "contracts", "AnchorVault.vy")
+
+ERC1967_IMPLEMENTATION_SLOT = int.from_bytes(keccak(b"eip1967.proxy.implementation"), "big") - 1
+ERC1967_ADMIN_SLOT = int.from_bytes(keccak(b"eip1967.proxy.admin"), "big") - 1
+
+# top-level `name: type` or `name: public(type)`, constants and immutables take no storage
+STORAGE_DECLARATION = re.compile(r"^(\w+)\s*:\s*(?:public\((.+)\)|(.+?))\s*(?:#.*)?$")
+NON_STORAGE_TYPES = ("constant(", "immutable(")
+VALUE_TYPES = ("address", "bool", "bytes32", "uint256", "int128", "int256", "uint8", "decimal")
+
+# storage declarations of the v3 implementation deployed at `config.vault_impl_addr`
+DEPLOYED_VAULT_VERSION = 3
+DEPLOYED_VAULT_STORAGE = """
+admin: public(address)
+beth_token: public(address)
+steth_token: public(address)
+bridge_connector: public(address)
+rewards_liquidator: public(address)
+insurance_connector: public(address)
+anchor_rewards_distributor: public(bytes32)
+liquidations_admin: public(address)
+no_liquidation_interval: public(uint256)
+restricted_liquidation_interval: public(uint256)
+last_liquidation_time: public(uint256)
+last_liquidation_share_price: public(uint256)
+last_liquidation_shares_burnt: public(uint256)
+version: public(uint256)
+emergency_admin: public(address)
+operations_allowed: public(bool)
+total_beth_refunded: public(uint256)
+"""
+
+
+class StorageVariable(NamedTuple):
+    name: str
+    slot: int
+    type: str
+
+
+class StorageChange(NamedTuple):
+    name: str
+    slot: int
+    type: str
+    old: Any
+    new: Any
+
+
+class StorageSnapshot(NamedTuple):
+    address: str
+    block: Union[int, str]
+    raw: dict[int, int]
+    values: dict[str, Any]
+
+    def diff(self, other: "StorageSnapshot", layout: list[StorageVariable]) -> list[StorageChange]:
+        return diff_snapshots(self, other, layout)
+
+
+PROXY_LAYOUT = [
+    StorageVariable("proxy_implementation", ERC1967_IMPLEMENTATION_SLOT, "address"),
+    StorageVariable("proxy_admin", ERC1967_ADMIN_SLOT, "address"),
+]
+
+
+def parse_vyper_layout(source: str) -> list[StorageVariable]:
+    """Slots of the storage variables of a Vyper 0.2 contract, one per variable in the declaration order"""
+
+    layout = []
+    for line in source.splitlines():
+        match = STORAGE_DECLARATION.match(line)
+        if match is None or line.startswith(("event ", "struct ", "interface ", "def ")):
+            continue
+        (name, public_type, plain_type) = match.groups()
+        if name == "implements":
+            continue
+        var_type = (public_type or plain_type).strip()
+        if var_type.startswith(NON_STORAGE_TYPES):
+            continue
+        assert var_type in VALUE_TYPES, f"storage variable `{name}` of a non-value type {var_type} isn't supported"
+        layout.append(StorageVariable(name, len(layout), var_type))
+    return layout
+
+
+def compiler_layout(source: str) -> Optional[list[StorageVariable]]:
+    """Layout from the `layout` output of the installed Vyper compiler, None if it has no such output"""
+
+    try:
+        import vyper
+
+        output = vyper.compile_code(source, output_formats=["layout"])["layout"]
+    except Exception:
+        return None
+    # the newer compilers split the layout into the storage and the code parts
+    storage = output.get("storage_layout", output)
+    return sorted(
+        (StorageVariable(name, item["slot"], item["type"]) for (name, item) in storage.items()),
+        key=lambda variable: variable.slot,
+    )
+
+
+def vault_layout(source_path: str = ANCHOR_VAULT_SOURCE) -> list[StorageVariable]:
+    with open(source_path) as f:
+        source = f.read()
+    return (compiler_layout(source) or parse_vyper_layout(source)) + PROXY_LAYOUT
+
+
+def deployed_vault_layout() -> list[StorageVariable]:
+    """Layout of the implementation the proxy points to before the upgrade"""
+
+    return parse_vyper_layout(DEPLOYED_VAULT_STORAGE) + PROXY_LAYOUT
+
+
+def decode_value(var_type: str, word: int) -> Any:
+    if var_type == "address":
+        return to_checksum_address(word.to_bytes(32, "big")[12:])
+    if var_type == "bool":
+        return bool(word)
+    if var_type == "bytes32":
+        return "0x" + word.to_bytes(32, "big").hex()
+    if var_type.startswith("int"):
+        bits = int(var_type[3:])
+        return word - (1 << bits) if word >> (bits - 1) else word
+    return word
+
+
+def take_snapshot(
+    address: str, layout: list[StorageVariable], block: Union[int, str] = "latest", endpoint_uri: Optional[str] = None
+) -> StorageSnapshot:
+    """Values of all the `layout` slots of `address` at `block`, read in one batch"""
+
+    block_id = to_block_id(block)
+    results = batch_request(
+        [("eth_getStorageAt", [address, hex(variable.slot), block_id]) for variable in layout],
+        endpoint_uri=endpoint_uri,
+    )
+    raw = {variable.slot: int(result, 16) for (variable, result) in zip(layout, results)}
+    values = {variable.name: decode_value(variable.type, raw[variable.slot]) for variable in layout}
+    return StorageSnapshot(address, block, raw, values)
+
+
+def snapshots_around_tx(address: str, layout: list[StorageVariable], tx) -> tuple[StorageSnapshot, StorageSnapshot]:
+    """
+    Snapshots before and after the block of the transaction, which are those before
+    and after the transaction itself when it is alone in its block.
+    """
+
+    return (take_snapshot(address, layout, tx.block_number - 1), take_snapshot(address, layout, tx.block_number))
+
+
+def diff_snapshots(old: StorageSnapshot, new: StorageSnapshot, layout: list[StorageVariable]) -> list[StorageChange]:
+    return [
+        StorageChange(variable.name, variable.slot, variable.type, old.values[variable.name], new.values[variable.name])
+        for variable in layout
+        if old.raw[variable.slot] != new.raw[variable.slot]
+    ]
+
+
+def diff_layouts(old: list[StorageVariable], new: list[StorageVariable]) -> list[str]:
+    """
+    Upgrade safety problems of replacing the `old` layout with the `new` one:
+    variables removed, moved to another slot or changed type, and slots reused.
+    """
+
+    problems = []
+    new_by_name = {variable.name: variable for variable in new}
+    new_by_slot = {variable.slot: variable for variable in new}
+    for variable in old:
+        if variable.name not in new_by_name:
+            reused = new_by_slot.get(variable.slot)
+            detail = f", slot {variable.slot} is reused by `{reused.name}`" if reused else ""
+            problems.append(f"`{variable.name}` is removed{detail}")
+            continue
+        replacement = new_by_name[variable.name]
+        if replacement.slot != variable.slot:
+            problems.append(f"`{variable.name}` moved from slot {variable.slot} to {replacement.slot}")
+        if replacement.type != variable.type:
+            problems.append(f"`{variable.name}` changed type from {variable.type} to {replacement.type}")
+    return problems
+
+
+def format_diff(changes: list[StorageChange]) -> str:
+    return "\n".join(
+        f"{change.slot:>3} {change.name} ({change.type}): {change.old} -> {change.new}" for change in changes
+    )
@@ -0,0 +1,183 @@
+"""
+Call frames of a transaction built from the `debug_traceTransaction` struct logs.
+
+Traces are requested without memory and storage snapshots, which keeps them small
+enough to be cached on disk: the call targets and the touched storage slots are
+read from the stack.
+"""
+
+import gzip
+import json
+import os
+from typing import Callable, Optional
+
+from utils.abi import PROJECT_ROOT
+from utils.rpc import make_request
+
+TRACES_DIR = os.path.join(PROJECT_ROOT, "build", "traces")
+
+TRACE_OPTIONS = {"disableStorage": True, "disableMemory": True, "enableMemory": False}
+
+CALL_OPS = ("CALL", "CALLCODE", "DELEGATECALL", "STATICCALL")
+CREATE_OPS = ("CREATE", "CREATE2")
+# calls executed in the storage context of the caller
+CALLER_CONTEXT_OPS = ("CALLCODE", "DELEGATECALL")
+
+
+class CallFrame:
+    """
+    A call made during the transaction.
+
+    `gas_used` includes the cost of the call instruction itself, so the gas of the
+    children adds up to at most the gas of the parent.
+    """
+
+    def __init__(self, op: str, target: Optional[str], storage_address: Optional[str], depth: int):
+        self.op = op
+        self.target = target
+        self.storage_address = storage_address
+        self.depth = depth
+        self.gas_used = 0
+        self.reverted = False
+        self.children: list["CallFrame"] = []
+        self.reads: set[int] = set()
+        self.writes: dict[int, int] = {}
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def storage_reads(self) -> dict[str, list[int]]:
+        """Slots read by the frame and the nested ones, by the storage owner address"""
+
+        result = {}
+        for frame in self.walk():
+            if frame.reads:
+                result.setdefault(frame.storage_address, set()).update(frame.reads)
+        return {address: sorted(slots) for (address, slots) in result.items()}
+
+    def storage_writes(self) -> dict[str, dict[int, int]]:
+        """Last values written by the frame and the nested ones, by the storage owner address"""
+
+        result = {}
+        self._collect_writes(result)
+        return {address: dict(sorted(writes.items())) for (address, writes) in result.items()}
+
+    def _collect_writes(self, result: dict):
+        # writes of a reverted frame are rolled back together with the ones of its children
+        if self.reverted:
+            return
+        if self.writes:
+            result.setdefault(self.storage_address, {}).update(self.writes)
+        for child in self.children:
+            child._collect_writes(result)
+
+    def __repr__(self) -> str:
+        return f"CallFrame({self.op} {self.target}, gas={self.gas_used}, children={len(self.children)})"
+
+
+def _stack_address(word: str) -> str:
+    return "0x" + format(int(word, 16) & ((1 << 160) - 1), "040x")
+
+
+def build_call_tree(struct_logs: list, to: str, gas_used: int) -> CallFrame:
+    """
+    Build the tree of call frames, `to` is the transaction target and `gas_used` is
+    the gas of the transaction execution attributed to the root frame.
+    """
+
+    root = CallFrame("CALL", to.lower(), to.lower(), 1)
+    root.gas_used = gas_used
+    stack = [root]
+    # the frame of the last call instruction and the gas left before it, until the next step
+    pending: Optional[tuple[CallFrame, int]] = None
+    calls_in_progress: list[tuple[CallFrame, int]] = []
+
+    for step in struct_logs:
+        depth = step["depth"]
+
+        if pending is not None:
+            (frame, gas_before) = pending
+            pending = None
+            if depth == frame.depth:
+                # the callee has code and is executed at the next depth
+                stack.append(frame)
+                calls_in_progress.append((frame, gas_before))
+            else:
+                # a call to an account without code or a precompile
+                frame.gas_used = gas_before - step["gas"]
+
+        while depth < stack[-1].depth:
+            (frame, gas_before) = calls_in_progress.pop()
+            stack.pop()
+            frame.gas_used = gas_before - step["gas"]
+
+        frame = stack[-1]
+        op = step["op"]
+        evm_stack = step.get("stack") or []
+
+        if op == "SLOAD":
+            frame.reads.add(int(evm_stack[-1], 16))
+        elif op == "SSTORE":
+            frame.writes[int(evm_stack[-1], 16)] = int(evm_stack[-2], 16)
+        elif op in ("REVERT", "INVALID"):
+            frame.reverted = True
+        elif op in CALL_OPS or op in CREATE_OPS:
+            target = _stack_address(evm_stack[-2]) if op in CALL_OPS else None
+            storage_address = frame.storage_address if op in CALLER_CONTEXT_OPS else target
+            child = CallFrame(op, target, storage_address, depth + 1)
+            frame.children.append(child)
+            pending = (child, step["gas"])
+
+    # the transaction ended inside nested calls, e.g. with an out of gas error
+    for (frame, _) in calls_in_progress:
+        frame.reverted = True
+
+    return root
+
+
+def _trace_path(cache_dir: str, tx_hash: str, block_hash: str) -> str:
+    return os.path.join(cache_dir, f"{tx_hash.lower()}-{block_hash.lower()[:18]}.json.gz")
+
+
+def get_struct_logs(
+    tx_hash: str, block_hash: str, cache_dir: Optional[str] = TRACES_DIR, request: Callable = make_request
+) -> list:
+    """
+    Struct logs of the transaction, cached in `cache_dir` by the transaction and the block hash:
+    the same transaction hash could be mined in different blocks of the local forks.
+    """
+
+    path = _trace_path(cache_dir, tx_hash, block_hash) if cache_dir else None
+    if path and os.path.exists(path):
+        with gzip.open(path, "rt") as f:
+            return json.load(f)
+
+    trace = request("debug_traceTransaction", [tx_hash, TRACE_OPTIONS])
+    struct_logs = [
+        {"op": step["op"], "depth": step["depth"], "gas": step["gas"], "stack": _stack_top(step)}
+        for step in trace["structLogs"]
+    ]
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with gzip.open(path, "wt") as f:
+            json.dump(struct_logs, f)
+
+    return struct_logs
+
+
+def _stack_top(step: dict) -> list:
+    # only the call and storage instructions use the stack items
+    if step["op"] in CALL_OPS or step["op"] in ("SLOAD", "SSTORE"):
+        return step["stack"][-2:]
+    return []
+
+
+def trace_call_tree(tx_hash: str, cache_dir: Optional[str] = TRACES_DIR, request: Callable = make_request) -> CallFrame:
+    receipt = request("eth_getTransactionReceipt", [tx_hash])
+    tx = request("eth_getTransactionByHash", [tx_hash])
+    struct_logs = get_struct_logs(tx_hash, receipt["blockHash"], cache_dir, request)
+    intrinsic_gas = int(tx["gas"], 16) - struct_logs[0]["gas"] if struct_logs else 0
+    return build_call_tree(struct_logs, receipt["to"], int(receipt["gasUsed"], 16) - intrinsic_gas)
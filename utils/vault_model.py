@@ -0,0 +1,256 @@
+"""
+Integer model of the `AnchorVault` v4 and `bEth` contracts.
+
+All the functions mirror the Vyper code with the uint256 floor division, so
+the results are expected to be bit-exact with the contract.
+"""
+
+from typing import NamedTuple, Optional, Sequence
+
+RATE_PRECISION = 10**18
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+MAX_UINT256 = 2**256 - 1
+
+
+class StethShares(NamedTuple):
+    """Lido share rate and the vault's stETH shares, for the exact stETH transfers rounding"""
+
+    vault_shares: int
+    total_pooled_ether: int
+    total_shares: int
+
+    def balance(self) -> int:
+        return self.vault_shares * self.total_pooled_ether // self.total_shares
+
+    def transfer(self, amount: int) -> "StethShares":
+        shares = amount * self.total_shares // self.total_pooled_ether
+        assert shares <= self.vault_shares, "transfer amount exceeds balance"
+        return self._replace(vault_shares=self.vault_shares - shares)
+
+
+class WithdrawalSimulation(NamedTuple):
+    """Result of withdrawing the bETH amounts one after another"""
+
+    steth_amounts: list[int]
+    rates: list[int]
+    steth_balance: int
+    beth_supply: int
+
+
+def get_rate(steth_balance: int, beth_supply: int, total_beth_refunded: int) -> int:
+    """Mirrors `AnchorVault._get_rate`"""
+
+    assert beth_supply >= total_beth_refunded, "uint256 underflow"
+    beth_balance = beth_supply - total_beth_refunded
+    if steth_balance >= beth_balance:
+        return RATE_PRECISION
+    return (steth_balance * RATE_PRECISION) // beth_balance
+
+
+def get_steth_amount(beth_amount: int, steth_rate: int) -> int:
+    """Mirrors the amount calculation of `AnchorVault._withdraw`"""
+
+    return (beth_amount * steth_rate) // RATE_PRECISION
+
+
+def simulate_withdrawals(
+    beth_amounts: Sequence[int],
+    steth_balance: int,
+    beth_supply: int,
+    total_beth_refunded: int,
+    steth_shares: Optional[StethShares] = None,
+) -> WithdrawalSimulation:
+    """
+    Computes the stETH amounts received by withdrawing `beth_amounts` in the given order.
+
+    While the vault is fully collateralized the rate stays at 1:1 after every withdrawal,
+    so the amounts are returned as is. Otherwise every withdrawal changes the rate for the
+    next ones and the amounts are computed one by one.
+
+    Without `steth_shares` the stETH transfers are assumed to move the exact amount, with
+    them the vault balance follows the rounding of the Lido shares transfers.
+    """
+
+    if steth_shares is not None:
+        assert steth_balance == steth_shares.balance(), "stETH balance doesn't match the shares"
+
+    if steth_balance >= beth_supply - total_beth_refunded and steth_shares is None:
+        assert sum(beth_amounts) <= beth_supply, "burn amount exceeds total supply"
+        assert sum(beth_amounts) <= steth_balance, "transfer amount exceeds balance"
+        return WithdrawalSimulation(
+            steth_amounts=list(beth_amounts),
+            rates=[RATE_PRECISION] * len(beth_amounts),
+            steth_balance=steth_balance - sum(beth_amounts),
+            beth_supply=beth_supply - sum(beth_amounts),
+        )
+
+    steth_amounts = []
+    rates = []
+
+    for beth_amount in beth_amounts:
+        rate = get_rate(steth_balance, beth_supply, total_beth_refunded)
+        assert beth_amount <= beth_supply, "burn amount exceeds total supply"
+        steth_amount = get_steth_amount(beth_amount, rate)
+
+        beth_supply -= beth_amount
+        if steth_shares is None:
+            assert steth_amount <= steth_balance, "transfer amount exceeds balance"
+            steth_balance -= steth_amount
+        else:
+            steth_shares = steth_shares.transfer(steth_amount)
+            steth_balance = steth_shares.balance()
+
+        steth_amounts.append(steth_amount)
+        rates.append(rate)
+
+    return WithdrawalSimulation(steth_amounts, rates, steth_balance, beth_supply)
+
+
+class ModelRevert(Exception):
+    """Raised where the modelled contract would revert, carries the revert reason if there is one"""
+
+    def __init__(self, reason: Optional[str] = None):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _require(condition: bool, reason: Optional[str] = None):
+    if not condition:
+        raise ModelRevert(reason)
+
+
+def _key(address: str) -> str:
+    return address.lower()
+
+
+class BethModel:
+    """Balances, supply and mint/burn permissions of `bEth.vy`"""
+
+    def __init__(self, minter: str, admin: str, balances: Optional[dict[str, int]] = None, total_supply: int = 0):
+        self.minter = _key(minter)
+        self.admin = _key(admin)
+        self.balances = {_key(address): balance for address, balance in (balances or {}).items()}
+        # the supply of the holders that are not tracked by the model is kept in the total only
+        self.total_supply = max(total_supply, sum(self.balances.values()))
+
+    def balance_of(self, owner: str) -> int:
+        return self.balances.get(_key(owner), 0)
+
+    def mint(self, caller: str, owner: str, amount: int):
+        _require(_key(caller) == self.minter)
+        _require(self.total_supply + amount <= MAX_UINT256)
+        self.total_supply += amount
+        self.balances[_key(owner)] = self.balance_of(owner) + amount
+
+    def burn(self, caller: str, owner: str, amount: int):
+        _require(_key(caller) == self.minter)
+        _require(amount <= self.total_supply)
+        _require(amount <= self.balance_of(owner))
+        self.total_supply -= amount
+        self.balances[_key(owner)] = self.balance_of(owner) - amount
+
+    def transfer(self, sender: str, receiver: str, amount: int):
+        _require(_key(receiver) != ZERO_ADDRESS)
+        _require(amount <= self.balance_of(sender))
+        self.balances[_key(sender)] = self.balance_of(sender) - amount
+        self.balances[_key(receiver)] = self.balance_of(receiver) + amount
+
+
+class AnchorVaultModel:
+    """
+    State machine of `AnchorVault.vy` v4 on top of `BethModel`.
+
+    The vault stETH balance is either an exact amount or `StethShares` if the
+    rounding of the Lido shares transfers has to be taken into account.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        beth: BethModel,
+        admin: str,
+        steth_balance: int = 0,
+        steth_shares: Optional[StethShares] = None,
+        version: int = 4,
+        operations_allowed: bool = True,
+        total_beth_refunded: int = 0,
+    ):
+        self.address = _key(address)
+        self.beth = beth
+        self.admin = _key(admin)
+        self.version = version
+        self.operations_allowed = operations_allowed
+        self.total_beth_refunded = total_beth_refunded
+        self.steth_shares = steth_shares
+        self._steth_balance = steth_balance if steth_shares is None else steth_shares.balance()
+
+    @property
+    def steth_balance(self) -> int:
+        return self._steth_balance
+
+    def set_steth_balance(self, steth_balance: int):
+        """Models a rebase of the vault stETH balance"""
+
+        assert self.steth_shares is None, "rebase the shares with `set_share_rate`"
+        self._steth_balance = steth_balance
+
+    def set_share_rate(self, total_pooled_ether: int, total_shares: int):
+        self.steth_shares = self.steth_shares._replace(total_pooled_ether=total_pooled_ether, total_shares=total_shares)
+        self._steth_balance = self.steth_shares.balance()
+
+    def _assert_version(self, expected_version: int):
+        _require(expected_version == self.version, "unexpected contract version")
+
+    def _assert_admin(self, caller: str):
+        _require(_key(caller) == self.admin)
+
+    def pause(self, caller: str):
+        self._assert_admin(caller)
+        _require(self.operations_allowed)
+        self.operations_allowed = False
+
+    def resume(self, caller: str):
+        self._assert_admin(caller)
+        _require(not self.operations_allowed)
+        self.operations_allowed = True
+
+    def change_admin(self, caller: str, new_admin: str):
+        self._assert_admin(caller)
+        self.admin = _key(new_admin)
+
+    def get_rate(self) -> int:
+        _require(self.beth.total_supply >= self.total_beth_refunded)
+        return get_rate(self._steth_balance, self.beth.total_supply, self.total_beth_refunded)
+
+    def submit(self, *args):
+        raise ModelRevert("Minting is discontinued")
+
+    def collect_rewards(self):
+        raise ModelRevert("Collect rewards stopped")
+
+    def finalize_upgrade_v4(self, caller: str):
+        self._assert_admin(caller)
+        self._assert_version(3)
+        self.version = 4
+
+    def withdraw(self, caller: str, beth_amount: int, expected_version: int, recipient: Optional[str] = None) -> int:
+        """Returns the stETH amount transferred to the recipient, state is left untouched on revert"""
+
+        _require(self.operations_allowed, "contract stopped")
+        self._assert_version(expected_version)
+
+        steth_rate = self.get_rate()
+        steth_amount = get_steth_amount(beth_amount, steth_rate)
+
+        # all the checks go before any state change, as the whole transaction reverts
+        _require(steth_amount <= self._steth_balance)
+        _require(_key(recipient or caller) != ZERO_ADDRESS)
+        self.beth.burn(self.address, caller, beth_amount)
+
+        if self.steth_shares is None:
+            self._steth_balance -= steth_amount
+        else:
+            self.steth_shares = self.steth_shares.transfer(steth_amount)
+            self._steth_balance = self.steth_shares.balance()
+
+        return steth_amount
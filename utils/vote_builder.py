@@ -0,0 +1,132 @@
+"""
+Builder of Aragon votes from any number of actions under a gas budget.
+
+Gas of every action is estimated on the local fork in the context of the Voting
+contract (the one executing vote scripts). Each action is applied right after
+its estimation, so the following actions see the resulting state, and the chain
+is reverted to the initial state in the end. The actions are then packed in
+order into the fewest votes whose execution fits into the budget.
+"""
+
+from typing import NamedTuple, Optional, Sequence, Tuple, Union
+
+from brownie import accounts
+
+from utils.config import lido_dao_voting_addr
+from utils.evm_script import CallScriptBuilder, to_bytes
+from utils.rpc import make_request
+from utils.script_decoder import decode_calldata
+
+TX_BASE_GAS = 21_000
+TX_DATA_ZERO_GAS = 4
+TX_DATA_NONZERO_GAS = 16
+
+# conservative costs of `Voting.executeVote` itself and of running one callscript action by the executor
+VOTE_EXECUTION_OVERHEAD_GAS = 150_000
+ACTION_OVERHEAD_GAS = 10_000
+
+Action = Tuple[str, Union[str, bytes]]
+
+
+class VoteAction(NamedTuple):
+    target: str
+    calldata: bytes
+    gas: int
+
+    @property
+    def description(self) -> str:
+        return " -> ".join(call.signature for call in decode_calldata(self.target, self.calldata).walk())
+
+
+class PlannedVote(NamedTuple):
+    actions: Tuple[VoteAction, ...]
+
+    @property
+    def evm_script(self) -> str:
+        return CallScriptBuilder().extend((action.target, action.calldata) for action in self.actions).to_hex()
+
+    @property
+    def script_size(self) -> int:
+        return (len(self.evm_script) - 2) // 2
+
+    @property
+    def gas(self) -> int:
+        return VOTE_EXECUTION_OVERHEAD_GAS + sum(action.gas for action in self.actions)
+
+
+def intrinsic_gas(calldata: bytes) -> int:
+    zeros = calldata.count(0)
+    return TX_BASE_GAS + TX_DATA_ZERO_GAS * zeros + TX_DATA_NONZERO_GAS * (len(calldata) - zeros)
+
+
+def estimate_actions_gas(actions: Sequence[Action], sender: str = lido_dao_voting_addr) -> list[VoteAction]:
+    """
+    Gas used by every action when called by `sender`, excluding the transaction
+    intrinsic gas which isn't paid by calls made from a vote script.
+    """
+
+    # makes the node accept transactions from the contract address
+    accounts.at(sender, force=True)
+
+    snapshot_id = make_request("evm_snapshot", [])
+    try:
+        result = []
+        for (i, (target, calldata)) in enumerate(actions):
+            calldata = to_bytes(calldata)
+            tx = {"from": sender, "to": target, "data": "0x" + calldata.hex(), "gasPrice": "0x0"}
+            try:
+                gas = int(make_request("eth_estimateGas", [tx]), 16)
+                tx_hash = make_request("eth_sendTransaction", [{**tx, "gas": hex(gas)}])
+                receipt = make_request("eth_getTransactionReceipt", [tx_hash])
+            except Exception as e:
+                raise ValueError(f"action #{i + 1} to {target} fails: {e}") from e
+            if int(receipt["status"], 16) != 1:
+                raise ValueError(f"action #{i + 1} to {target} reverted")
+            result.append(VoteAction(target, calldata, gas - intrinsic_gas(calldata) + ACTION_OVERHEAD_GAS))
+        return result
+    finally:
+        make_request("evm_revert", [snapshot_id])
+
+
+def split_into_votes(actions: Sequence[VoteAction], gas_budget: int) -> list[PlannedVote]:
+    """
+    Pack the actions in their order into votes executable within `gas_budget`.
+
+    Filling every vote up to the budget before starting the next one gives the
+    fewest votes possible when the order of actions has to be kept.
+    """
+
+    votes = []
+    current = []
+    current_gas = VOTE_EXECUTION_OVERHEAD_GAS
+    for action in actions:
+        if VOTE_EXECUTION_OVERHEAD_GAS + action.gas > gas_budget:
+            raise ValueError(f"action {action.description} needs {action.gas} gas, over the budget of {gas_budget}")
+        if current and current_gas + action.gas > gas_budget:
+            votes.append(PlannedVote(tuple(current)))
+            current = []
+            current_gas = VOTE_EXECUTION_OVERHEAD_GAS
+        current.append(action)
+        current_gas += action.gas
+    if current:
+        votes.append(PlannedVote(tuple(current)))
+    return votes
+
+
+def build_votes(
+    actions: Sequence[Action], gas_budget: Optional[int] = None, voting: str = lido_dao_voting_addr
+) -> list[PlannedVote]:
+    """Estimate and split the actions, the budget defaults to the gas limit of the latest block"""
+
+    if gas_budget is None:
+        gas_budget = int(make_request("eth_getBlockByNumber", ["latest", False])["gasLimit"], 16)
+    return split_into_votes(estimate_actions_gas(actions, voting), gas_budget)
+
+
+def format_votes_report(votes: Sequence[PlannedVote]) -> str:
+    lines = []
+    for (i, vote) in enumerate(votes):
+        lines.append(f"vote #{i + 1}: {len(vote.actions)} actions, {vote.script_size} bytes of script, {vote.gas} gas")
+        for action in vote.actions:
+            lines.append(f"  {action.target} {action.description}: {action.gas} gas")
+    return "\n".join(lines)
@@ -0,0 +1,87 @@
+"""
+Gas and storage effects of every action of an executed vote script.
+
+The call frames of the execution transaction are matched with the actions of the
+script: the callscript executor calls the targets of the actions one by one, so
+the first frame whose calls go to the same targets in the same order is the one
+of the executor.
+"""
+
+from typing import NamedTuple, Optional, Union
+
+from utils.abi import CONFIG_CONTRACTS
+from utils.script_decoder import DecodedCall, decode_script
+from utils.trace import TRACES_DIR, CallFrame, trace_call_tree
+
+ADDRESS_LABELS = {address.lower(): name for (address, name) in CONFIG_CONTRACTS.items()}
+
+
+class ActionProfile(NamedTuple):
+    call: DecodedCall
+    frame: CallFrame
+
+    @property
+    def gas(self) -> int:
+        return self.frame.gas_used
+
+    @property
+    def description(self) -> str:
+        return " -> ".join(call.signature for call in self.call.walk())
+
+    def storage_reads(self) -> dict[str, list[int]]:
+        return self.frame.storage_reads()
+
+    def storage_writes(self) -> dict[str, dict[int, int]]:
+        return self.frame.storage_writes()
+
+
+def find_script_frames(root: CallFrame, targets: list[str]) -> list[CallFrame]:
+    for frame in root.walk():
+        calls = [child for child in frame.children if child.op == "CALL"]
+        if calls and [call.target for call in calls] == targets:
+            return calls
+    raise ValueError(f"no calls of the script actions to {targets} in the transaction")
+
+
+def profile_script_execution(
+    tx_hash: str, script: Union[str, bytes], cache_dir: Optional[str] = TRACES_DIR
+) -> list[ActionProfile]:
+    """Profile the actions of `script` executed by the transaction"""
+
+    calls = decode_script(script)
+    frames = find_script_frames(trace_call_tree(tx_hash, cache_dir), [call.target for call in calls])
+    return [ActionProfile(call, frame) for (call, frame) in zip(calls, frames)]
+
+
+def profile_vote_execution(voting, vote_id, tx_hash: str, cache_dir: Optional[str] = TRACES_DIR) -> list[ActionProfile]:
+    """Profile the actions of the vote executed by the `executeVote` transaction"""
+
+    return profile_script_execution(tx_hash, voting.getVote(vote_id)["script"], cache_dir)
+
+
+def _label(address: Optional[str]) -> str:
+    if address is None:
+        return "<new contract>"
+    return f"{address} ({ADDRESS_LABELS[address]})" if address in ADDRESS_LABELS else address
+
+
+def _format_frames(frame: CallFrame, indent: int) -> list[str]:
+    lines = []
+    for child in frame.children:
+        reverted = " reverted" if child.reverted else ""
+        lines.append(f"{'  ' * indent}{child.op} {_label(child.target)}: {child.gas_used} gas{reverted}")
+        lines.extend(_format_frames(child, indent + 1))
+    return lines
+
+
+def format_profile_report(profiles: list[ActionProfile]) -> str:
+    lines = []
+    for (i, profile) in enumerate(profiles):
+        lines.append(f"#{i + 1} {_label(profile.call.target)} {profile.description}: {profile.gas} gas")
+        lines.extend(_format_frames(profile.frame, 2))
+        for (address, writes) in profile.storage_writes().items():
+            lines.append(f"    writes {_label(address)}")
+            lines.extend(f"      {slot:#066x} = {value:#066x}" for (slot, value) in writes.items())
+        for (address, slots) in profile.storage_reads().items():
+            lines.append(f"    reads {_label(address)}: {len(slots)} slots")
+    return "\n".join(lines)
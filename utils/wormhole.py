@@ -1,25 +1,105 @@
+import struct
+from typing import Iterable, NamedTuple, Union
+
 CHAIN_ID_ETHERUM = 2
 CHAIN_ID_TERRA = 3
 
+# Wormhole token bridge amounts are truncated to 8 decimals
+WORMHOLE_DECIMALS = 8
+
+TRANSFER_PAYLOAD_ID = 1
+
+# payloadId, amount, tokenAddress, tokenChain, to, toChain, fee
+TRANSFER_PAYLOAD_STRUCT = struct.Struct(">B32s32sH32sH32s")
+TRANSFER_PAYLOAD_SIZE = TRANSFER_PAYLOAD_STRUCT.size
+
+UINT256_SIZE = 32
+BYTES32_SIZE = 32
+
+
+class TransferPayload(NamedTuple):
+    amount: int
+    token_address: bytes
+    token_chain: int
+    to: bytes
+    to_chain: int
+    fee: int
+
+
+def normalize_amount(amount: int, token_decimals: int) -> int:
+    if token_decimals <= WORMHOLE_DECIMALS:
+        return amount
+    return amount // 10 ** (token_decimals - WORMHOLE_DECIMALS)
+
+
+def denormalize_amount(normalized_amount: int, token_decimals: int) -> int:
+    if token_decimals <= WORMHOLE_DECIMALS:
+        return normalized_amount
+    return normalized_amount * 10 ** (token_decimals - WORMHOLE_DECIMALS)
+
+
+def to_bytes32(addr: Union[str, bytes]) -> bytes:
+    """Left-pad an Ethereum or Terra address to 32 bytes with zeroes"""
+
+    addr_bytes = addr if isinstance(addr, bytes) else bytes.fromhex(strip_0x(addr))
+    assert len(addr_bytes) <= BYTES32_SIZE, f'address is longer than 32 bytes: {addr}'
+    return addr_bytes.rjust(BYTES32_SIZE, b'\x00')
+
+
+def encode_transfer_payload(payload: TransferPayload) -> bytes:
+    return TRANSFER_PAYLOAD_STRUCT.pack(
+        TRANSFER_PAYLOAD_ID,
+        payload.amount.to_bytes(UINT256_SIZE, 'big'),
+        to_bytes32(payload.token_address),
+        payload.token_chain,
+        to_bytes32(payload.to),
+        payload.to_chain,
+        payload.fee.to_bytes(UINT256_SIZE, 'big'),
+    )
+
+
+def encode_transfer_payloads(payloads: Iterable[TransferPayload]) -> bytes:
+    """Concatenated payloads, the result can be split back with `decode_transfer_payloads`"""
+
+    return b''.join(encode_transfer_payload(payload) for payload in payloads)
+
+
+def _unpack_transfer_payload(fields: tuple) -> TransferPayload:
+    (payload_id, amount, token_address, token_chain, to, to_chain, fee) = fields
+    assert payload_id == TRANSFER_PAYLOAD_ID, f'not a transfer payload: payload id {payload_id}'
+    return TransferPayload(
+        int.from_bytes(amount, 'big'),
+        token_address,
+        token_chain,
+        to,
+        to_chain,
+        int.from_bytes(fee, 'big'),
+    )
+
+
+def decode_transfer_payload(payload: Union[str, bytes]) -> TransferPayload:
+    payload_bytes = payload if isinstance(payload, bytes) else bytes.fromhex(strip_0x(payload))
+    assert len(payload_bytes) == TRANSFER_PAYLOAD_SIZE, f'invalid transfer payload size {len(payload_bytes)}'
+    return _unpack_transfer_payload(TRANSFER_PAYLOAD_STRUCT.unpack(payload_bytes))
+
+
+def decode_transfer_payloads(data: bytes) -> list[TransferPayload]:
+    """Split and decode the payloads concatenated by `encode_transfer_payloads`"""
 
-def normalize_amount(amount, token_decimals):
-    return amount if token_decimals <= 8 else int(amount / (10 ** (token_decimals - 8)))
+    assert len(data) % TRANSFER_PAYLOAD_SIZE == 0, f'invalid transfer payloads size {len(data)}'
+    return [_unpack_transfer_payload(fields) for fields in TRANSFER_PAYLOAD_STRUCT.iter_unpack(data)]
 
 
 def assemble_transfer_payload(token_address, normalized_amount, to_address, token_chain_id, to_chain_id, fee):
-    payload = '0x01' # payloadId
-    payload += f'{normalized_amount:064x}'
-    payload += strip_0x(encode_addr(token_address))
-    payload += f'{token_chain_id:04x}'
-    payload += strip_0x(encode_addr(to_address))
-    payload += f'{to_chain_id:04x}'
-    payload += f'{fee:064x}'
-    return payload.lower()
+    payload = TransferPayload(
+        normalized_amount, to_bytes32(token_address), token_chain_id, to_bytes32(to_address), to_chain_id, fee
+    )
+    return '0x' + encode_transfer_payload(payload).hex()
 
 
 def encode_addr(addr):
     # left-pad to 32 bytes with zeroes
-    return f'0x{strip_0x(addr):0>64}'
+    return '0x' + to_bytes32(addr).hex()
 
 
 def strip_0x(line):
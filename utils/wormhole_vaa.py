@@ -0,0 +1,181 @@
+"""
+Local Wormhole guardian set producing signed VAAs for `MockWormholeTokenBridge`.
+
+Signing is the slow part of building thousands of VAAs, so large batches are
+split into chunks signed in a process pool.
+"""
+
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional, Sequence
+
+from eth_keys import keys
+from eth_utils import keccak
+
+from utils.wormhole import CHAIN_ID_TERRA, TransferPayload, encode_transfer_payload
+
+VAA_VERSION = 1
+GUARDIAN_SET_SIZE = 19
+CONSISTENCY_LEVEL = 15
+
+# version, guardianSetIndex, signaturesCount
+VAA_HEADER_STRUCT = struct.Struct(">BIB")
+# guardianIndex, r, s, v
+SIGNATURE_STRUCT = struct.Struct(">B32s32sB")
+# timestamp, nonce, emitterChainId, emitterAddress, sequence, consistencyLevel
+BODY_HEADER_STRUCT = struct.Struct(">IIH32sQB")
+
+# emitter of the simulated transfers, any value works as long as the bridge is deployed with it
+TERRA_TOKEN_BRIDGE_EMITTER = keccak(b"terra token bridge")
+
+SIGN_CHUNK_SIZE = 256
+
+
+class VaaBody(NamedTuple):
+    timestamp: int
+    nonce: int
+    emitter_chain: int
+    emitter_address: bytes
+    sequence: int
+    consistency_level: int
+    payload: bytes
+
+
+class Vaa(NamedTuple):
+    guardian_set_index: int
+    signatures: tuple[tuple[int, bytes, bytes, int], ...]
+    body: VaaBody
+
+
+class GuardianSet(NamedTuple):
+    private_keys: tuple[bytes, ...]
+    index: int = 0
+
+    @classmethod
+    def generate(cls, size: int = GUARDIAN_SET_SIZE, seed: bytes = b"", index: int = 0) -> "GuardianSet":
+        """Deterministic keys, the same seed gives the same guardians"""
+
+        return cls(tuple(keccak(seed + i.to_bytes(4, "big")) for i in range(size)), index)
+
+    @property
+    def addresses(self) -> list[str]:
+        return [keys.PrivateKey(key).public_key.to_checksum_address() for key in self.private_keys]
+
+    @property
+    def quorum(self) -> int:
+        return len(self.private_keys) * 2 // 3 + 1
+
+
+def encode_vaa_body(body: VaaBody) -> bytes:
+    return (
+        BODY_HEADER_STRUCT.pack(
+            body.timestamp,
+            body.nonce,
+            body.emitter_chain,
+            body.emitter_address,
+            body.sequence,
+            body.consistency_level,
+        )
+        + body.payload
+    )
+
+
+def vaa_digest(body: bytes) -> bytes:
+    return keccak(keccak(body))
+
+
+def sign_vaa(body: bytes, private_keys: Sequence[bytes], guardian_set_index: int) -> bytes:
+    """Sign the encoded body with the first `len(private_keys)` guardians of the set"""
+
+    digest = vaa_digest(body)
+    vaa = bytearray(VAA_HEADER_STRUCT.pack(VAA_VERSION, guardian_set_index, len(private_keys)))
+    for (guardian_index, key) in enumerate(private_keys):
+        signature = keys.PrivateKey(key).sign_msg_hash(digest)
+        vaa += SIGNATURE_STRUCT.pack(
+            guardian_index, signature.r.to_bytes(32, "big"), signature.s.to_bytes(32, "big"), signature.v
+        )
+    vaa += body
+    return bytes(vaa)
+
+
+def _sign_chunk(args: tuple) -> list[bytes]:
+    (bodies, private_keys, guardian_set_index) = args
+    return [sign_vaa(body, private_keys, guardian_set_index) for body in bodies]
+
+
+def sign_vaas(
+    bodies: Sequence[bytes],
+    guardian_set: GuardianSet,
+    signers: Optional[int] = None,
+    processes: Optional[int] = None,
+    chunk_size: int = SIGN_CHUNK_SIZE,
+) -> list[bytes]:
+    """
+    Sign the encoded bodies by `signers` guardians (the quorum by default),
+    using `processes` worker processes (the number of CPUs by default).
+    """
+
+    private_keys = guardian_set.private_keys[: signers or guardian_set.quorum]
+    chunks = [(bodies[i : i + chunk_size], private_keys, guardian_set.index) for i in range(0, len(bodies), chunk_size)]
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(chunks) <= 1:
+        return [vaa for chunk in map(_sign_chunk, chunks) for vaa in chunk]
+
+    with ProcessPoolExecutor(max_workers=min(processes, len(chunks))) as executor:
+        return [vaa for chunk in executor.map(_sign_chunk, chunks) for vaa in chunk]
+
+
+def parse_vaa(vaa: bytes) -> Vaa:
+    (version, guardian_set_index, signatures_count) = VAA_HEADER_STRUCT.unpack_from(vaa)
+    assert version == VAA_VERSION, f"unsupported VAA version {version}"
+
+    offset = VAA_HEADER_STRUCT.size
+    signatures = []
+    for _ in range(signatures_count):
+        signatures.append(SIGNATURE_STRUCT.unpack_from(vaa, offset))
+        offset += SIGNATURE_STRUCT.size
+
+    header = BODY_HEADER_STRUCT.unpack_from(vaa, offset)
+    body = VaaBody(*header, vaa[offset + BODY_HEADER_STRUCT.size :])
+    return Vaa(guardian_set_index, tuple(signatures), body)
+
+
+def recover_signers(vaa: Vaa) -> list[str]:
+    digest = vaa_digest(encode_vaa_body(vaa.body))
+    return [
+        keys.Signature(vrs=(v, int.from_bytes(r, "big"), int.from_bytes(s, "big")))
+        .recover_public_key_from_msg_hash(digest)
+        .to_checksum_address()
+        for (_, r, s, v) in vaa.signatures
+    ]
+
+
+def transfer_vaas(
+    transfers: Sequence[TransferPayload],
+    guardian_set: GuardianSet,
+    emitter_address: bytes = TERRA_TOKEN_BRIDGE_EMITTER,
+    emitter_chain: int = CHAIN_ID_TERRA,
+    first_sequence: int = 0,
+    timestamp: int = 0,
+    processes: Optional[int] = None,
+    chunk_size: int = SIGN_CHUNK_SIZE,
+) -> list[bytes]:
+    """Signed VAAs of the token bridge transfers, with consecutive sequence numbers"""
+
+    bodies = [
+        encode_vaa_body(
+            VaaBody(
+                timestamp,
+                nonce=sequence,
+                emitter_chain=emitter_chain,
+                emitter_address=emitter_address,
+                sequence=sequence,
+                consistency_level=CONSISTENCY_LEVEL,
+                payload=encode_transfer_payload(transfer),
+            )
+        )
+        for (sequence, transfer) in enumerate(transfers, start=first_sequence)
+    ]
+    return sign_vaas(bodies, guardian_set, processes=processes, chunk_size=chunk_size)